@@ -1,6 +1,7 @@
 import atheris
 import sys
 import os
+import threading
 
 # ==================== 1. 环境配置 ====================
 # 将 project 目录加入路径，否则 import 找不到
@@ -20,15 +21,24 @@ class MockDataStore(DataStore):
         self.data = {
             "users": [],
             "products": [],
+            "orders": [],
+            "complaints": [],
             "_id_counters": {"users": 1, "products": 1}
         }
         self.path = "mock_path" # 假路径
+        self.journal = False
+        self.durability = "sync"
+        self._dirty = set()
+        self._lock = threading.RLock()
+        self._tx_depth = 0
+        self._unloaded = set()
+        self._load()
 
     def _save(self):
         pass # 禁止写文件，什么都不做
 
     def _load(self):
-        pass # 禁止读文件
+        self._rebuild_indexes() # 不读文件，只建内存索引
 
 # ==================== 3. 定义 Fuzz 目标函数 ====================
 def TestOneInput(data):
@@ -0,0 +1,85 @@
+# benchmarks/bench_lazy.py
+"""
+按需加载基准：对比 DataStore 与 LazyDataStore 打开 data.json 的耗时、峰值内存（RSS），
+以及打开后按 id 随机查找、翻页的耗时
+
+每项测量都在独立子进程里进行，数据构成与 bench_snapshot.py 相同。
+
+用法（在 project 目录下）：
+    python benchmarks/bench_lazy.py                 # 默认 100k、1M 条记录
+    python benchmarks/bench_lazy.py -n 100000 2000000
+"""
+import argparse
+import os
+import random
+import subprocess
+import sys
+import tempfile
+import time
+
+PROJECT_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+sys.path.insert(0, PROJECT_DIR)
+
+from bench_snapshot import make_data, peak_rss_kib  # noqa: E402
+from storage import DataStore  # noqa: E402
+from lazy_storage import LazyDataStore  # noqa: E402
+
+CASES = {"eager": "DataStore", "lazy": "LazyDataStore"}
+LOOKUPS = 10_000
+PAGES = 100
+PAGE_SIZE = 20
+
+
+def measure(case: str, path: str):
+    """子进程入口：输出 打开耗时 查找耗时 翻页耗时(秒) 峰值内存(KiB)"""
+    start = time.perf_counter()
+    store = LazyDataStore(path=path) if case == "lazy" else DataStore(path=path)
+    opened = time.perf_counter()
+
+    count = store.data["_id_counters"]["products"] - 1
+    rng = random.Random(1)
+    for _ in range(LOOKUPS):
+        store.find_product_by_id(rng.randint(1, count))
+    looked_up = time.perf_counter()
+
+    for page in range(PAGES):
+        store.list_orders(offset=page * PAGE_SIZE, limit=PAGE_SIZE)
+    paged = time.perf_counter()
+    print(opened - start, looked_up - opened, paged - looked_up, peak_rss_kib())
+
+
+def run_case(case: str, path: str) -> list:
+    out = subprocess.run(
+        [sys.executable, os.path.abspath(__file__), "--measure", case, path],
+        check=True, capture_output=True, text=True, cwd=PROJECT_DIR,
+    ).stdout.split()
+    return [float(v) for v in out[:3]] + [int(out[3])]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("-n", type=int, nargs="+", default=[100_000, 1_000_000], help="记录总数")
+    parser.add_argument("--measure", nargs=2, metavar=("CASE", "PATH"), help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    if args.measure:
+        measure(*args.measure)
+        return
+
+    for n in args.n:
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, "data.json")
+            store = DataStore(path=path)
+            store.data.update(make_data(n))
+            store.checkpoint()
+            del store
+            print(f"{n:,} 条记录  data.json {os.path.getsize(path) / 2**20:,.1f} MiB")
+            for case, label in CASES.items():
+                opened, looked_up, paged, rss = run_case(case, path)
+                print(
+                    f"    {label:<14}打开 {opened:7.3f} s  查找 {LOOKUPS} 次 {looked_up:6.3f} s  "
+                    f"翻 {PAGES} 页 {paged:6.3f} s  峰值 RSS {rss / 1024:8,.0f} MiB"
+                )
+
+
+if __name__ == "__main__":
+    main()
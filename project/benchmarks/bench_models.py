@@ -0,0 +1,88 @@
+# benchmarks/bench_models.py
+"""
+模型序列化微基准：对比旧写法（dataclasses.asdict + Enum(value)）与现在的手写 to_dict/from_dict
+
+用法（在 project 目录下）：
+    python benchmarks/bench_models.py            # 默认 1,000,000 个商品
+    python benchmarks/bench_models.py -n 100000
+"""
+import argparse
+import os
+import sys
+import time
+from dataclasses import asdict
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from models import Product, ConditionLevel, ProductStatus  # noqa: E402
+
+
+def legacy_to_dict(p: Product) -> dict:
+    # 改造前的 Product.to_dict
+    d = asdict(p)
+    d["condition"] = p.condition.value
+    d["status"] = p.status.value
+    return d
+
+
+def legacy_from_dict(d: dict) -> Product:
+    # 改造前的 Product.from_dict（关键字参数 + Enum 构造）
+    return Product(
+        id=d["id"],
+        seller_id=d["seller_id"],
+        title=d["title"],
+        image_count=d.get("image_count", 1),
+        category=d.get("category", "未分类"),
+        condition=ConditionLevel(d.get("condition", "全新")),
+        price=float(d["price"]),
+        stock=int(d["stock"]),
+        description=d.get("description", ""),
+        contact=d.get("contact", ""),
+        status=ProductStatus(d.get("status", ProductStatus.ON_SALE.value)),
+    )
+
+
+def make_products(n: int):
+    conditions = list(ConditionLevel)
+    return [
+        Product(
+            id=i,
+            seller_id=i % 1000,
+            title=f"商品{i}",
+            image_count=1,
+            category="数码",
+            condition=conditions[i % len(conditions)],
+            price=float(i % 5000),
+            stock=1,
+            description="描述描述描述描述描述",
+            contact="vx:123",
+            status=ProductStatus.ON_SALE,
+        )
+        for i in range(n)
+    ]
+
+
+def timed(label: str, n: int, fn):
+    start = time.perf_counter()
+    result = fn()
+    elapsed = time.perf_counter() - start
+    print(f"{label:<28}{elapsed:8.3f} s  {n / elapsed:12,.0f} rec/s")
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("-n", type=int, default=1_000_000, help="商品数量")
+    args = parser.parse_args()
+    n = args.n
+
+    products = make_products(n)
+    print(f"{n:,} 个商品")
+    dicts = timed("to_dict   before (asdict)", n, lambda: [legacy_to_dict(p) for p in products])
+    timed("to_dict   after", n, lambda: [p.to_dict() for p in products])
+    timed("from_dict before (Enum())", n, lambda: [legacy_from_dict(d) for d in dicts])
+    timed("from_dict after", n, lambda: [Product.from_dict(d) for d in dicts])
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,111 @@
+# benchmarks/bench_orders.py
+"""
+并发下单基准：N 个线程抢购同一个热门商品，校验不超卖并统计每秒订单数
+
+下单在存储的事务内读库存、建单、扣库存，事务持有存储的写锁，各线程的下单是串行提交的；
+这里测的是串行提交下的吞吐和正确性，线程数增加不会提高单/秒。
+
+用法（在 project 目录下）：
+    python benchmarks/bench_orders.py                   # 默认 8 线程、库存 2,000
+    python benchmarks/bench_orders.py -t 32 --stock 5000
+    python benchmarks/bench_orders.py --backend sqlite
+    python benchmarks/bench_orders.py --cart 10       # 购物车结算 vs 逐个下单（默认存储，每次整表重写）
+"""
+import argparse
+import os
+import sys
+import tempfile
+import threading
+import time
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from models import UserRole  # noqa: E402
+from services import OrderService  # noqa: E402
+from sqlite_storage import SqliteDataStore  # noqa: E402
+from storage import DataStore  # noqa: E402
+
+
+def open_store(backend: str, directory: str):
+    if backend == "sqlite":
+        return SqliteDataStore(path=os.path.join(directory, "data.db"))
+    # 日志模式：每单追加一行日志，不整表重写
+    return DataStore(path=os.path.join(directory, "data.json"), journal=True)
+
+
+def bench_cart(cart: int, rounds: int = 20):
+    # 默认（非日志）模式下每次提交都整表重写 data.json，落盘次数决定吞吐
+    with tempfile.TemporaryDirectory() as directory:
+        store = DataStore(path=os.path.join(directory, "data.json"))
+        seller = store.add_user("卖家", "13000000000", UserRole.SELLER)
+        buyer = store.add_user("买家", "13000000001", UserRole.BUYER)
+        products = [
+            store.add_product(seller.id, f"商品{i}", 1, "数码", "全新", 1.0, 10 ** 6, "描述描述描述描述描述", "C")
+            for i in range(cart)
+        ]
+        service = OrderService(store)
+        print(f"购物车 {cart} 件，{rounds} 轮：")
+
+        start = time.perf_counter()
+        for _ in range(rounds):
+            for p in products:
+                service.create_order(buyer, p, 1)
+        elapsed = time.perf_counter() - start
+        print(f"  逐个 create_order     {rounds * cart / elapsed:10,.0f} 行/秒")
+
+        start = time.perf_counter()
+        for _ in range(rounds):
+            service.create_orders(buyer, [(p.id, 1) for p in products])
+        elapsed = time.perf_counter() - start
+        print(f"  create_orders 一次结算 {rounds * cart / elapsed:10,.0f} 行/秒")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("-t", "--threads", type=int, default=8, help="并发线程数")
+    parser.add_argument("--stock", type=int, default=2_000, help="热门商品库存")
+    parser.add_argument("--backend", choices=("json", "sqlite"), default="json")
+    parser.add_argument("--cart", type=int, default=0, help="购物车件数，>0 时改测结算吞吐")
+    args = parser.parse_args()
+    if args.cart:
+        bench_cart(args.cart)
+        return
+
+    with tempfile.TemporaryDirectory() as directory:
+        store = open_store(args.backend, directory)
+        seller = store.add_user("卖家", "13000000000", UserRole.SELLER)
+        buyer = store.add_user("买家", "13000000001", UserRole.BUYER)
+        product = store.add_product(seller.id, "热门商品", 1, "数码", "全新", 1.0, args.stock, "描述描述描述描述描述", "C")
+        service = OrderService(store)
+
+        sold = [0] * args.threads
+        start_gate = threading.Barrier(args.threads)
+
+        def worker(i: int):
+            start_gate.wait()
+            while True:
+                try:
+                    service.create_order(buyer, product, 1)
+                except ValueError:  # 库存不足
+                    return
+                sold[i] += 1
+
+        threads = [threading.Thread(target=worker, args=(i,)) for i in range(args.threads)]
+        start = time.perf_counter()
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        elapsed = time.perf_counter() - start
+
+        orders = len(store.orders_by_product(product.id))
+        stock = store.find_product_by_id(product.id).stock
+        print(f"{args.backend} 后端，{args.threads} 线程，库存 {args.stock:,}")
+        print(f"成功订单 {sum(sold):,}（订单表 {orders:,}），剩余库存 {stock}")
+        print(f"超卖 {orders + stock - args.stock}，{sum(sold) / elapsed:,.0f} 单/秒")
+        if hasattr(store, "close"):
+            store.close()
+
+
+if __name__ == "__main__":
+    main()
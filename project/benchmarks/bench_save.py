@@ -0,0 +1,77 @@
+# benchmarks/bench_save.py
+"""
+落盘写放大基准：大目录下做一次修改，对比单文件与拆分文件各写了多少字节、耗时多少
+
+用法（在 project 目录下）：
+    python benchmarks/bench_save.py            # 默认 100,000 个商品
+    python benchmarks/bench_save.py -n 20000
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from models import OrderStatus, UserRole  # noqa: E402
+from services import OrderService  # noqa: E402
+from storage import DataStore  # noqa: E402
+
+
+def populate(store: DataStore, n: int):
+    with store.transaction():
+        sellers = [store.add_user(f"卖家{i}", f"130{i:08d}", UserRole.SELLER) for i in range(max(n // 50, 1))]
+        for i in range(n):
+            store.add_product(
+                sellers[i % len(sellers)].id, f"商品{i}", 1, "数码", "全新", float(i % 5000), 100,
+                "描述描述描述描述描述", "C",
+            )
+        buyer = store.add_user("买家", "13900000000", UserRole.BUYER)
+        for i in range(n // 10):
+            store.add_order(buyer.id, i % n + 1, 1, 1.0)
+    return buyer
+
+
+def written_bytes(directory: str, fn) -> tuple:
+    # 先把所有文件的修改时间调旧，执行后统计被重写的文件大小
+    old = time.time_ns() - 10 ** 10
+    for name in os.listdir(directory):
+        os.utime(os.path.join(directory, name), ns=(old, old))
+    start = time.perf_counter()
+    fn()
+    elapsed = time.perf_counter() - start
+    total = 0
+    for name in os.listdir(directory):
+        st = os.stat(os.path.join(directory, name))
+        if st.st_mtime_ns != old:
+            total += st.st_size
+    return total, elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("-n", type=int, default=100_000, help="商品数量（订单为其 1/10）")
+    args = parser.parse_args()
+
+    print(f"{args.n:,} 个商品，{args.n // 10:,} 个订单：")
+    for label, options in (("单文件 data.json", {}), ("拆分文件", {"split_files": True})):
+        with tempfile.TemporaryDirectory() as directory:
+            store = DataStore(path=os.path.join(directory, "data.json"), **options)
+            buyer = populate(store, args.n)
+            service = OrderService(store)
+            product = store.find_product_by_id(1)
+            cases = [
+                # 下单同时扣库存，会改到商品集合
+                ("下单（建单 + 扣库存）", lambda: service.create_order(buyer, product, 1)),
+                ("订单改状态", lambda: store.update_order_status(1, OrderStatus.COMPLETED)),
+                ("提交投诉", lambda: store.add_complaint(buyer.id, 1, None, "商品违规", 0, "原因")),
+            ]
+            print(f"  {label}")
+            for case, fn in cases:
+                size, elapsed = written_bytes(directory, fn)
+                print(f"    {case:<14}写入 {size / 1024:10,.0f} KiB  {elapsed * 1000:8.1f} ms")
+
+
+if __name__ == "__main__":
+    main()
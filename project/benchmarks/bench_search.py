@@ -0,0 +1,117 @@
+# benchmarks/bench_search.py
+"""
+商品搜索索引基准：构建大目录后测量各类查询的单次耗时
+
+用法（在 project 目录下）：
+    python benchmarks/bench_search.py            # 默认 500,000 个商品
+    python benchmarks/bench_search.py -n 100000
+    python benchmarks/bench_search.py --fuzzy    # 容错搜索在 n/8、n/4、n/2、n 下的耗时
+"""
+import argparse
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from search_index import ProductSearchIndex, substring_distance  # noqa: E402
+
+BRANDS = ["苹果", "华为", "小米", "索尼", "佳能", "戴森", "耐克", "优衣库", "iPhone", "Switch"]
+ITEMS = ["手机", "平板", "耳机", "相机", "镜头", "吹风机", "球鞋", "外套", "充电器", "手柄"]
+CATEGORIES = ["数码", "美妆", "服饰", "家电", "其他"]
+CONDITIONS = ["全新", "99新", "95新", "9成新"]
+
+
+def model(rng: random.Random) -> str:
+    # 型号：字母数字混合，模拟真实标题里区分度高的部分
+    return "".join(rng.choice("abcdefghijklmnopqrstuvwxyz0123456789") for _ in range(5))
+
+
+def make_index(n: int, seed: int = 1) -> ProductSearchIndex:
+    rng = random.Random(seed)
+    index = ProductSearchIndex()
+    with index.bulk_load():
+        for pid in range(1, n + 1):
+            index.upsert(
+                {
+                    "id": pid,
+                    "title": f"{rng.choice(BRANDS)}{rng.choice(ITEMS)} {model(rng)}",
+                    "price": float(rng.randint(1, 5000)),
+                    "category": rng.choice(CATEGORIES),
+                    "condition": rng.choice(CONDITIONS),
+                    "status": "在售",
+                }
+            )
+    return index
+
+
+def per_call_us(fn, repeat: int = 200) -> float:
+    start = time.perf_counter()
+    for _ in range(repeat):
+        fn()
+    return (time.perf_counter() - start) / repeat * 1e6
+
+
+def bench_fuzzy(n: int):
+    print("容错搜索（一处错字）：")
+    for size in (n // 8, n // 4, n // 2, n):
+        index = make_index(size)
+        rng = random.Random(size)
+        queries = []
+        for _ in range(50):
+            title = index._display[rng.randint(1, size)].lower()
+            i = rng.randrange(len(title))
+            queries.append(title[:i] + "#" + title[i + 1:])
+        candidates = sum(len(index._fuzzy_candidates(q, 1)) for q in queries) / len(queries)
+        start = time.perf_counter()
+        for q in queries:
+            index.fuzzy_match(q, 1)
+        us = (time.perf_counter() - start) / len(queries) * 1e6
+        print(f"  {size:>9,} 个商品  {us:10.1f} us/次  平均校验 {candidates:,.0f} 个候选")
+        if size == n // 8:
+            # 对照：不用索引，逐条算编辑距离
+            start = time.perf_counter()
+            for q in queries[:3]:
+                [pid for pid, t in index._titles.items() if substring_distance(q, t, 1) is not None]
+            us = (time.perf_counter() - start) / 3 * 1e6
+            print(f"  {size:>9,} 个商品  {us:10.1f} us/次  （全量扫描对照）")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("-n", type=int, default=500_000, help="商品数量")
+    parser.add_argument("--fuzzy", action="store_true", help="测容错搜索随目录规模的变化")
+    args = parser.parse_args()
+    if args.fuzzy:
+        bench_fuzzy(args.n)
+        return
+
+    start = time.perf_counter()
+    index = make_index(args.n)
+    print(f"{args.n:,} 个商品，建索引 {time.perf_counter() - start:.1f} s")
+
+    extra = {"id": args.n + 1, "title": "华为手机 新品", "price": 999.0, "category": "数码", "condition": "全新"}
+    cases = [
+        ("suggest('华为', 10)", lambda: index.suggest("华为", 10)),
+        ("suggest('iphone耳', 10)", lambda: index.suggest("iphone耳", 10)),
+        ("price_range(100, 110)", lambda: index.price_range(100, 110)),
+        ("upsert + discard 一个商品", lambda: (index.upsert(extra), index.discard(extra["id"]))),
+    ]
+    for label, fn in cases:
+        print(f"{label:<28}{per_call_us(fn):10.1f} us")
+
+    # 第一页 vs 整个结果集排序
+    paging = [
+        ("query(price_desc, 前 20)", lambda: index.query(sort="price_desc", limit=20)),
+        ("query(recency, 前 20)", lambda: index.query(sort="recency", limit=20)),
+        ("query(recency, 全部结果)", lambda: index.query(sort="recency")),
+        ("query('手机', relevance, 前 20)", lambda: index.query("手机", sort="relevance", limit=20)),
+        ("query('手机', relevance, 全部)", lambda: index.query("手机", sort="relevance")),
+    ]
+    for label, fn in paging:
+        print(f"{label:<28}{per_call_us(fn, repeat=5):10.1f} us")
+
+
+if __name__ == "__main__":
+    main()
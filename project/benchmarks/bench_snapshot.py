@@ -0,0 +1,161 @@
+# benchmarks/bench_snapshot.py
+"""
+冷启动基准：对比 data.json 与二进制快照 data.snap 的加载耗时和峰值内存（RSS）
+
+每项测量都在独立子进程里进行，峰值内存取子进程的 ru_maxrss，互不干扰。
+
+用法（在 project 目录下）：
+    python benchmarks/bench_snapshot.py                     # 默认 100k、1M、5M 条记录
+    python benchmarks/bench_snapshot.py -n 100000 1000000
+    python benchmarks/bench_snapshot.py -n 100000 --store   # 额外测整个 DataStore 打开（含建索引）和单次写入
+"""
+import argparse
+import json
+import os
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+from typing import Optional
+
+PROJECT_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+sys.path.insert(0, PROJECT_DIR)
+
+from snapshot import SnapshotReader, read_snapshot, write_snapshot  # noqa: E402
+
+# 测量项：名称 -> 说明
+CASES = {
+    "json": "json.load 全部",
+    "snap": "快照 全部集合",
+    "snap-lazy": "快照 只解码 users",
+}
+STORE_CASES = {
+    "store-json": "DataStore 打开 JSON",
+    "store-snap": "DataStore 打开 快照",
+    "store-json-write": "DataStore 写订单 JSON",
+    "store-snap-write": "DataStore 写订单 快照",
+}
+
+
+def make_data(n: int) -> dict:
+    # 记录构成：用户 10%、商品 40%、订单 40%、投诉 10%
+    users_n, products_n, orders_n = n // 10, n * 4 // 10, n * 4 // 10
+    complaints_n = n - users_n - products_n - orders_n
+    return {
+        "users": [
+            {"id": i, "username": f"用户{i}", "phone": f"138{i:08d}", "role": "BUYER",
+             "status": "NORMAL"}
+            for i in range(1, users_n + 1)
+        ],
+        "products": [
+            {"id": i, "seller_id": i % max(users_n, 1) + 1, "title": f"二手商品{i}", "image_count": 1,
+             "category": "数码", "condition": "9成新", "price": float(i % 5000), "stock": 1,
+             "description": "描述描述描述描述描述", "contact": "vx:123", "status": "在售"}
+            for i in range(1, products_n + 1)
+        ],
+        "orders": [
+            {"id": i, "buyer_id": i % max(users_n, 1) + 1, "product_id": i % max(products_n, 1) + 1,
+             "quantity": 1, "amount": 10.0, "status": "已完成", "created_at": "2024-01-01 00:00:00"}
+            for i in range(1, orders_n + 1)
+        ],
+        "complaints": [
+            {"id": i, "complainant_id": 1, "product_id": None, "order_id": i, "type": "订单纠纷",
+             "status": "待处理", "evidence_count": 0, "reason": "原因",
+             "submitted_at": "2024-01-01 00:00:00", "result": ""}
+            for i in range(1, complaints_n + 1)
+        ],
+        "_id_counters": {
+            "users": users_n + 1, "products": products_n + 1,
+            "orders": orders_n + 1, "complaints": complaints_n + 1,
+        },
+    }
+
+
+def peak_rss_kib() -> int:
+    # ru_maxrss 在 exec 后会沿用父进程的值，Linux 上优先读本进程的 VmHWM
+    try:
+        with open("/proc/self/status", encoding="ascii") as f:
+            for line in f:
+                if line.startswith("VmHWM:"):
+                    return int(line.split()[1])
+    except OSError:
+        pass
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+
+def measure(case: str, directory: str):
+    """子进程入口：执行一项加载并输出 耗时(秒) 峰值内存(KiB)"""
+    json_path = os.path.join(directory, "data.json")
+    snap_path = os.path.join(directory, "data.snap")
+    start = time.perf_counter()
+    if case == "json":
+        with open(json_path, "r", encoding="utf-8") as f:
+            json.load(f)
+    elif case == "snap":
+        read_snapshot(snap_path)
+    elif case == "snap-lazy":
+        with SnapshotReader(snap_path) as reader:
+            reader.load("users")
+    elif case.endswith("-write"):
+        from models import OrderStatus
+        from storage import DataStore
+
+        # 只计一次 sync 写入：第一次写会先解码订单（快照模式）并建好片段缓存，不计时
+        store = DataStore(path=json_path, snapshot=case.startswith("store-snap"))
+        store.update_order_status(1, OrderStatus.COMPLETED)
+        start = time.perf_counter()
+        store.update_order_status(2, OrderStatus.COMPLETED)
+    else:
+        from storage import DataStore
+
+        DataStore(path=json_path, snapshot=case == "store-snap")
+    elapsed = time.perf_counter() - start
+    print(elapsed, peak_rss_kib())
+
+
+def run_case(case: str, directory: str) -> Optional[tuple]:
+    """子进程异常退出（如 5M 条记录时被 OOM killer 结束）返回 None"""
+    result = subprocess.run(
+        [sys.executable, os.path.abspath(__file__), "--measure", case, directory],
+        capture_output=True, text=True, cwd=PROJECT_DIR,
+    )
+    if result.returncode != 0:
+        return None
+    out = result.stdout.split()
+    return float(out[0]), int(out[1])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("-n", type=int, nargs="+", default=[100_000, 1_000_000, 5_000_000], help="记录总数")
+    parser.add_argument("--store", action="store_true", help="同时测 DataStore 打开（含建索引，较慢）")
+    parser.add_argument("--measure", nargs=2, metavar=("CASE", "DIR"), help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    if args.measure:
+        measure(*args.measure)
+        return
+
+    cases = dict(CASES, **STORE_CASES) if args.store else CASES
+    for n in args.n:
+        with tempfile.TemporaryDirectory() as directory:
+            data = make_data(n)
+            # 与 DataStore 早期版本一样的缩进 JSON；快照由同一份数据写出
+            with open(os.path.join(directory, "data.json"), "w", encoding="utf-8") as f:
+                json.dump(data, f, ensure_ascii=False, indent=2)
+            write_snapshot(os.path.join(directory, "data.snap"), data)
+            del data
+            json_size = os.path.getsize(os.path.join(directory, "data.json"))
+            snap_size = os.path.getsize(os.path.join(directory, "data.snap"))
+            print(f"{n:,} 条记录  data.json {json_size / 2**20:,.1f} MiB  data.snap {snap_size / 2**20:,.1f} MiB")
+            for case, label in cases.items():
+                measured = run_case(case, directory)
+                if measured is None:
+                    print(f"    {label:<20}失败（多半是内存不足）")
+                    continue
+                elapsed, rss = measured
+                print(f"    {label:<20}{elapsed:8.3f} s  峰值 RSS {rss / 1024:8,.0f} MiB")
+
+
+if __name__ == "__main__":
+    main()
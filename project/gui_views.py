@@ -1,22 +1,50 @@
 # gui_views.py
 import random
 import tkinter as tk
+from datetime import datetime
 from tkinter import ttk, messagebox
 
-from models import ComplaintType, ComplaintStatus, UserRole
-from services import AuthService, ProductService, OrderService, ComplaintService, AdminService
+from models import ComplaintType, ComplaintStatus, ProductStatus, UserRole
+from services import (
+    AuthService,
+    ProductService,
+    OrderService,
+    ComplaintService,
+    ComplaintQueue,
+    AdminService,
+    ReportService,
+    PRICE_BUCKETS,
+    CONDITION_FILTERS,
+)
 from storage import DataStore
+from sqlite_storage import SqliteDataStore
+from lazy_storage import LazyDataStore
+
+
+def _strip_count(value: str) -> str:
+    # 下拉框选项带了数量后缀 "数码 (12)"，取回原始值
+    return value.rsplit(" (", 1)[0]
 
 
 class AppContext:
-    def __init__(self, root: tk.Tk):
+    def __init__(self, root: tk.Tk, backend: str = "json"):
         self.root = root
-        self.store = DataStore()
+        # backend: "json" 使用 data.json，"sqlite" 使用 data.db，"lazy" 按需读取 data.json
+        if backend == "sqlite":
+            self.store = SqliteDataStore()
+        elif backend == "lazy":
+            self.store = LazyDataStore()
+        else:
+            # 合并写盘放到后台线程，界面线程不再等待整表重写
+            self.store = DataStore(durability="group")
         self.auth_service = AuthService(self.store)
         self.product_service = ProductService(self.store)
         self.order_service = OrderService(self.store)
-        self.complaint_service = ComplaintService(self.store)
-        self.admin_service = AdminService(self.store)
+        self.order_service.recover_holds()
+        self.complaint_queue = ComplaintQueue(self.store)
+        self.complaint_service = ComplaintService(self.store, queue=self.complaint_queue)
+        self.admin_service = AdminService(self.store, queue=self.complaint_queue)
+        self.report_service = ReportService(self.store)
 
         self.current_user = None  # 当前登录用户
         self.sent_codes = {}  # phone -> code
@@ -357,8 +385,13 @@ class ProductDetailFrame(ttk.Frame):
             messagebox.showerror("错误", "请先登录")
             return
         try:
-            order = self.app.order_service.create_order(user, self.product, quantity=1)
-            messagebox.showinfo("成功", f"下单成功，订单号：{order.id}")
+            # 先锁定库存，确认支付后才转为已支付；放弃或超时自动退回库存
+            order = self.app.order_service.reserve(user, self.product, quantity=1)
+            if messagebox.askyesno("支付", f"已为您锁定库存，订单号：{order.id}\n应付 ¥{order.amount}，是否立即支付？"):
+                self.app.order_service.confirm(order.id)
+                messagebox.showinfo("成功", f"支付成功，订单号：{order.id}")
+            else:
+                self.app.order_service.cancel(order.id)
         except ValueError as e:
             messagebox.showerror("错误", str(e))
 
@@ -367,6 +400,17 @@ class ProductDetailFrame(ttk.Frame):
 
 
 class HomeFrame(ttk.Frame):
+    SUGGEST_DELAY_MS = 200
+    CATEGORIES = ["数码", "美妆", "服饰", "家电", "其他"]
+    SORT_OPTIONS = {
+        "默认": None,
+        "相关度": "relevance",
+        "最新发布": "recency",
+        "价格从低到高": "price_asc",
+        "价格从高到低": "price_desc",
+    }
+    PAGE_SIZE = 20
+
     def __init__(self, master, app: AppContext):
         super().__init__(master)
         self.app = app
@@ -380,8 +424,17 @@ class HomeFrame(ttk.Frame):
         search_entry = ttk.Entry(top, textvariable=self.search_var, width=30)
         search_entry.pack(side="left", padx=5)
         search_entry.insert(0, "搜索商品")
+        search_entry.bind("<KeyRelease>", self.on_search_key)
+
+        # 输入联想：停止输入 SUGGEST_DELAY_MS 后才查询，列表浮在输入框下方
+        self._suggest_job = None
+        self.suggest_list = tk.Listbox(self, height=6)
+        self.suggest_list.bind("<<ListboxSelect>>", self.on_suggestion_selected)
+        self.search_entry = search_entry
 
         ttk.Button(top, text="搜索", command=self.refresh_products).pack(side="left", padx=5)
+        self.fuzzy_var = tk.BooleanVar(value=False)
+        ttk.Checkbutton(top, text="容错", variable=self.fuzzy_var).pack(side="left")
         ttk.Button(top, text="我的", command=self.show_profile).pack(side="right", padx=10)
 
         # 分类和筛选
@@ -390,33 +443,56 @@ class HomeFrame(ttk.Frame):
 
         ttk.Label(filter_frame, text="分类:").pack(side="left")
         self.category_var = tk.StringVar(value="全部")
-        ttk.Combobox(
+        self.category_box = ttk.Combobox(
             filter_frame,
             textvariable=self.category_var,
-            values=["全部", "数码", "美妆", "服饰", "家电", "其他"],
-            width=8,
-        ).pack(side="left", padx=5)
+            values=["全部"] + self.CATEGORIES,
+            width=12,
+        )
+        self.category_box.pack(side="left", padx=5)
 
         ttk.Label(filter_frame, text="价格:").pack(side="left")
         self.price_var = tk.StringVar(value="全部")
-        ttk.Combobox(
+        self.price_box = ttk.Combobox(
             filter_frame,
             textvariable=self.price_var,
-            values=["全部", "0-500元", "500-1000元", "1000元以上"],
-            width=10,
-        ).pack(side="left", padx=5)
+            values=["全部"] + list(PRICE_BUCKETS),
+            width=14,
+        )
+        self.price_box.pack(side="left", padx=5)
 
         ttk.Label(filter_frame, text="新旧:").pack(side="left")
         self.condition_var = tk.StringVar(value="全部")
-        ttk.Combobox(
+        self.condition_box = ttk.Combobox(
             filter_frame,
             textvariable=self.condition_var,
-            values=["全部", "全新", "95新及以上"],
-            width=10,
-        ).pack(side="left", padx=5)
+            values=["全部"] + list(CONDITION_FILTERS),
+            width=14,
+        )
+        self.condition_box.pack(side="left", padx=5)
 
         ttk.Button(filter_frame, text="筛选", command=self.refresh_products).pack(side="left", padx=5)
 
+        # 自定义价格区间和排序
+        range_frame = ttk.Frame(self)
+        range_frame.pack(fill="x", pady=5)
+
+        ttk.Label(range_frame, text="最低价:").pack(side="left")
+        self.min_price_var = tk.StringVar()
+        ttk.Entry(range_frame, textvariable=self.min_price_var, width=8).pack(side="left", padx=5)
+        ttk.Label(range_frame, text="最高价:").pack(side="left")
+        self.max_price_var = tk.StringVar()
+        ttk.Entry(range_frame, textvariable=self.max_price_var, width=8).pack(side="left", padx=5)
+
+        ttk.Label(range_frame, text="排序:").pack(side="left")
+        self.sort_var = tk.StringVar(value="默认")
+        ttk.Combobox(
+            range_frame,
+            textvariable=self.sort_var,
+            values=list(self.SORT_OPTIONS),
+            width=12,
+        ).pack(side="left", padx=5)
+
         # 商品列表（简单用 Treeview 双列）
         self.tree = ttk.Treeview(self, columns=("title", "price"), show="headings", height=12)
         self.tree.heading("title", text="商品标题")
@@ -427,19 +503,94 @@ class HomeFrame(ttk.Frame):
 
         self.tree.bind("<Double-1>", self.on_product_double_click)
 
+        # 翻页
+        page_frame = ttk.Frame(self)
+        page_frame.pack(fill="x", pady=5)
+        self.page = 0
+        self.prev_button = ttk.Button(page_frame, text="上一页", command=lambda: self.refresh_products(self.page - 1))
+        self.prev_button.pack(side="left", padx=10)
+        self.page_label = ttk.Label(page_frame, text="第 1 页")
+        self.page_label.pack(side="left")
+        self.next_button = ttk.Button(page_frame, text="下一页", command=lambda: self.refresh_products(self.page + 1))
+        self.next_button.pack(side="left", padx=10)
+
         self.refresh_products()
 
-    def refresh_products(self):
+    def refresh_products(self, page: int = 0):
+        try:
+            min_price = float(self.min_price_var.get()) if self.min_price_var.get().strip() else None
+            max_price = float(self.max_price_var.get()) if self.max_price_var.get().strip() else None
+        except ValueError:
+            messagebox.showerror("错误", "价格区间需为数字")
+            return
         for i in self.tree.get_children():
             self.tree.delete(i)
+        keyword = self.search_var.get().strip() if self.search_var.get() != "搜索商品" else ""
         products = self.app.product_service.search(
-            keyword=self.search_var.get().strip() if self.search_var.get() != "搜索商品" else "",
-            category=self.category_var.get(),
-            condition_filter=self.condition_var.get(),
-            price_filter=self.price_var.get(),
+            keyword=keyword,
+            category=_strip_count(self.category_var.get()),
+            condition_filter=_strip_count(self.condition_var.get()),
+            price_filter=_strip_count(self.price_var.get()),
+            min_price=min_price,
+            max_price=max_price,
+            sort=self.SORT_OPTIONS.get(self.sort_var.get()),
+            fuzzy=self.fuzzy_var.get(),
+            offset=page * self.PAGE_SIZE,
+            limit=self.PAGE_SIZE + 1,  # 多取一个，判断是否还有下一页
         )
-        for p in products:
+        self.page = page
+        self.page_label.config(text=f"第 {page + 1} 页")
+        self.prev_button.state(["!disabled"] if page > 0 else ["disabled"])
+        self.next_button.state(["!disabled"] if len(products) > self.PAGE_SIZE else ["disabled"])
+        for p in products[: self.PAGE_SIZE]:
             self.tree.insert("", tk.END, iid=str(p.id), values=(p.title, f"¥{p.price}"))
+        self.refresh_facets(keyword)
+
+    def refresh_facets(self, keyword: str):
+        """筛选下拉框里显示当前关键词下各选项的商品数，如 "数码 (1,203)" """
+        facets = self.app.product_service.facets(keyword)
+        self.category_box["values"] = ["全部"] + [
+            f"{c} ({facets['category'].get(c, 0):,})" for c in self.CATEGORIES
+        ]
+        self.condition_box["values"] = ["全部"] + [
+            f"{name} ({sum(facets['condition'].get(c.value, 0) for c in levels):,})"
+            for name, levels in CONDITION_FILTERS.items()
+        ]
+        self.price_box["values"] = ["全部"] + [f"{name} ({n:,})" for name, n in facets["price"].items()]
+
+    def on_search_key(self, event):
+        if event.keysym in ("Return", "KP_Enter"):
+            self.hide_suggestions()
+            self.refresh_products()
+            return
+        if self._suggest_job is not None:
+            self.after_cancel(self._suggest_job)
+        self._suggest_job = self.after(self.SUGGEST_DELAY_MS, self.show_suggestions)
+
+    def show_suggestions(self):
+        self._suggest_job = None
+        text = self.search_var.get()
+        titles = self.app.product_service.suggest(text, limit=6) if text != "搜索商品" else []
+        if not titles:
+            self.hide_suggestions()
+            return
+        self.suggest_list.delete(0, tk.END)
+        for title in titles:
+            self.suggest_list.insert(tk.END, title)
+        self.suggest_list.configure(height=len(titles))
+        self.suggest_list.place(in_=self.search_entry, x=0, rely=1.0, relwidth=1.0)
+        self.suggest_list.lift()
+
+    def hide_suggestions(self):
+        self.suggest_list.place_forget()
+
+    def on_suggestion_selected(self, event):
+        selection = self.suggest_list.curselection()
+        if not selection:
+            return
+        self.search_var.set(self.suggest_list.get(selection[0]))
+        self.hide_suggestions()
+        self.refresh_products()
 
     def on_product_double_click(self, event):
         item = self.tree.focus()
@@ -491,6 +642,7 @@ class AdminFrame(ttk.Frame):
             columns=("username", "phone", "role", "status"),
             show="headings",
             height=10,
+            selectmode="extended",
         )
         tree.heading("username", text="用户名")
         tree.heading("phone", text="手机号")
@@ -503,6 +655,8 @@ class AdminFrame(ttk.Frame):
         btn_frame.pack(pady=5)
         ttk.Button(btn_frame, text="刷新", command=self.refresh_users).pack(side="left", padx=5)
         ttk.Button(btn_frame, text="封禁选中用户", command=self.ban_user).pack(side="left", padx=5)
+        self.cascade_var = tk.BooleanVar(value=False)
+        ttk.Checkbutton(btn_frame, text="同时下架其全部商品", variable=self.cascade_var).pack(side="left", padx=5)
 
         self.refresh_users()
 
@@ -518,17 +672,21 @@ class AdminFrame(ttk.Frame):
             )
 
     def ban_user(self):
-        item = self.user_tree.focus()
-        if not item:
+        # 支持 Ctrl/Shift 多选，一次提交
+        uids = [int(item) for item in self.user_tree.selection()]
+        if not uids:
             messagebox.showwarning("提示", "请选择用户")
             return
-        uid = int(item)
         reason = tk.simpledialog.askstring("封禁原因", "请输入封禁原因：")
         if not reason:
             return
-        self.app.admin_service.ban_user(uid, reason)
-        messagebox.showinfo("成功", "用户已封禁")
+        taken_down = self.app.admin_service.ban_users(uids, reason, cascade=self.cascade_var.get())
+        message = f"已封禁 {len(uids)} 个用户"
+        if self.cascade_var.get():
+            message += f"，下架商品 {taken_down} 件"
+        messagebox.showinfo("成功", message)
         self.refresh_users()
+        self.refresh_products()
 
     def init_product_tab(self):
         # 商品管理
@@ -540,6 +698,7 @@ class AdminFrame(ttk.Frame):
             columns=("title", "status"),
             show="headings",
             height=8,
+            selectmode="extended",
         )
         tree.heading("title", text="商品标题")
         tree.heading("status", text="状态")
@@ -548,6 +707,14 @@ class AdminFrame(ttk.Frame):
 
         btn_frame = ttk.Frame(prod_frame)
         btn_frame.pack(pady=5)
+        ttk.Label(btn_frame, text="状态:").pack(side="left")
+        self.product_status_var = tk.StringVar(value="全部")
+        ttk.Combobox(
+            btn_frame,
+            textvariable=self.product_status_var,
+            values=["全部"] + [s.value for s in ProductStatus],
+            width=8,
+        ).pack(side="left", padx=5)
         ttk.Button(btn_frame, text="刷新", command=self.refresh_products).pack(side="left", padx=5)
         ttk.Button(btn_frame, text="违规下架选中商品", command=self.takedown_product).pack(side="left", padx=5)
 
@@ -555,6 +722,10 @@ class AdminFrame(ttk.Frame):
         order_frame = ttk.Labelframe(self.product_tab, text="订单管理")
         order_frame.pack(fill="both", expand=True, padx=5, pady=5)
 
+        # 销售汇总：直接读增量维护的汇总表
+        self.sales_label = ttk.Label(order_frame, justify="left")
+        self.sales_label.pack(fill="x", padx=5)
+
         otree = ttk.Treeview(
             order_frame,
             columns=("order_id", "product_id", "amount", "status"),
@@ -568,7 +739,12 @@ class AdminFrame(ttk.Frame):
         otree.pack(fill="both", expand=True, padx=5, pady=5)
         self.order_tree = otree
 
-        ttk.Button(order_frame, text="刷新订单", command=self.refresh_orders).pack(pady=5)
+        order_btn_frame = ttk.Frame(order_frame)
+        order_btn_frame.pack(pady=5)
+        ttk.Label(order_btn_frame, text="买家ID:").pack(side="left")
+        self.order_buyer_var = tk.StringVar()
+        ttk.Entry(order_btn_frame, textvariable=self.order_buyer_var, width=8).pack(side="left", padx=5)
+        ttk.Button(order_btn_frame, text="刷新订单", command=self.refresh_orders).pack(side="left", padx=5)
 
         self.refresh_products()
         self.refresh_orders()
@@ -576,7 +752,8 @@ class AdminFrame(ttk.Frame):
     def refresh_products(self):
         for i in self.product_tree.get_children():
             self.product_tree.delete(i)
-        for p in self.app.admin_service.list_products():
+        status = self.product_status_var.get()
+        for p in self.app.admin_service.list_products(None if status == "全部" else status):
             self.product_tree.insert(
                 "",
                 tk.END,
@@ -585,28 +762,41 @@ class AdminFrame(ttk.Frame):
             )
 
     def takedown_product(self):
-        item = self.product_tree.focus()
-        if not item:
+        pids = [int(item) for item in self.product_tree.selection()]
+        if not pids:
             messagebox.showwarning("提示", "请选择商品")
             return
-        pid = int(item)
         reason = tk.simpledialog.askstring("下架原因", "请输入违规原因：")
         if not reason:
             return
-        self.app.admin_service.takedown_product(pid, reason)
-        messagebox.showinfo("成功", "商品已违规下架")
+        count = self.app.admin_service.takedown_products(pids, reason)
+        messagebox.showinfo("成功", f"已违规下架 {count} 件商品")
         self.refresh_products()
 
     def refresh_orders(self):
         for i in self.order_tree.get_children():
             self.order_tree.delete(i)
-        for o in self.app.admin_service.list_orders():
+        buyer = self.order_buyer_var.get().strip()
+        buyer_id = int(buyer) if buyer.isdigit() else None
+        for o in self.app.admin_service.list_orders(buyer_id):
             self.order_tree.insert(
                 "",
                 tk.END,
                 iid=str(o.id),
                 values=(o.id, o.product_id, o.amount, o.status.value),
             )
+        self.refresh_sales()
+
+    def refresh_sales(self):
+        report = self.app.report_service
+        totals = report.totals()
+        today = report.sales_by_day().get(datetime.now().date().isoformat(), {"orders": 0, "amount": 0})
+        top = sorted(report.sales_by_category().items(), key=lambda kv: -kv[1]["amount"])[:3]
+        self.sales_label.config(
+            text=f"已成交 {totals['orders']} 单 / {totals['quantity']} 件，成交额 ¥{totals['amount']:,.2f}"
+            f"　今日 {today['orders']} 单 ¥{today['amount']:,.2f}\n"
+            + "分类前三：" + ("、".join(f"{c} ¥{v['amount']:,.2f}" for c, v in top) or "暂无")
+        )
 
     def init_complaint_tab(self):
         tree = ttk.Treeview(
@@ -625,7 +815,16 @@ class AdminFrame(ttk.Frame):
 
         btn_frame = ttk.Frame(self.complaint_tab)
         btn_frame.pack(pady=5)
+        ttk.Label(btn_frame, text="状态:").pack(side="left")
+        self.complaint_status_var = tk.StringVar(value="全部")
+        ttk.Combobox(
+            btn_frame,
+            textvariable=self.complaint_status_var,
+            values=["全部"] + [s.value for s in ComplaintStatus],
+            width=8,
+        ).pack(side="left", padx=5)
         ttk.Button(btn_frame, text="刷新", command=self.refresh_complaints).pack(side="left", padx=5)
+        ttk.Button(btn_frame, text="领取下一条", command=self.claim_complaint).pack(side="left", padx=5)
         ttk.Button(btn_frame, text="标记为已解决", command=lambda: self.handle_complaint(ComplaintStatus.RESOLVED)).pack(
             side="left", padx=5
         )
@@ -638,7 +837,8 @@ class AdminFrame(ttk.Frame):
     def refresh_complaints(self):
         for i in self.complaint_tree.get_children():
             self.complaint_tree.delete(i)
-        for c in self.app.admin_service.list_complaints():
+        status = self.complaint_status_var.get()
+        for c in self.app.admin_service.list_complaints(None if status == "全部" else status):
             product_info = c.product_id or c.order_id or "-"
             self.complaint_tree.insert(
                 "",
@@ -653,6 +853,18 @@ class AdminFrame(ttk.Frame):
                 ),
             )
 
+    def claim_complaint(self):
+        """从工单队列领取优先级最高的投诉，其他管理员不会再领到它"""
+        c = self.app.complaint_queue.claim(self.app.current_user.id)
+        if c is None:
+            messagebox.showinfo("提示", "暂无待处理投诉")
+            return
+        self.refresh_complaints()
+        if self.complaint_tree.exists(str(c.id)):
+            self.complaint_tree.selection_set(str(c.id))
+            self.complaint_tree.focus(str(c.id))
+        messagebox.showinfo("已领取", f"投诉 {c.id}（{c.type.value}）已分配给你，请在租约到期前处理")
+
     def handle_complaint(self, status: ComplaintStatus):
         item = self.complaint_tree.focus()
         if not item:
@@ -662,7 +874,16 @@ class AdminFrame(ttk.Frame):
         result = tk.simpledialog.askstring("处理结果", "请输入处理结果：")
         if not result:
             return
-        self.app.admin_service.handle_complaint(cid, status.value, result)
+        queue, admin_id = self.app.complaint_queue, self.app.current_user.id
+        try:
+            if queue.holder(cid) is not None:
+                # 已被领取的投诉只能由领取人处理
+                queue.complete(cid, admin_id, status.value, result)
+            else:
+                self.app.admin_service.handle_complaint(cid, status.value, result)
+        except ValueError as e:
+            messagebox.showerror("错误", str(e))
+            return
         messagebox.showinfo("成功", "已更新投诉状态")
         self.refresh_complaints()
 
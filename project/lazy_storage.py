@@ -0,0 +1,526 @@
+# lazy_storage.py
+"""
+按需加载的 data.json 存储：LazyDataStore
+
+打开时不解析记录，只扫描一遍文件，记下每条记录的 id 和字节范围；
+按 id 查找、分页列表都从内存映射的文件里只解码用到的那几条。
+"""
+import json
+import mmap
+import os
+import re
+from array import array
+from bisect import bisect_left, bisect_right
+from collections import OrderedDict
+from itertools import islice
+from typing import Dict, Iterable, Iterator, Optional, Set, Tuple
+
+from models import ComplaintStatus, OrderStatus, ProductStatus, UserRole
+from search_index import ProductSearchIndex
+from storage import COLLECTIONS, MODELS, SALES_DIMENSIONS, SECONDARY_INDEXES, DataStore
+
+_OPEN = re.compile(rb"\s*\{")
+_CLOSE = re.compile(rb"\s*\}\s*\Z")
+_KEY = re.compile(rb'\s*,?\s*"((?:[^"\\]|\\.)*)"\s*:\s*([\[{])')
+_ITEM = re.compile(rb"\s*,?\s*([{\]])")
+# 不含嵌套对象或数组的 JSON 对象，模型的 to_dict() 都是这种
+_OBJECT = re.compile(rb'\{(?:[^{}"]|"(?:[^"\\]|\\.)*")*\}')
+_ID = re.compile(rb'"id"\s*:\s*(-?\d+)')
+_PHONE = re.compile(rb'"phone"\s*:\s*("(?:[^"\\]|\\.)*")')
+# DataStore 写出的 data.json 每行一条记录、id 在最前（见 DataStore._collection_parts / _join_parts）
+_LINE_HEAD = re.compile(rb'\{"id": (-?\d+)[,}]')
+
+
+def _status_forms(statuses: Iterable[str]) -> Dict[bytes, str]:
+    """状态值在文件里可能的写法（UTF-8 原样，或 ensure_ascii 转义后的 \\uXXXX）-> 状态值"""
+    return {form: s for s in statuses for form in (s.encode("utf-8"), json.dumps(s)[1:-1].encode("ascii"))}
+
+
+def _status_pattern(forms: Iterable[bytes]):
+    return re.compile(rb'"status"\s*:\s*"(%s)"' % b"|".join(re.escape(f) for f in forms))
+
+
+_NOT_ON_SALE = _status_pattern(_status_forms(s.value for s in ProductStatus if s != ProductStatus.ON_SALE))
+
+# 打开时顺带记下这几种状态的记录 id：启动时恢复订单到期、投诉队列只查它们，不必解码整个集合
+TRACKED_STATUSES = {
+    "orders_by_status": (OrderStatus.CREATED.value,),
+    "complaints_by_status": (ComplaintStatus.PENDING.value, ComplaintStatus.IN_PROGRESS.value),
+}
+
+
+class _Offsets:
+    """一个集合里各条记录的 id 和在文件中的 [start, end)，按文件中的顺序"""
+
+    __slots__ = ("ids", "starts", "ends", "_positions")
+
+    def __init__(self):
+        self.ids = array("q")
+        self.starts = array("q")
+        self.ends = array("q")
+        self._positions = None  # id 不是递增时才建 id -> 下标 的字典，否则二分查找
+
+    def __len__(self):
+        return len(self.ids)
+
+    def append(self, rid: int, start: int, end: int):
+        if self._positions is None and self.ids and rid <= self.ids[-1]:
+            self._positions = {r: i for i, r in enumerate(self.ids)}
+        if self._positions is not None:
+            self._positions.setdefault(rid, len(self.ids))
+        self.ids.append(rid)
+        self.starts.append(start)
+        self.ends.append(end)
+
+    def scan_lines(self, buf, pos: int) -> int:
+        """
+        从 pos 起连续读取每行一条的记录：先找行尾，再确认从行首起的整个对象正好在行尾结束。
+        返回停下的位置（集合结尾，或遇到不是这种格式的记录，如一行多条、整个文件写在一行），
+        由调用方接着通用解析。
+        """
+        match, find, whole = _LINE_HEAD.match, buf.find, _OBJECT.match
+        ids, starts, ends = self.ids, self.starts, self.ends
+        last = ids[-1] if ids else None
+        while True:
+            head = match(buf, pos)
+            nl = find(b"\n", pos) if head is not None else -1
+            if nl < 0:
+                return pos
+            end = nl - 1 if buf[nl - 1] == 0x0D else nl  # \r\n
+            more = buf[end - 1] == 0x2C  # ,
+            if more:
+                end -= 1
+            obj = whole(buf, pos)
+            if obj is None or obj.end() != end:
+                return pos
+            rid = int(head.group(1))
+            if self._positions is None and (last is None or rid > last):
+                ids.append(rid)
+                starts.append(pos)
+                ends.append(end)
+            else:
+                self.append(rid, pos, end)
+            last = rid
+            if not more:
+                return end
+            pos = nl + 1
+
+    def position(self, rid: int) -> int:
+        """记录的下标，不存在时返回 -1"""
+        if self._positions is not None:
+            return self._positions.get(rid, -1)
+        i = bisect_left(self.ids, rid)
+        return i if i < len(self.ids) and self.ids[i] == rid else -1
+
+
+def scan_offsets(buf) -> Tuple[Dict[str, _Offsets], Dict[str, int], dict]:
+    """
+    扫描整个 data.json，返回 ({集合: 偏移表}, {手机号: 用户 id}, _id_counters)。
+    记录本身不解码，只用正则取出 id（用户额外取手机号）。
+    """
+    offsets = {c: _Offsets() for c in COLLECTIONS}
+    phones = {}
+    counters = {}
+    m = _OPEN.match(buf)
+    if m is None:
+        raise ValueError("data.json 格式错误：顶层不是对象")
+    pos = m.end()
+    while not _CLOSE.match(buf, pos):
+        m = _KEY.match(buf, pos)
+        if m is None:
+            raise ValueError(f"data.json 格式错误：位置 {pos}")
+        name = m.group(1).decode("utf-8")
+        if m.group(2) == b"{":
+            obj = _OBJECT.match(buf, m.start(2))
+            if obj is None:
+                raise ValueError(f"data.json 格式错误：{name} 无法识别")
+            if name == "_id_counters":
+                counters = json.loads(obj.group())
+            pos = obj.end()
+            continue
+        table = offsets.get(name)  # 不认识的集合只跳过
+        pos = m.end()
+        while True:
+            item = _ITEM.match(buf, pos)
+            if item is None:
+                raise ValueError(f"data.json 格式错误：位置 {pos}")
+            if item.group(1) == b"]":
+                pos = item.end()
+                break
+            start = item.start(1)
+            if table is not None:
+                pos = table.scan_lines(buf, start)
+                if pos != start:
+                    continue
+            obj = _OBJECT.match(buf, start)
+            if obj is None:
+                raise ValueError(f"data.json 格式错误：{name} 中有无法识别的记录")
+            pos = obj.end()
+            if table is None:
+                continue
+            rid = _ID.search(buf, start, pos)
+            if rid is None:
+                raise ValueError(f"data.json 格式错误：{name} 中有记录缺少 id")
+            table.append(int(rid.group(1)), start, pos)
+    users = offsets["users"]
+    for i, rid in enumerate(users.ids):
+        phone = _PHONE.search(buf, users.starts[i], users.ends[i])
+        if phone is not None:
+            raw = phone.group(1)
+            phone = json.loads(raw) if b"\\" in raw else raw[1:-1].decode("utf-8")
+            # 与 DataStore 一致：同号多条时以第一条为准
+            phones.setdefault(phone, rid)
+    return offsets, phones, counters
+
+
+def scan_statuses(buf, offsets: _Offsets, statuses: Iterable[str]) -> Dict[str, Set[int]]:
+    """
+    在集合所在的字节范围里搜索 "status": "<状态>"，按偏移表找到所属记录，
+    返回 {状态: 记录 id 集合}。记录本身不解码，查询时再核对。
+    """
+    found = {status: set() for status in statuses}
+    if not len(offsets):
+        return found
+    forms = _status_forms(found)
+    pattern = _status_pattern(forms)
+    starts, ends, ids = offsets.starts, offsets.ends, offsets.ids
+    for m in pattern.finditer(buf, starts[0], max(ends)):
+        i = bisect_right(starts, m.start()) - 1
+        if i >= 0 and m.end() <= ends[i]:
+            found[forms[m.group(1)]].add(ids[i])
+    return found
+
+
+class LazyDataStore(DataStore):
+    """
+    读多写少场景下的 data.json 存储，对外方法与 DataStore 一致
+
+    打开时只建字节偏移索引，find_*_by_id、find_user_by_phone 和分页的 list_*(offset, limit)
+    只解码需要的记录；转换好的模型对象放在最多 cache_size 个的 LRU 里，
+    内存占用取决于实际访问的记录而不是整个文件。
+
+    修改按日志模式记录（与 DataStore(journal=True) 的 data.json.log 格式相同），
+    改动过的记录留在内存里，检查点时写回 data.json，未改动的记录按原字节复制。
+    二级索引只有 TRACKED_STATUSES 里的几种状态（打开时从字节里找出），
+    其余 products_by_seller、orders_by_* 等查询逐条扫描集合；
+    搜索索引和销售汇总在第一次用到时扫描建立，之后增量维护。
+    """
+
+    def __init__(
+        self,
+        path: str = "data.json",
+        cache_size: int = 10000,
+        checkpoint_interval: int = 1000,
+        durability: str = "sync",
+    ):
+        self.cache_size = cache_size
+        self._cache = OrderedDict()  # (集合, id) -> 模型对象，最近用过的在末尾
+        self._file = None
+        self._map = None
+        self._offsets = {c: _Offsets() for c in COLLECTIONS}
+        self._overlay = {c: {} for c in COLLECTIONS}  # 上次检查点以来新增或改动的记录：id -> record
+        self._inserted = {c: [] for c in COLLECTIONS}  # 其中新增记录的 id，按插入顺序
+        self._phones = {}  # phone -> user id
+        self._search_index = None
+        self._status_ids = {}  # 索引名 -> {状态: 记录 id 集合}，只含 TRACKED_STATUSES
+        super().__init__(path, journal=True, checkpoint_interval=checkpoint_interval, durability=durability)
+
+    # ------------ 加载 / 检查点 ------------
+
+    def _load(self):
+        # 搜索索引和销售汇总不在打开时建立
+        self._search_index = None
+        self._sales = None
+        self._status_ids = {index: {s: set() for s in statuses} for index, statuses in TRACKED_STATUSES.items()}
+        if os.path.exists(self.path) and os.path.getsize(self.path):
+            self._open_map()
+            self._offsets, self._phones, saved = scan_offsets(self._map)
+            counters = self.data["_id_counters"]
+            counters.update(saved)
+            for c, offsets in self._offsets.items():
+                if len(offsets):
+                    counters[c] = max(counters.get(c, 1), max(offsets.ids) + 1)
+            for index, statuses in TRACKED_STATUSES.items():
+                collection = SECONDARY_INDEXES[index][0]
+                self._status_ids[index] = scan_statuses(self._map, self._offsets[collection], statuses)
+        if os.path.exists(self.log_path):
+            self._replay_log()
+
+    def _open_map(self):
+        self._file = open(self.path, "rb")
+        self._map = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+
+    def _close_map(self):
+        if self._map is not None:
+            self._map.close()
+            self._map = None
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+    def _iter_raw(self, collection: str) -> Iterator[Tuple[int, bytes]]:
+        # 调用方已持有 self._lock
+        offsets = self._offsets[collection]
+        overlay = self._overlay[collection]
+        for i, rid in enumerate(offsets.ids):
+            record = overlay.get(rid)
+            if record is None:
+                yield rid, self._map[offsets.starts[i]:offsets.ends[i]]
+            else:
+                yield rid, json.dumps(record, ensure_ascii=False).encode("utf-8")
+        for rid in self._inserted[collection]:
+            yield rid, json.dumps(overlay[rid], ensure_ascii=False).encode("utf-8")
+
+    def _prepare_checkpoint(self):
+        """
+        把改动过的记录写回 data.json 并清空日志，偏移表在写的同时重建。
+        读取依赖文件映射，替换文件和重新映射只能在锁内完成，所以这里直接写完，返回空操作。
+        """
+        self._pending = []
+        self._pending_since = None
+        offsets = {c: _Offsets() for c in COLLECTIONS}
+        tmp_path = self.path + ".tmp"
+        with self._io_lock:
+            with open(tmp_path, "wb") as f:
+                pos = f.write(b"{\n")
+                for c in COLLECTIONS:
+                    pos += f.write(json.dumps(c).encode("utf-8") + b": [")
+                    table = offsets[c]
+                    for rid, raw in self._iter_raw(c):
+                        pos += f.write(b",\n" if len(table) else b"\n")
+                        table.append(rid, pos, pos + len(raw))
+                        pos += f.write(raw)
+                    pos += f.write(b"\n],\n" if len(table) else b"],\n")
+                counters = json.dumps(self.data["_id_counters"], ensure_ascii=False)
+                f.write(f'"_id_counters": {counters}\n}}\n'.encode("utf-8"))
+            # 被映射的文件在部分平台上不能被替换，先解除映射
+            self._close_map()
+            os.replace(tmp_path, self.path)
+            self._open_map()
+            if os.path.exists(self.log_path):
+                os.remove(self.log_path)
+        self._offsets = offsets
+        self._overlay = {c: {} for c in COLLECTIONS}
+        self._inserted = {c: [] for c in COLLECTIONS}
+        self._log_count = 0
+        return lambda: None
+
+    # ------------ 记录读取 / 对象缓存 ------------
+
+    def _record(self, collection: str, rid: int) -> Optional[dict]:
+        """覆盖层里的记录直接返回；文件里的记录每次解码出一份新的 dict"""
+        with self._lock:
+            record = self._overlay[collection].get(rid)
+            if record is not None:
+                return record
+            offsets = self._offsets[collection]
+            i = offsets.position(rid)
+            if i < 0:
+                return None
+            return json.loads(self._map[offsets.starts[i]:offsets.ends[i]])
+
+    def _iter_records(self, collection: str, start: int = 0) -> Iterator[dict]:
+        """从第 start 条开始按顺序逐条解码；调用方已持有 self._lock"""
+        offsets = self._offsets[collection]
+        overlay = self._overlay[collection]
+        for i in range(start, len(offsets)):
+            record = overlay.get(offsets.ids[i])
+            yield record if record is not None else json.loads(self._map[offsets.starts[i]:offsets.ends[i]])
+        for rid in self._inserted[collection][max(start - len(offsets), 0):]:
+            yield overlay[rid]
+
+    def _hydrate(self, collection: str, record: dict):
+        key = (collection, record["id"])
+        with self._lock:
+            obj = self._cache.get(key)
+            if obj is not None:
+                self._cache.move_to_end(key)
+                return obj
+            obj = self._cache[key] = MODELS[collection].from_dict(record)
+            if len(self._cache) > self.cache_size:
+                self._cache.popitem(last=False)
+            return obj
+
+    def _invalidate(self, collection: str, record: dict):
+        self._cache.pop((collection, record["id"]), None)
+        if collection == "products":
+            self.product_version += 1
+
+    def _find(self, collection: str, rid: int):
+        with self._lock:
+            obj = self._cache.get((collection, rid))
+            if obj is not None:
+                self._cache.move_to_end((collection, rid))
+                return obj
+            record = self._record(collection, rid)
+            return self._hydrate(collection, record) if record is not None else None
+
+    def _list(self, collection: str, offset: int = 0, limit: Optional[int] = None) -> list:
+        with self._lock:
+            records = self._iter_records(collection, offset)
+            if limit is not None:
+                records = islice(records, limit)
+            return [self._hydrate(collection, r) for r in records]
+
+    def _lookup(self, index: str, key) -> list:
+        collection, key_of = SECONDARY_INDEXES[index]
+        with self._lock:
+            ids = self._status_ids.get(index, {}).get(key)
+            if ids is not None:
+                records = (self._record(collection, rid) for rid in sorted(ids))
+                matches = [r for r in records if r is not None and key_of(r) == key]
+                return [self._hydrate(collection, r) for r in matches]
+            matches = [r for r in self._iter_records(collection) if key_of(r) == key]
+            matches.sort(key=lambda r: r["id"])
+            return [self._hydrate(collection, r) for r in matches]
+
+    # ------------ 搜索索引 / 销售汇总（按需建立） ------------
+
+    def _iter_on_sale(self) -> Iterator[dict]:
+        """只解码可能在售的商品：字节里写明了其他状态的记录直接跳过；调用方已持有 self._lock"""
+        offsets = self._offsets["products"]
+        overlay = self._overlay["products"]
+        for i, rid in enumerate(offsets.ids):
+            record = overlay.get(rid)
+            if record is None:
+                if _NOT_ON_SALE.search(self._map, offsets.starts[i], offsets.ends[i]):
+                    continue
+                record = json.loads(self._map[offsets.starts[i]:offsets.ends[i]])
+            yield record
+        for rid in self._inserted["products"]:
+            yield overlay[rid]
+
+    @property
+    def search_index(self) -> ProductSearchIndex:
+        with self._lock:
+            if self._search_index is None:
+                index = ProductSearchIndex()
+                with index.bulk_load():
+                    for record in self._iter_on_sale():
+                        index.upsert(record)
+                self._search_index = index
+            return self._search_index
+
+    @search_index.setter
+    def search_index(self, index: ProductSearchIndex):
+        # DataStore.__init__ 会先放一个空索引，_load() 再把它清掉
+        self._search_index = index
+
+    def _track_status(self, collection: str, record: dict, add: bool):
+        for index in TRACKED_STATUSES:
+            indexed, key_of = SECONDARY_INDEXES[index]
+            ids = self._status_ids[index].get(key_of(record)) if indexed == collection else None
+            if ids is not None:
+                if add:
+                    ids.add(record["id"])
+                else:
+                    ids.discard(record["id"])
+
+    def _index_secondary(self, collection: str, record: dict):
+        self._track_status(collection, record, True)
+        if collection == "products":
+            self.product_version += 1
+            if self._search_index is not None:
+                self._search_index.upsert(record)
+        elif collection == "orders" and self._sales is not None:
+            self._add_sale(record, 1)
+
+    def _unindex_secondary(self, collection: str, record: dict):
+        self._track_status(collection, record, False)
+        if collection == "orders" and self._sales is not None:
+            self._add_sale(record, -1)
+
+    def sales_summary(self, dimension: str) -> dict:
+        with self._lock:
+            if self._sales is None:
+                self.rebuild_sales()
+            return super().sales_summary(dimension)
+
+    def rebuild_sales(self):
+        """丢弃销售汇总，按全部订单重新统计"""
+        with self._lock:
+            self._sales = {d: {} for d in SALES_DIMENSIONS}
+            for order in self._iter_records("orders"):
+                self._add_sale(order, 1)
+
+    # ------------ 修改 ------------
+
+    def _add(self, collection: str, record: dict):
+        rid = record["id"]
+        self._overlay[collection][rid] = record
+        if self._offsets[collection].position(rid) < 0:
+            # 已在文件里的（检查点后没来得及删掉的日志重放）只当作覆盖
+            self._inserted[collection].append(rid)
+        if collection == "users":
+            self._phones.setdefault(record["phone"], rid)
+        self._invalidate(collection, record)
+        self._index_secondary(collection, record)
+
+    def _insert(self, collection: str, record: dict):
+        with self._lock:
+            self._add(collection, record)
+            if self._tx_depth:
+                self._tx_undo.append(("insert", collection, record["id"], None))
+            self._commit({"op": "insert", "c": collection, "r": record})
+
+    def _update(self, collection: str, rid: int, **fields) -> Optional[dict]:
+        with self._lock:
+            record = self._record(collection, rid)
+            if record is None:
+                return None
+            overlay = self._overlay[collection]
+            if self._tx_depth:
+                # 回滚时恢复覆盖层原样：原来不在覆盖层的记录移出去即可
+                prev = overlay.get(rid)
+                self._tx_undo.append(("update", collection, rid, dict(prev) if prev is not None else None))
+            overlay[rid] = record
+            self._modify(collection, record, fields)
+            self._commit({"op": "update", "c": collection, "id": rid, "f": fields})
+            return record
+
+    def _rollback(self, counters: dict):
+        for op, collection, rid, prev in reversed(self._tx_undo):
+            overlay = self._overlay[collection]
+            record = overlay.pop(rid)
+            self._invalidate(collection, record)
+            self._unindex_secondary(collection, record)
+            if op == "insert":
+                # 倒序撤销，事务内插入的记录总在末尾
+                self._inserted[collection].pop()
+                if collection == "users" and self._phones.get(record["phone"]) == rid:
+                    del self._phones[record["phone"]]
+                if collection == "products" and self._search_index is not None:
+                    self._search_index.discard(rid)
+            else:
+                if prev is not None:
+                    overlay[rid] = prev
+                self._index_secondary(collection, self._record(collection, rid))
+        self.data["_id_counters"] = counters
+        self._tx_entries = []
+        self._tx_undo = []
+
+    def _apply(self, entry: dict):
+        collection = entry["c"]
+        if entry["op"] == "insert":
+            record = entry["r"]
+            self._add(collection, record)
+            counters = self.data["_id_counters"]
+            counters[collection] = max(counters.get(collection, 1), record["id"] + 1)
+        elif entry["op"] == "update":
+            record = self._record(collection, entry["id"])
+            if record is not None:
+                self._overlay[collection][entry["id"]] = record
+                self._modify(collection, record, entry["f"])
+
+    # ------------ 用户 ------------
+
+    def _ensure_admin_user(self):
+        with self._lock:
+            # 管理员通常是第一条用户记录，找到就停，不会扫完整个集合
+            if any(r["role"] == UserRole.ADMIN.value for r in self._iter_records("users")):
+                return
+            super()._ensure_admin_user()
+
+    def find_user_by_phone(self, phone: str):
+        rid = self._phones.get(phone)
+        return self._find("users", rid) if rid is not None else None
@@ -1,6 +1,6 @@
 # models.py
 from __future__ import annotations
-from dataclasses import dataclass, asdict
+from dataclasses import dataclass
 from enum import Enum
 from typing import Optional
 from datetime import datetime
@@ -50,7 +50,27 @@ class ComplaintStatus(str, Enum):
     REJECTED = "已驳回"
 
 
-@dataclass
+# 枚举值 -> 成员的查找表，from_dict 走字典查找而不是 Enum(value)
+def _members(enum_cls):
+    return {m.value: m for m in enum_cls}
+
+
+_USER_ROLES = _members(UserRole)
+_USER_STATUSES = _members(UserStatus)
+_CONDITIONS = _members(ConditionLevel)
+_PRODUCT_STATUSES = _members(ProductStatus)
+_ORDER_STATUSES = _members(OrderStatus)
+_COMPLAINT_TYPES = _members(ComplaintType)
+_COMPLAINT_STATUSES = _members(ComplaintStatus)
+
+
+def _enum(table: dict, enum_cls, value):
+    member = table.get(value)
+    # 查不到时交给 Enum 本身，保持原来的 ValueError
+    return member if member is not None else enum_cls(value)
+
+
+@dataclass(slots=True)
 class User:
     id: int
     username: str
@@ -59,23 +79,26 @@ class User:
     status: UserStatus = UserStatus.NORMAL
 
     def to_dict(self):
-        d = asdict(self)
-        d["role"] = self.role.value
-        d["status"] = self.status.value
-        return d
+        return {
+            "id": self.id,
+            "username": self.username,
+            "phone": self.phone,
+            "role": self.role.value,
+            "status": self.status.value,
+        }
 
     @staticmethod
     def from_dict(d: dict) -> "User":
         return User(
-            id=d["id"],
-            username=d["username"],
-            phone=d["phone"],
-            role=UserRole(d["role"]),
-            status=UserStatus(d.get("status", "NORMAL")),
+            d["id"],
+            d["username"],
+            d["phone"],
+            _enum(_USER_ROLES, UserRole, d["role"]),
+            _enum(_USER_STATUSES, UserStatus, d.get("status", "NORMAL")),
         )
 
 
-@dataclass
+@dataclass(slots=True)
 class Product:
     id: int
     seller_id: int
@@ -90,29 +113,39 @@ class Product:
     status: ProductStatus = ProductStatus.ON_SALE
 
     def to_dict(self):
-        d = asdict(self)
-        d["condition"] = self.condition.value
-        d["status"] = self.status.value
-        return d
+        return {
+            "id": self.id,
+            "seller_id": self.seller_id,
+            "title": self.title,
+            "image_count": self.image_count,
+            "category": self.category,
+            "condition": self.condition.value,
+            "price": self.price,
+            "stock": self.stock,
+            "description": self.description,
+            "contact": self.contact,
+            "status": self.status.value,
+        }
 
     @staticmethod
     def from_dict(d: dict) -> "Product":
+        get = d.get
         return Product(
-            id=d["id"],
-            seller_id=d["seller_id"],
-            title=d["title"],
-            image_count=d.get("image_count", 1),
-            category=d.get("category", "未分类"),
-            condition=ConditionLevel(d.get("condition", "全新")),
-            price=float(d["price"]),
-            stock=int(d["stock"]),
-            description=d.get("description", ""),
-            contact=d.get("contact", ""),
-            status=ProductStatus(d.get("status", ProductStatus.ON_SALE.value)),
+            d["id"],
+            d["seller_id"],
+            d["title"],
+            get("image_count", 1),
+            get("category", "未分类"),
+            _enum(_CONDITIONS, ConditionLevel, get("condition", "全新")),
+            float(d["price"]),
+            int(d["stock"]),
+            get("description", ""),
+            get("contact", ""),
+            _enum(_PRODUCT_STATUSES, ProductStatus, get("status", ProductStatus.ON_SALE.value)),
         )
 
 
-@dataclass
+@dataclass(slots=True)
 class Order:
     id: int
     buyer_id: int
@@ -123,24 +156,30 @@ class Order:
     created_at: str  # isoformat
 
     def to_dict(self):
-        d = asdict(self)
-        d["status"] = self.status.value
-        return d
+        return {
+            "id": self.id,
+            "buyer_id": self.buyer_id,
+            "product_id": self.product_id,
+            "quantity": self.quantity,
+            "amount": self.amount,
+            "status": self.status.value,
+            "created_at": self.created_at,
+        }
 
     @staticmethod
     def from_dict(d: dict) -> "Order":
         return Order(
-            id=d["id"],
-            buyer_id=d["buyer_id"],
-            product_id=d["product_id"],
-            quantity=d["quantity"],
-            amount=float(d["amount"]),
-            status=OrderStatus(d["status"]),
-            created_at=d["created_at"],
+            d["id"],
+            d["buyer_id"],
+            d["product_id"],
+            d["quantity"],
+            float(d["amount"]),
+            _enum(_ORDER_STATUSES, OrderStatus, d["status"]),
+            d["created_at"],
         )
 
 
-@dataclass
+@dataclass(slots=True)
 class Complaint:
     id: int
     complainant_id: int
@@ -154,24 +193,33 @@ class Complaint:
     result: str = ""
 
     def to_dict(self):
-        d = asdict(self)
-        d["type"] = self.type.value
-        d["status"] = self.status.value
-        return d
+        return {
+            "id": self.id,
+            "complainant_id": self.complainant_id,
+            "product_id": self.product_id,
+            "order_id": self.order_id,
+            "type": self.type.value,
+            "status": self.status.value,
+            "evidence_count": self.evidence_count,
+            "reason": self.reason,
+            "submitted_at": self.submitted_at,
+            "result": self.result,
+        }
 
     @staticmethod
     def from_dict(d: dict) -> "Complaint":
+        get = d.get
         return Complaint(
-            id=d["id"],
-            complainant_id=d["complainant_id"],
-            product_id=d.get("product_id"),
-            order_id=d.get("order_id"),
-            type=ComplaintType(d["type"]),
-            status=ComplaintStatus(d["status"]),
-            evidence_count=int(d.get("evidence_count", 0)),
-            reason=d.get("reason", ""),
-            submitted_at=d["submitted_at"],
-            result=d.get("result", ""),
+            d["id"],
+            d["complainant_id"],
+            get("product_id"),
+            get("order_id"),
+            _enum(_COMPLAINT_TYPES, ComplaintType, d["type"]),
+            _enum(_COMPLAINT_STATUSES, ComplaintStatus, d["status"]),
+            int(get("evidence_count", 0)),
+            get("reason", ""),
+            d["submitted_at"],
+            get("result", ""),
         )
 
 
@@ -0,0 +1,105 @@
+# scheduler.py
+import heapq
+import itertools
+import threading
+import time
+import traceback
+from typing import Callable, Hashable, Optional
+
+
+class ExpiryScheduler:
+    """
+    到期回调调度器：最小堆按到期时间排序，后台线程睡到堆顶到期才醒来执行，
+    不需要定期扫描全部记录。schedule / cancel 均为 O(log n)，取消采用惰性删除。
+
+    不调用 start() 时可以用 run_pending(now) 手动触发，便于测试。
+    """
+
+    def __init__(self, clock: Callable[[], float] = time.monotonic):
+        self._clock = clock
+        self._heap = []  # (到期时间, 序号, key)
+        self._entries = {}  # key -> (到期时间, 序号, callback)，只有这里的条目才算有效
+        self._seq = itertools.count()
+        self._cond = threading.Condition()
+        self._thread: Optional[threading.Thread] = None
+        self._stopped = False
+
+    def __len__(self):
+        return len(self._entries)
+
+    def schedule(self, key: Hashable, delay: float, callback: Callable[[], None]):
+        """delay 秒后调用 callback()；同一 key 重复调度以最后一次为准"""
+        with self._cond:
+            deadline = self._clock() + delay
+            seq = next(self._seq)
+            self._entries[key] = (deadline, seq, callback)
+            heapq.heappush(self._heap, (deadline, seq, key))
+            self._cond.notify()
+
+    def cancel(self, key: Hashable) -> bool:
+        with self._cond:
+            if self._entries.pop(key, None) is None:
+                return False
+            # 已取消的条目留在堆里，积累过多时整体重建
+            if len(self._heap) > 2 * len(self._entries) + 64:
+                self._heap = [(d, s, k) for k, (d, s, _) in self._entries.items()]
+                heapq.heapify(self._heap)
+            return True
+
+    def _pop_due(self, now: float) -> list:
+        due = []
+        while self._heap and self._heap[0][0] <= now:
+            _, seq, key = heapq.heappop(self._heap)
+            entry = self._entries.get(key)
+            # 被取消或重新调度过的旧条目直接丢弃
+            if entry is not None and entry[1] == seq:
+                del self._entries[key]
+                due.append(entry[2])
+        return due
+
+    def run_pending(self, now: Optional[float] = None) -> int:
+        """执行所有已到期的回调，返回执行的个数"""
+        with self._cond:
+            due = self._pop_due(self._clock() if now is None else now)
+        for callback in due:
+            self._call(callback)
+        return len(due)
+
+    def start(self):
+        with self._cond:
+            if self._thread is not None:
+                return
+            self._stopped = False
+            self._thread = threading.Thread(target=self._run, name="expiry-scheduler", daemon=True)
+            self._thread.start()
+
+    def stop(self):
+        with self._cond:
+            thread, self._thread = self._thread, None
+            self._stopped = True
+            self._cond.notify()
+        if thread is not None:
+            thread.join()
+
+    def _run(self):
+        while True:
+            with self._cond:
+                while True:
+                    if self._stopped:
+                        return
+                    now = self._clock()
+                    due = self._pop_due(now)
+                    if due:
+                        break
+                    # 睡到堆顶到期；新条目加入时 schedule 会唤醒重新计算
+                    self._cond.wait(self._heap[0][0] - now if self._heap else None)
+            for callback in due:
+                self._call(callback)
+
+    @staticmethod
+    def _call(callback: Callable[[], None]):
+        # 单个回调出错不能让调度线程退出
+        try:
+            callback()
+        except Exception:
+            traceback.print_exc()
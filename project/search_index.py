@@ -0,0 +1,415 @@
+# search_index.py
+import heapq
+from bisect import bisect_left, bisect_right, insort
+from collections import Counter
+from contextlib import contextmanager
+from itertools import islice
+from typing import Dict, Iterable, Iterator, List, Optional, Set, Tuple
+
+from models import ProductStatus
+
+ON_SALE = ProductStatus.ON_SALE.value
+_INF = float("inf")
+
+
+def _grams(text: str) -> Set[str]:
+    """
+    小写后的相邻二字组。中文标题没有空格可切，英文单词也可能被查询截断
+    （如 "phon" 命中 "iphone"），统一用二字组做候选，再回表做子串校验，
+    结果与原来的 kw in title.lower() 完全一致。
+    """
+    return {text[i:i + 2] for i in range(len(text) - 1) if not text[i:i + 2].isspace()}
+
+
+def substring_distance(pattern: str, text: str, max_distance: int) -> Optional[int]:
+    """
+    pattern 与 text 中最接近的子串之间的编辑距离（起止位置不计代价）。
+    超过 max_distance 时提前返回 None。
+    """
+    prev = [0] * (len(text) + 1)
+    for i, pc in enumerate(pattern, 1):
+        cur = [i]
+        for j, tc in enumerate(text, 1):
+            cur.append(min(prev[j - 1] + (pc != tc), prev[j] + 1, cur[j - 1] + 1))
+        if min(cur) > max_distance:
+            return None
+        prev = cur
+    best = min(prev)
+    return best if best <= max_distance else None
+
+
+class ProductSearchIndex:
+    """
+    在售商品的标题倒排索引 + 价格有序索引，由存储层在新增商品、修改状态时增量维护
+    """
+
+    def __init__(self):
+        self._titles: Dict[int, str] = {}  # pid -> 小写标题（仅在售商品）
+        self._postings: Dict[str, Set[int]] = {}  # 二字组 / 单字 -> pid 集合
+        self._display: Dict[int, str] = {}  # pid -> 原始标题，用于联想结果展示
+        self._by_title: List[Tuple[str, int]] = []  # (小写标题, pid) 升序，前缀联想用
+        self._prices: Dict[int, float] = {}  # pid -> 价格
+        self._by_price: List[Tuple[float, int]] = []  # (价格, pid) 升序
+        self._attrs: Dict[int, Tuple[str, str]] = {}  # pid -> (分类, 成色)
+        self._category_counts: Counter = Counter()
+        self._condition_counts: Counter = Counter()
+        self._max_id = 0  # 见过的最大商品 id，按 id 顺序遍历时的上界
+        self._bulk = False
+
+    def __len__(self):
+        return len(self._titles)
+
+    def upsert(self, record: dict):
+        """按商品当前记录同步索引；标题、价格和状态都没变时什么也不做"""
+        pid = record["id"]
+        if record.get("status", ON_SALE) != ON_SALE:
+            self.discard(pid)
+            return
+        if pid > self._max_id:
+            self._max_id = pid
+        if self._display.get(pid) != record["title"]:
+            self._remove_title(pid)
+            self._add(pid, record["title"])
+        price = float(record["price"])
+        old_price = self._prices.get(pid)
+        if old_price != price:
+            if old_price is not None:
+                self._remove_price(pid, old_price)
+            self._prices[pid] = price
+            self._insort(self._by_price, (price, pid))
+        attrs = (record.get("category", "未分类"), record.get("condition", "全新"))
+        if self._attrs.get(pid) != attrs:
+            self._remove_attrs(pid)
+            self._attrs[pid] = attrs
+            self._category_counts[attrs[0]] += 1
+            self._condition_counts[attrs[1]] += 1
+
+    def _insort(self, items: list, item: tuple):
+        if self._bulk:
+            items.append(item)
+        else:
+            insort(items, item)
+
+    @contextmanager
+    def bulk_load(self):
+        """
+        批量建索引：期间只追加不排序，结束时各排一次序，避免逐条 insort 的 O(n^2)。
+        期间不要 discard 或修改已有商品。
+        """
+        self._bulk = True
+        try:
+            yield self
+        finally:
+            self._bulk = False
+            self._by_price.sort()
+            self._by_title.sort()
+
+    def discard(self, pid: int):
+        self._remove_title(pid)
+        price = self._prices.pop(pid, None)
+        if price is not None:
+            self._remove_price(pid, price)
+        self._remove_attrs(pid)
+
+    def _remove_attrs(self, pid: int):
+        attrs = self._attrs.pop(pid, None)
+        if attrs is None:
+            return
+        for counter, key in ((self._category_counts, attrs[0]), (self._condition_counts, attrs[1])):
+            counter[key] -= 1
+            if not counter[key]:
+                # 计数归零的项去掉，facets 里不出现 0
+                del counter[key]
+
+    def _remove_price(self, pid: int, price: float):
+        i = bisect_left(self._by_price, (price, pid))
+        if i < len(self._by_price) and self._by_price[i] == (price, pid):
+            del self._by_price[i]
+
+    def _remove_title(self, pid: int):
+        title = self._titles.pop(pid, None)
+        if title is None:
+            return
+        del self._display[pid]
+        i = bisect_left(self._by_title, (title, pid))
+        if i < len(self._by_title) and self._by_title[i] == (title, pid):
+            del self._by_title[i]
+        for token in self._tokens(title):
+            bucket = self._postings.get(token)
+            if bucket is not None:
+                bucket.discard(pid)
+                if not bucket:
+                    del self._postings[token]
+
+    def _add(self, pid: int, raw_title: str):
+        title = raw_title.lower()
+        self._titles[pid] = title
+        self._display[pid] = raw_title
+        self._insort(self._by_title, (title, pid))
+        postings = self._postings
+        for token in self._tokens(title):
+            bucket = postings.get(token)
+            if bucket is None:
+                postings[token] = {pid}
+            else:
+                bucket.add(pid)
+
+    @staticmethod
+    def _tokens(title: str) -> Set[str]:
+        # 单字用于一个字的查询，二字组用于更长的查询
+        return set(title) | _grams(title)
+
+    def _candidates(self, kw: str) -> Set[int]:
+        tokens = _grams(kw) or set(kw)
+        buckets = []
+        for token in tokens:
+            bucket = self._postings.get(token)
+            if not bucket:
+                return set()
+            buckets.append(bucket)
+        buckets.sort(key=len)
+        result = set(buckets[0])
+        for bucket in buckets[1:]:
+            result &= bucket
+            if not result:
+                break
+        return result
+
+    def match(self, keyword: str) -> List[int]:
+        """返回标题包含 keyword（不区分大小写）的在售商品 id，按 id 升序"""
+        kw = keyword.lower()
+        if not kw:
+            return sorted(self._titles)
+        if kw.isspace():
+            candidates = self._titles.keys()
+        else:
+            candidates = self._candidates(kw)
+        titles = self._titles
+        return sorted(pid for pid in candidates if kw in titles[pid])
+
+    def price_range(
+        self,
+        min_price: Optional[float] = None,
+        max_price: Optional[float] = None,
+        min_exclusive: bool = False,
+        descending: bool = False,
+    ) -> List[int]:
+        """
+        价格在 [min_price, max_price] 内的在售商品 id，按 (价格, id) 排序，descending 时整体倒序。
+        min_exclusive=True 时下界为开区间。二分定位两端，O(log n + k)。
+        """
+        lo, hi = self._price_window(min_price, max_price, min_exclusive)
+        return list(self._iter_price(lo, hi, descending))
+
+    def _price_window(self, min_price, max_price, min_exclusive) -> Tuple[int, int]:
+        lo = 0
+        if min_price is not None:
+            lo = bisect_left(self._by_price, (min_price, _INF if min_exclusive else -_INF))
+        hi = len(self._by_price)
+        if max_price is not None:
+            hi = bisect_right(self._by_price, (max_price, _INF))
+        return lo, max(hi, lo)
+
+    def _iter_price(self, lo: int, hi: int, descending: bool = False) -> Iterator[int]:
+        # 惰性遍历，分页时取够一页就停
+        by_price = self._by_price
+        positions = range(hi - 1, lo - 1, -1) if descending else range(lo, hi)
+        for i in positions:
+            yield by_price[i][1]
+
+    def _iter_ids(self, descending: bool = False) -> Iterator[int]:
+        # 商品 id 是递增整数，直接按 id 顺序探测，取够一页就停
+        titles = self._titles
+        ids = range(self._max_id, 0, -1) if descending else range(1, self._max_id + 1)
+        for pid in ids:
+            if pid in titles:
+                yield pid
+
+    def count_price(
+        self,
+        min_price: Optional[float] = None,
+        max_price: Optional[float] = None,
+        min_exclusive: bool = False,
+    ) -> int:
+        """price_range 的计数版本，只做两次二分"""
+        lo, hi = self._price_window(min_price, max_price, min_exclusive)
+        return hi - lo
+
+    def facet_counts(self, pids: Optional[Iterable[int]] = None, price_buckets: Optional[dict] = None) -> dict:
+        """
+        统计分类、成色和价格档位的商品数。
+        pids 为 None 时统计全部在售商品：分类/成色直接取增量维护的计数器，价格档位用二分计数；
+        否则对候选集只遍历一遍。price_buckets: {名称: (下界, 上界, 下界是否开区间)}
+        """
+        price_buckets = price_buckets or {}
+        if pids is None:
+            return {
+                "category": dict(self._category_counts),
+                "condition": dict(self._condition_counts),
+                "price": {name: self.count_price(*bounds) for name, bounds in price_buckets.items()},
+            }
+        categories, conditions, prices = Counter(), Counter(), Counter()
+        for pid in pids:
+            category, condition = self._attrs[pid]
+            categories[category] += 1
+            conditions[condition] += 1
+            price = self._prices[pid]
+            for name, (lo, hi, lo_exclusive) in price_buckets.items():
+                if (lo is None or price > lo or (price == lo and not lo_exclusive)) and (hi is None or price <= hi):
+                    prices[name] += 1
+        return {
+            "category": dict(categories),
+            "condition": dict(conditions),
+            "price": {name: prices[name] for name in price_buckets},
+        }
+
+    def suggest(self, prefix: str, limit: int = 10) -> List[str]:
+        """
+        以 prefix 开头（不区分大小写）的在售商品标题，去重后按字典序最多返回 limit 个。
+        在有序标题表上二分定位后顺序取，耗时与商品总数基本无关。
+        """
+        prefix = prefix.lower()
+        if not prefix or limit <= 0:
+            return []
+        result, seen = [], set()
+        i = bisect_left(self._by_title, (prefix, -1))
+        while i < len(self._by_title) and len(result) < limit:
+            title, pid = self._by_title[i]
+            if not title.startswith(prefix):
+                break
+            if title not in seen:
+                seen.add(title)
+                result.append(self._display[pid])
+            i += 1
+        return result
+
+    def _fuzzy_candidates(self, kw: str, max_distance: int):
+        """
+        q-gram 过滤：一次编辑最多破坏 q 个 q-gram，所以距离 <= k 的标题至少含有
+        |grams| - q*k 个查询 gram。只需取最稀有的 q*k+1 个 gram 的倒排表求并集做候选，
+        再按命中 gram 数过滤。二字组不够用时退到单字；都不够时只能全量校验。
+        """
+        for tokens, per_edit in ((_grams(kw), 2), (set(kw), 1)):
+            need = len(tokens) - per_edit * max_distance
+            if need >= 1:
+                break
+        else:
+            return self._titles.keys()
+        # 没有任何标题含有的 gram（多半就是错字处）直接不参与
+        postings = sorted((p for p in map(self._postings.get, tokens) if p), key=len)
+        if len(postings) < need:
+            return []
+        probe = postings[: len(postings) - need + 1]
+        candidates = set().union(*probe)
+        if len(probe) == len(postings):
+            return candidates
+        return [pid for pid in candidates if sum(pid in p for p in postings) >= need]
+
+    def fuzzy_match(self, keyword: str, max_distance: int = 1) -> List[Tuple[int, int]]:
+        """
+        容错匹配：标题中存在与 keyword 编辑距离 <= max_distance 的片段。
+        返回 [(pid, 距离)]，按距离、再按 id 升序；距离 0 即普通的子串命中。
+        """
+        kw = keyword.lower()
+        if not kw:
+            return []
+        if max_distance <= 0:
+            return [(pid, 0) for pid in self.match(kw)]
+        titles = self._titles
+        result = []
+        for pid in self._fuzzy_candidates(kw, max_distance):
+            d = substring_distance(kw, titles[pid], max_distance)
+            if d is not None:
+                result.append((d, pid))
+        result.sort()
+        return [(pid, d) for d, pid in result]
+
+    def _sort_key(self, sort: Optional[str], kw: str, distances: Optional[Dict[int, int]]):
+        if sort == "recency":
+            return lambda pid: -pid
+        if sort == "price_asc":
+            return lambda pid: (self._prices[pid], pid)
+        if sort == "price_desc":
+            return lambda pid: (-self._prices[pid], -pid)
+        if sort == "relevance" and kw:
+            titles = self._titles
+
+            def relevance(pid):
+                # 错字少的优先；其次 完全相同 > 前缀 > 包含，出现位置越靠前、标题越短越相关
+                title = titles[pid]
+                pos = title.find(kw)
+                tier = 0 if title == kw else 1 if pos == 0 else 2
+                return (distances[pid] if distances else 0, tier, pos if pos >= 0 else len(title), len(title), pid)
+
+            return relevance
+        if distances:
+            return lambda pid: (distances[pid], pid)
+        return None
+
+    def query(
+        self,
+        kw: str = "",
+        fuzzy_distance: int = 0,
+        category: Optional[str] = None,
+        conditions: Optional[Set[str]] = None,
+        min_price: Optional[float] = None,
+        max_price: Optional[float] = None,
+        min_exclusive: bool = False,
+        sort: Optional[str] = None,
+        offset: int = 0,
+        limit: Optional[int] = None,
+    ) -> List[int]:
+        """
+        按条件筛选在售商品并排序分页，只返回这一页的商品 id。
+        sort: None（按 id；容错模式按相似度）、"relevance"、"recency"、"price_asc"、"price_desc"。
+        有 limit 时用堆只选出前 offset+limit 个，不对整个结果集排序。
+        """
+        distances = None
+        base = None  # 关键词结果：普通模式按 id，容错模式按 (距离, id)
+        if kw:
+            if fuzzy_distance > 0:
+                pairs = self.fuzzy_match(kw, fuzzy_distance)
+                distances = dict(pairs)
+                base = [pid for pid, _ in pairs]
+            else:
+                base = self.match(kw)
+
+        ranged = min_price is not None or max_price is not None
+        ordered = True  # candidates 是否已经是所要的顺序
+        if base is not None:
+            candidates = base
+            if ranged:
+                lo = -_INF if min_price is None else min_price
+                hi = _INF if max_price is None else max_price
+                prices = self._prices
+                candidates = [
+                    pid for pid in base if (lo < prices[pid] if min_exclusive else lo <= prices[pid]) and prices[pid] <= hi
+                ]
+            if sort == "recency" and distances is None:
+                candidates = reversed(candidates)
+            elif sort is not None:
+                ordered = False
+        elif ranged or sort in ("price_asc", "price_desc"):
+            # 价格有序索引二分出区间，按价格排序时直接顺着取
+            lo, hi = self._price_window(min_price, max_price, min_exclusive)
+            candidates = self._iter_price(lo, hi, descending=sort == "price_desc")
+            ordered = sort in ("price_asc", "price_desc")
+        else:
+            candidates = self._iter_ids(descending=sort == "recency")
+
+        if category is not None or conditions is not None:
+            attrs = self._attrs
+            candidates = (
+                pid
+                for pid in candidates
+                if (category is None or attrs[pid][0] == category)
+                and (conditions is None or attrs[pid][1] in conditions)
+            )
+
+        end = None if limit is None else offset + limit
+        if ordered:
+            return list(islice(candidates, offset, end))
+        key = self._sort_key(sort, kw, distances)
+        if end is None:
+            return sorted(candidates, key=key)[offset:]
+        return heapq.nsmallest(end, candidates, key=key)[offset:]
@@ -1,17 +1,62 @@
 # services.py
-from typing import List, Optional
+import heapq
+import threading
+from collections import OrderedDict
+from datetime import datetime
+from itertools import islice
+from typing import List, Optional, Tuple
 
 from models import (
     User,
+    Order,
+    Complaint,
     UserRole,
     UserStatus,
     Product,
     ProductStatus,
     ConditionLevel,
+    OrderStatus,
+    ComplaintType,
     ComplaintStatus,
 )
+from scheduler import ExpiryScheduler
 from storage import DataStore
 
+# 价格档位：名称 -> (下界, 上界, 下界是否为开区间)，上界都是闭区间
+PRICE_BUCKETS = {
+    "0-500元": (0, 500, False),
+    "500-1000元": (500, 1000, True),
+    "1000元以上": (1000, None, True),
+}
+
+# 新旧筛选：名称 -> 允许的成色
+CONDITION_FILTERS = {
+    "全新": (ConditionLevel.NEW,),
+    "95新及以上": (ConditionLevel.NEW, ConditionLevel.NINE_NINE, ConditionLevel.NINE_FIVE),
+}
+
+SORT_MODES = (None, "relevance", "recency", "price_asc", "price_desc")
+
+
+def _fuzziness(kw: str) -> int:
+    # 容错搜索允许的编辑距离：1~2 个字不容错，3~5 个字 1 处，更长 2 处
+    if len(kw) <= 2:
+        return 0
+    return 1 if len(kw) <= 5 else 2
+
+
+def _price_bounds(price_filter: str, min_price: Optional[float], max_price: Optional[float]):
+    """把价格档位和自定义区间合并成 (下界, 上界, 下界是否开区间)"""
+    lo, hi, lo_exclusive = min_price, max_price, False
+    bucket = PRICE_BUCKETS.get(price_filter)
+    if bucket:
+        b_lo, b_hi, b_exclusive = bucket
+        if lo is None or b_lo > lo or (b_lo == lo and b_exclusive):
+            lo, lo_exclusive = b_lo, b_exclusive
+        if b_hi is not None and (hi is None or b_hi < hi):
+            hi = b_hi
+    return lo, hi, lo_exclusive
+
 
 class AuthService:
     def __init__(self, store: DataStore):
@@ -36,8 +81,13 @@ class AuthService:
 
 
 class ProductService:
-    def __init__(self, store: DataStore):
+    def __init__(self, store: DataStore, cache_size: int = 256):
         self.store = store
+        # search 结果的 LRU 缓存：参数 -> (商品集合版本, 结果)
+        self.cache_size = cache_size
+        self._cache = OrderedDict()
+        self.cache_hits = 0
+        self.cache_misses = 0
 
     def publish_product(
         self,
@@ -79,35 +129,83 @@ class ProductService:
         category: str = "全部",
         condition_filter: str = "全部",
         price_filter: str = "全部",
+        min_price: Optional[float] = None,
+        max_price: Optional[float] = None,
+        sort: Optional[str] = None,
+        limit: Optional[int] = None,
+        fuzzy: bool = False,
+        offset: int = 0,
     ) -> List[Product]:
-        products = [p for p in self.store.list_products() if p.status == ProductStatus.ON_SALE]
-
-        if keyword:
-            kw = keyword.strip().lower()
-            products = [p for p in products if kw in p.title.lower()]
-
-        if category != "全部":
-            products = [p for p in products if p.category == category]
-
-        if condition_filter != "全部":
-            if condition_filter == "全新":
-                products = [p for p in products if p.condition == ConditionLevel.NEW]
-            elif condition_filter == "95新及以上":
-                products = [
-                    p
-                    for p in products
-                    if p.condition in (ConditionLevel.NEW, ConditionLevel.NINE_NINE, ConditionLevel.NINE_FIVE)
-                ]
-
-        if price_filter != "全部":
-            if price_filter == "0-500元":
-                products = [p for p in products if 0 <= p.price <= 500]
-            elif price_filter == "500-1000元":
-                products = [p for p in products if 500 < p.price <= 1000]
-            elif price_filter == "1000元以上":
-                products = [p for p in products if p.price > 1000]
-
-        return products
+        """
+        sort: None 按商品 id，"relevance" 按标题匹配度，"recency" 新发布在前，
+        "price_asc" / "price_desc" 按价格；offset / limit 分页，只取出当页商品。
+        min_price / max_price 为闭区间，可与 price_filter 档位叠加。
+        fuzzy=True 时关键词允许少量错字，未指定 sort 时按相似度排序。
+        """
+        if sort not in SORT_MODES:
+            raise ValueError("不支持的排序方式")
+        key = (keyword, category, condition_filter, price_filter, min_price, max_price, sort, offset, limit, fuzzy)
+        version = self.store.product_version
+        cached = self._cache.get(key)
+        if cached is not None and cached[0] == version:
+            self._cache.move_to_end(key)
+            self.cache_hits += 1
+            return list(cached[1])
+        self.cache_misses += 1
+        result = self._search(*key)
+        self._cache[key] = (version, result)
+        self._cache.move_to_end(key)
+        if len(self._cache) > self.cache_size:
+            self._cache.popitem(last=False)
+        return list(result)
+
+    def cache_stats(self) -> dict:
+        return {"hits": self.cache_hits, "misses": self.cache_misses, "size": len(self._cache)}
+
+    def _search(self, keyword, category, condition_filter, price_filter, min_price, max_price, sort, offset, limit, fuzzy):
+        kw = keyword.strip().lower() if keyword else ""
+        lo, hi, lo_exclusive = _price_bounds(price_filter, min_price, max_price)
+        conditions = CONDITION_FILTERS.get(condition_filter)
+
+        if limit is None and not kw and lo is None and hi is None and sort in (None, "relevance", "recency"):
+            # 不分页地按分类/成色浏览：直接取 (状态, 分类) 二级索引的桶
+            products = self.store.products_by_status_category(
+                ProductStatus.ON_SALE, None if category == "全部" else category
+            )
+            if sort == "recency":
+                products = reversed(products)
+            if conditions is not None:
+                products = (p for p in products if p.condition in conditions)
+            return list(islice(products, offset, None))
+
+        pids = self.store.search_index.query(
+            kw,
+            fuzzy_distance=_fuzziness(kw) if fuzzy else 0,
+            category=None if category == "全部" else category,
+            conditions={c.value for c in conditions} if conditions is not None else None,
+            min_price=lo,
+            max_price=hi,
+            min_exclusive=lo_exclusive,
+            sort=sort,
+            offset=offset,
+            limit=limit,
+        )
+        # 只把这一页的商品取出来
+        return [self.store.find_product_by_id(pid) for pid in pids]
+
+    def suggest(self, prefix: str, limit: int = 10) -> List[str]:
+        """搜索框联想：以 prefix 开头的在售商品标题"""
+        return self.store.search_index.suggest(prefix.lstrip(), limit)
+
+    def facets(self, keyword: str = "") -> dict:
+        """
+        当前关键词结果集里各分类、各成色、各价格档位的在售商品数：
+        {"category": {...}, "condition": {成色值: 数量}, "price": {档位: 数量}}
+        """
+        index = self.store.search_index
+        kw = keyword.strip().lower() if keyword else ""
+        pids = index.match(kw) if kw else None
+        return index.facet_counts(pids, PRICE_BUCKETS)
 
     def takedown(self, pid: int):
         self.store.update_product_status(pid, ProductStatus.TAKEDOWN)
@@ -117,33 +215,149 @@ class ProductService:
 
 
 class OrderService:
-    def __init__(self, store: DataStore):
+    # 待支付订单默认锁库存 15 分钟
+    HOLD_TTL = 15 * 60
+
+    def __init__(self, store: DataStore, scheduler: Optional[ExpiryScheduler] = None, hold_ttl: float = HOLD_TTL):
+        """scheduler 为空时在第一次 reserve 时自建并启动后台线程"""
         self.store = store
+        self.hold_ttl = hold_ttl
+        self._scheduler = scheduler
+        self._owns_scheduler = False
 
     def create_order(self, buyer: User, product: Product, quantity: int = 1):
+        return self._place(buyer, product, quantity, OrderStatus.PAID)
+
+    def _place(self, buyer: User, product: Product, quantity: int, status: OrderStatus):
         if quantity <= 0:
             raise ValueError("数量至少为 1")
-        if product.stock < quantity:
-            raise ValueError("库存不足")
-        amount = product.price * quantity
-        order = self.store.add_order(
-            buyer_id=buyer.id,
-            product_id=product.id,
-            quantity=quantity,
-            amount=amount,
-        )
-        # 简单扣库存
-        for p in self.store.data["products"]:
-            if p["id"] == product.id:
-                p["stock"] = int(p["stock"]) - quantity
-                break
-        self.store._save()
+        # 传入的 product 可能已过期，在事务内重读：事务持有写锁，校验到扣减之间库存不会被别人改动；
+        # 建单和扣库存合并成一次落盘
+        with self.store.transaction():
+            current = self.store.find_product_by_id(product.id)
+            if current is None:
+                raise ValueError("商品不存在")
+            if current.stock < quantity:
+                raise ValueError("库存不足")
+            order = self.store.add_order(
+                buyer_id=buyer.id,
+                product_id=product.id,
+                quantity=quantity,
+                amount=current.price * quantity,
+                status=status,
+            )
+            self.store.update_product_stock(product.id, current.stock - quantity)
         return order
 
+    # ------------ 库存预留 ------------
+    # reserve 扣减可售库存并生成待支付订单（CREATED），confirm → PAID，
+    # cancel 或超时 → CANCELLED 并退回库存。超时由 ExpiryScheduler 按到期时间触发。
+
+    @property
+    def scheduler(self) -> ExpiryScheduler:
+        if self._scheduler is None:
+            self._scheduler = ExpiryScheduler()
+            self._scheduler.start()
+            self._owns_scheduler = True
+        return self._scheduler
+
+    def reserve(self, buyer: User, product: Product, quantity: int = 1, ttl: Optional[float] = None) -> Order:
+        """锁定库存 ttl 秒（默认 hold_ttl），期间未 confirm 则自动取消"""
+        order = self._place(buyer, product, quantity, OrderStatus.CREATED)
+        self._schedule_expiry(order.id, self.hold_ttl if ttl is None else ttl)
+        return order
+
+    def confirm(self, order_id: int) -> Order:
+        """支付成功：CREATED → PAID"""
+        return self._settle(order_id, OrderStatus.PAID)
+
+    def cancel(self, order_id: int) -> Order:
+        """取消预留：CREATED → CANCELLED，库存退回"""
+        return self._settle(order_id, OrderStatus.CANCELLED)
+
+    def recover_holds(self) -> int:
+        """启动时为仍处于 CREATED 的订单重新安排到期（按下单时间 + hold_ttl），返回数量"""
+        pending = self.store.orders_by_status(OrderStatus.CREATED)
+        now = datetime.now()
+        for order in pending:
+            elapsed = (now - datetime.fromisoformat(order.created_at)).total_seconds()
+            self._schedule_expiry(order.id, max(self.hold_ttl - elapsed, 0))
+        return len(pending)
+
+    def close(self):
+        if self._owns_scheduler:
+            self._scheduler.stop()
+            self._scheduler = None
+            self._owns_scheduler = False
+
+    def _schedule_expiry(self, order_id: int, delay: float):
+        # 调度器可能与 ComplaintQueue 共用，key 带上类型以免与投诉 id 冲突
+        self.scheduler.schedule(("order", order_id), delay, lambda: self._expire(order_id))
+
+    def _expire(self, order_id: int):
+        try:
+            self.cancel(order_id)
+        except ValueError:
+            pass  # 已支付或已取消
+
+    def _settle(self, order_id: int, status: OrderStatus) -> Order:
+        with self.store.transaction():
+            order = self.store.find_order_by_id(order_id)
+            if order is None:
+                raise ValueError("订单不存在")
+            if order.status != OrderStatus.CREATED:
+                raise ValueError("订单不是待支付状态")
+            self.store.update_order_status(order_id, status)
+            if status == OrderStatus.CANCELLED:
+                # 事务持有写锁，读出的库存不会过期
+                product = self.store.find_product_by_id(order.product_id)
+                if product is not None:
+                    self.store.update_product_stock(product.id, product.stock + order.quantity)
+        if self._scheduler is not None:
+            self._scheduler.cancel(("order", order_id))
+        return self.store.find_order_by_id(order_id)
+
+    def create_orders(self, buyer: User, items: List[Tuple[int, int]]) -> List[Order]:
+        """
+        购物车结算：items 为 [(商品 id, 数量), ...]，每行生成一个订单。
+        先校验全部库存再建单扣库存，任何一行失败则全部不生效；整车只落盘一次。
+        """
+        if not items:
+            raise ValueError("购物车为空")
+        wanted = {}  # 同一商品出现多行时合并校验
+        for pid, quantity in items:
+            if quantity <= 0:
+                raise ValueError("数量至少为 1")
+            wanted[pid] = wanted.get(pid, 0) + quantity
+        # 事务持有写锁，期间库存不会被其他线程改动，直接读出校验即可
+        with self.store.transaction():
+            products = {}
+            for pid, quantity in wanted.items():
+                product = self.store.find_product_by_id(pid)
+                if product is None:
+                    raise ValueError("商品不存在")
+                if product.stock < quantity:
+                    raise ValueError(f"{product.title} 库存不足")
+                products[pid] = product
+            orders = [
+                self.store.add_order(
+                    buyer_id=buyer.id,
+                    product_id=pid,
+                    quantity=quantity,
+                    amount=products[pid].price * quantity,
+                )
+                for pid, quantity in items
+            ]
+            for pid, quantity in wanted.items():
+                self.store.update_product_stock(pid, products[pid].stock - quantity)
+        return orders
+
 
 class ComplaintService:
-    def __init__(self, store: DataStore):
+    def __init__(self, store: DataStore, queue: Optional["ComplaintQueue"] = None):
+        """queue 不为空时新投诉直接进入工单队列"""
         self.store = store
+        self.queue = queue
 
     def submit_complaint(
         self,
@@ -158,7 +372,7 @@ class ComplaintService:
             raise ValueError("请填写投诉原因")
         if evidence_count < 0 or evidence_count > 3:
             raise ValueError("证据图片数量 0~3 张")
-        return self.store.add_complaint(
+        complaint = self.store.add_complaint(
             complainant_id=complainant.id,
             product_id=product_id,
             order_id=order_id,
@@ -166,31 +380,211 @@ class ComplaintService:
             evidence_count=evidence_count,
             reason=reason.strip(),
         )
+        if self.queue is not None:
+            self.queue.push(complaint)
+        return complaint
+
+
+# 投诉处理优先级，数字小的先处理
+COMPLAINT_PRIORITY = {ComplaintType.ORDER_DISPUTE: 0, ComplaintType.PRODUCT_VIOLATION: 1}
+
+
+class ComplaintQueue:
+    """
+    投诉工单队列：待处理投诉按 (类型优先级, 提交时间, id) 放进最小堆。
+    claim(admin_id) 取出堆顶并改为处理中，同时给该管理员 lease_ttl 秒的租约；
+    租约到期（管理员没有 complete / renew）时投诉退回待处理、重新入堆。
+    claim / complete 为 O(log n)，一把锁保证多个管理员线程不会领到同一条。
+    """
+
+    LEASE_TTL = 10 * 60
+
+    def __init__(self, store: DataStore, scheduler: Optional[ExpiryScheduler] = None, lease_ttl: float = LEASE_TTL):
+        self.store = store
+        self.lease_ttl = lease_ttl
+        self._scheduler = scheduler
+        self._owns_scheduler = False
+        self._lock = threading.Lock()
+        self._heap = []  # (优先级, 提交时间, id)
+        self._leases = {}  # 投诉 id -> 管理员 id
+        # 上次运行遗留的处理中投诉没有租约可恢复，退回待处理；一个事务提交，不会只退回一半
+        with self.store.transaction():
+            for c in self.store.complaints_by_status(ComplaintStatus.IN_PROGRESS):
+                self.store.update_complaint_status(c.id, ComplaintStatus.PENDING, c.result)
+        for c in self.store.complaints_by_status(ComplaintStatus.PENDING):
+            self._heap.append(self._entry(c))
+        heapq.heapify(self._heap)
+
+    def __len__(self):
+        return len(self._heap)
+
+    @property
+    def scheduler(self) -> ExpiryScheduler:
+        if self._scheduler is None:
+            self._scheduler = ExpiryScheduler()
+            self._scheduler.start()
+            self._owns_scheduler = True
+        return self._scheduler
+
+    @staticmethod
+    def _entry(c: Complaint) -> tuple:
+        return (COMPLAINT_PRIORITY.get(c.type, len(COMPLAINT_PRIORITY)), c.submitted_at, c.id)
+
+    def push(self, complaint: Complaint):
+        with self._lock:
+            heapq.heappush(self._heap, self._entry(complaint))
+
+    def claim(self, admin_id: int) -> Optional[Complaint]:
+        """领取优先级最高的待处理投诉；队列为空时返回 None"""
+        with self._lock:
+            while self._heap:
+                cid = heapq.heappop(self._heap)[2]
+                c = self.store.find_complaint_by_id(cid)
+                # 绕过队列直接处理掉的投诉在这里惰性丢弃
+                if c is None or c.status != ComplaintStatus.PENDING:
+                    continue
+                self.store.update_complaint_status(cid, ComplaintStatus.IN_PROGRESS, c.result)
+                self._leases[cid] = admin_id
+                self.scheduler.schedule(("complaint", cid), self.lease_ttl, lambda: self._expire(cid))
+                return self.store.find_complaint_by_id(cid)
+            return None
+
+    def renew(self, cid: int, admin_id: int):
+        """管理员仍在处理，租约重新计时"""
+        with self._lock:
+            self._check_lease(cid, admin_id)
+            self.scheduler.schedule(("complaint", cid), self.lease_ttl, lambda: self._expire(cid))
+
+    def complete(self, cid: int, admin_id: int, status_value: str, result: str) -> Complaint:
+        """处理完毕：处理中 → 已解决 / 已驳回，释放租约"""
+        status = ComplaintStatus(status_value)
+        if status not in (ComplaintStatus.RESOLVED, ComplaintStatus.REJECTED):
+            raise ValueError("处理结果只能是已解决或已驳回")
+        with self._lock:
+            self._check_lease(cid, admin_id)
+            self.store.update_complaint_status(cid, status, result)
+            del self._leases[cid]
+            self.scheduler.cancel(("complaint", cid))
+        return self.store.find_complaint_by_id(cid)
+
+    def holder(self, cid: int) -> Optional[int]:
+        return self._leases.get(cid)
+
+    def close(self):
+        if self._owns_scheduler:
+            self._scheduler.stop()
+            self._scheduler = None
+            self._owns_scheduler = False
+
+    def _check_lease(self, cid: int, admin_id: int):
+        if self._leases.get(cid) != admin_id:
+            raise ValueError("该投诉不在你的处理中")
+
+    def release(self, cid: int):
+        """投诉绕过队列被处理掉（如 AdminService.handle_complaint）时释放租约"""
+        with self._lock:
+            if self._leases.pop(cid, None) is not None and self._scheduler is not None:
+                self._scheduler.cancel(("complaint", cid))
+
+    def _expire(self, cid: int):
+        with self._lock:
+            if self._leases.pop(cid, None) is None:
+                return
+            c = self.store.find_complaint_by_id(cid)
+            # 租约期间已被其他途径处理掉的投诉不再退回待处理
+            if c is None or c.status != ComplaintStatus.IN_PROGRESS:
+                return
+            self.store.update_complaint_status(cid, ComplaintStatus.PENDING, c.result)
+            heapq.heappush(self._heap, self._entry(c))
 
 
 class AdminService:
-    def __init__(self, store: DataStore):
+    def __init__(self, store: DataStore, queue: Optional[ComplaintQueue] = None):
         self.store = store
+        self.queue = queue  # 直接处理已被领取的投诉时释放其租约
 
     def list_users(self) -> List[User]:
         return self.store.list_users()
 
-    def ban_user(self, user_id: int, reason: str):
+    def ban_user(self, user_id: int, reason: str, cascade: bool = False) -> int:
+        """
+        封禁用户；cascade=True 时一并违规下架其名下所有未下架的商品，
+        封禁和下架在同一个事务里提交。返回下架的商品数。
+        """
         # reason 暂时只展示，不做存储
-        self.store.update_user_status(user_id, UserStatus.BANNED)
-
-    def list_products(self) -> List[Product]:
+        with self.store.transaction():
+            self.store.update_user_status(user_id, UserStatus.BANNED)
+            if not cascade:
+                return 0
+            pids = [p.id for p in self.store.products_by_seller(user_id) if p.status != ProductStatus.TAKEDOWN]
+            return self.takedown_products(pids, reason)
+
+    def ban_users(self, user_ids: List[int], reason: str, cascade: bool = False) -> int:
+        """批量封禁，全部在一个事务里提交；返回连带下架的商品数"""
+        with self.store.transaction():
+            return sum(self.ban_user(uid, reason, cascade) for uid in user_ids)
+
+    def list_products(self, status_value: Optional[str] = None) -> List[Product]:
+        if status_value:
+            return self.store.products_by_status_category(ProductStatus(status_value))
         return self.store.list_products()
 
     def takedown_product(self, pid: int, reason: str):
         self.store.update_product_status(pid, ProductStatus.TAKEDOWN)
 
-    def list_orders(self):
+    def takedown_products(self, pids: List[int], reason: str) -> int:
+        """批量违规下架，一个事务提交；返回实际下架的数量（不存在或已下架的商品不计）"""
+        count = 0
+        with self.store.transaction():
+            for pid in pids:
+                product = self.store.find_product_by_id(pid)
+                if product is None or product.status == ProductStatus.TAKEDOWN:
+                    continue
+                self.store.update_product_status(pid, ProductStatus.TAKEDOWN)
+                count += 1
+        return count
+
+    def list_orders(self, buyer_id: Optional[int] = None):
+        if buyer_id is not None:
+            return self.store.orders_by_buyer(buyer_id)
         return self.store.list_orders()
 
-    def list_complaints(self):
+    def list_complaints(self, status_value: Optional[str] = None):
+        if status_value:
+            return self.store.complaints_by_status(ComplaintStatus(status_value))
         return self.store.list_complaints()
 
     def handle_complaint(self, cid: int, status_value: str, result: str):
         self.store.update_complaint_status(cid, ComplaintStatus(status_value), result)
+        if self.queue is not None:
+            self.queue.release(cid)
+
+
+
+class ReportService:
+    """销售报表：直接读存储层增量维护的汇总表，不再逐单关联商品"""
+
+    def __init__(self, store: DataStore):
+        self.store = store
+
+    def sales_by_seller(self) -> dict:
+        return self.store.sales_summary("seller")
+
+    def sales_by_category(self) -> dict:
+        return self.store.sales_summary("category")
+
+    def sales_by_day(self) -> dict:
+        return self.store.sales_summary("day")
+
+    def totals(self) -> dict:
+        """全部已成交订单的订单数、件数和金额（按天汇总再相加）"""
+        days = self.sales_by_day().values()
+        return {
+            "orders": sum(d["orders"] for d in days),
+            "quantity": sum(d["quantity"] for d in days),
+            "amount": round(sum(d["amount"] for d in days), 2),
+        }
 
+    def rebuild(self):
+        """汇总与订单不一致时（如手工改过数据文件）从头重建"""
+        self.store.rebuild_sales()
@@ -0,0 +1,150 @@
+# snapshot.py
+"""
+二进制快照：DataStore(snapshot=True) 时代替 data.json 保存全量数据
+
+    文件头  MAGIC(4 字节) 版本(uint16) 段数(uint16)
+    段目录  每段：名称长度(uint8) 名称(utf-8) 偏移(uint64) 长度(uint64) CRC32(uint32)
+    数据段  每个集合一段，marshal 编码；记录字段一致时按列存成 (字段名元组, [值元组, ...])
+
+SnapshotReader 打开时只读文件头和段目录，各集合在第一次 load() 时才从内存映射中解码并校验 CRC。
+各段互相独立：DataStore(snapshot=True) 打开时只解码计数器，集合在第一次用到时才解码；
+保存时没改动的段原样复制字节（payload()），只有改动过的集合重新 encode_section()，再由 pack_snapshot() 拼接。
+"""
+import marshal
+import mmap
+import os
+import struct
+import zlib
+from typing import Dict, List
+
+MAGIC = b"SLSN"
+VERSION = 1
+MARSHAL_VERSION = 4  # 固定 marshal 格式版本，不随解释器默认值变化
+
+_HEADER = struct.Struct("<4sHH")
+_ENTRY = struct.Struct("<QQI")
+_COLUMNAR = "c"
+_PLAIN = "p"
+
+
+def encode_section(value) -> bytes:
+    """编码一个数据段"""
+    # 字段完全一致的记录列表按列存：省掉每条记录重复的键名，解码也更快
+    if isinstance(value, list) and value and all(isinstance(r, dict) for r in value):
+        columns = tuple(value[0])
+        if all(len(r) == len(columns) and tuple(r) == columns for r in value):
+            rows = [tuple(r.values()) for r in value]
+            return marshal.dumps((_COLUMNAR, columns, rows), MARSHAL_VERSION)
+    return marshal.dumps((_PLAIN, value), MARSHAL_VERSION)
+
+
+def decode_section(payload: bytes):
+    kind, *rest = marshal.loads(payload)
+    if kind == _COLUMNAR:
+        columns, rows = rest
+        return [dict(zip(columns, row)) for row in rows]
+    return rest[0]
+
+
+def pack_snapshot(payloads: Dict[str, bytes]) -> bytes:
+    """把 {集合名: encode_section() 的结果} 拼成快照文件的完整内容"""
+    encoded_names = [name.encode("utf-8") for name in payloads]
+    directory_size = sum(1 + len(n) + _ENTRY.size for n in encoded_names)
+    offset = _HEADER.size + directory_size
+    parts = [_HEADER.pack(MAGIC, VERSION, len(payloads))]
+    for name, payload in zip(encoded_names, payloads.values()):
+        parts.append(bytes([len(name)]) + name + _ENTRY.pack(offset, len(payload), zlib.crc32(payload)))
+        offset += len(payload)
+    parts.extend(payloads.values())
+    return b"".join(parts)
+
+
+def encode_snapshot(data: Dict[str, object]) -> bytes:
+    """把 {集合名: 数据} 编码成快照文件的完整内容"""
+    return pack_snapshot({name: encode_section(value) for name, value in data.items()})
+
+
+def write_snapshot_bytes(path: str, content: bytes):
+    """写入 encode_snapshot() 的结果，先写临时文件再替换，写到一半崩溃不会损坏旧快照"""
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "wb") as f:
+        f.write(content)
+    os.replace(tmp_path, path)
+
+
+def write_snapshot(path: str, data: Dict[str, object]):
+    write_snapshot_bytes(path, encode_snapshot(data))
+
+
+class SnapshotReader:
+    """按需解码的快照读取器；load() 的结果不缓存，由调用方保存"""
+
+    def __init__(self, path: str):
+        self._file = open(path, "rb")
+        try:
+            self._map = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        except ValueError:
+            # 空文件无法映射
+            self._file.close()
+            raise ValueError("快照文件损坏：文件为空")
+        self._sections = {}  # 名称 -> (偏移, 长度, CRC32)
+        try:
+            self._read_directory()
+        except (struct.error, IndexError, UnicodeDecodeError):
+            self.close()
+            raise ValueError("快照文件损坏：段目录不完整")
+        except ValueError:
+            self.close()
+            raise
+
+    def _read_directory(self):
+        magic, version, count = _HEADER.unpack_from(self._map, 0)
+        if magic != MAGIC:
+            raise ValueError("不是快照文件")
+        if version > VERSION:
+            raise ValueError(f"快照版本 {version} 过新，当前只支持到 {VERSION}")
+        pos = _HEADER.size
+        for _ in range(count):
+            length = self._map[pos]
+            name = self._map[pos + 1:pos + 1 + length].decode("utf-8")
+            pos += 1 + length
+            offset, size, crc = _ENTRY.unpack_from(self._map, pos)
+            pos += _ENTRY.size
+            if offset + size > len(self._map):
+                raise ValueError(f"快照文件损坏：{name} 段被截断")
+            self._sections[name] = (offset, size, crc)
+
+    def names(self) -> List[str]:
+        return list(self._sections)
+
+    def __contains__(self, name: str) -> bool:
+        return name in self._sections
+
+    def payload(self, name: str) -> bytes:
+        """段的原始字节（已校验 CRC），可以不解码直接交给 pack_snapshot()"""
+        offset, size, crc = self._sections[name]
+        payload = self._map[offset:offset + size]
+        if zlib.crc32(payload) != crc:
+            raise ValueError(f"快照文件损坏：{name} 段校验失败")
+        return payload
+
+    def load(self, name: str):
+        return decode_section(self.payload(name))
+
+    def close(self):
+        if self._map is not None:
+            self._map.close()
+            self._map = None
+        self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def read_snapshot(path: str) -> Dict[str, object]:
+    """一次解码全部集合"""
+    with SnapshotReader(path) as reader:
+        return {name: reader.load(name) for name in reader.names()}
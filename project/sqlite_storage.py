@@ -0,0 +1,508 @@
+# sqlite_storage.py
+import argparse
+import json
+import sqlite3
+import threading
+from contextlib import contextmanager
+from typing import List, Optional
+from datetime import datetime
+
+from models import (
+    User,
+    Product,
+    Order,
+    Complaint,
+    UserRole,
+    UserStatus,
+    ConditionLevel,
+    ProductStatus,
+    OrderStatus,
+    ComplaintType,
+    ComplaintStatus,
+)
+from search_index import ProductSearchIndex
+from storage import SALES_DIMENSIONS, SALES_STATUSES
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS users (
+    id INTEGER PRIMARY KEY,
+    username TEXT NOT NULL,
+    phone TEXT NOT NULL,
+    role TEXT NOT NULL,
+    status TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_users_phone ON users(phone);
+
+CREATE TABLE IF NOT EXISTS products (
+    id INTEGER PRIMARY KEY,
+    seller_id INTEGER NOT NULL,
+    title TEXT NOT NULL,
+    image_count INTEGER NOT NULL,
+    category TEXT NOT NULL,
+    condition TEXT NOT NULL,
+    price REAL NOT NULL,
+    stock INTEGER NOT NULL,
+    description TEXT NOT NULL,
+    contact TEXT NOT NULL,
+    status TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_products_seller ON products(seller_id);
+CREATE INDEX IF NOT EXISTS idx_products_status_category ON products(status, category);
+
+CREATE TABLE IF NOT EXISTS orders (
+    id INTEGER PRIMARY KEY,
+    buyer_id INTEGER NOT NULL,
+    product_id INTEGER NOT NULL,
+    quantity INTEGER NOT NULL,
+    amount REAL NOT NULL,
+    status TEXT NOT NULL,
+    created_at TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_orders_buyer ON orders(buyer_id);
+CREATE INDEX IF NOT EXISTS idx_orders_product ON orders(product_id);
+CREATE INDEX IF NOT EXISTS idx_orders_status ON orders(status);
+
+CREATE TABLE IF NOT EXISTS complaints (
+    id INTEGER PRIMARY KEY,
+    complainant_id INTEGER NOT NULL,
+    product_id INTEGER,
+    order_id INTEGER,
+    type TEXT NOT NULL,
+    status TEXT NOT NULL,
+    evidence_count INTEGER NOT NULL,
+    reason TEXT NOT NULL,
+    submitted_at TEXT NOT NULL,
+    result TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_complaints_status ON complaints(status);
+""" + "".join(
+    # 销售汇总表：sales_by_seller / sales_by_category / sales_by_day
+    f"""
+CREATE TABLE IF NOT EXISTS sales_by_{d} (
+    key PRIMARY KEY,
+    orders INTEGER NOT NULL,
+    quantity INTEGER NOT NULL,
+    amount REAL NOT NULL
+);"""
+    for d in SALES_DIMENSIONS
+)
+
+# 各表列顺序，与 models.*.to_dict() 的键一致
+COLUMNS = {
+    "users": ("id", "username", "phone", "role", "status"),
+    "products": (
+        "id", "seller_id", "title", "image_count", "category", "condition",
+        "price", "stock", "description", "contact", "status",
+    ),
+    "orders": ("id", "buyer_id", "product_id", "quantity", "amount", "status", "created_at"),
+    "complaints": (
+        "id", "complainant_id", "product_id", "order_id", "type", "status",
+        "evidence_count", "reason", "submitted_at", "result",
+    ),
+}
+
+# 固定的参数化 SQL，sqlite3 会按语句文本缓存编译结果（即预编译语句）
+INSERT_SQL = {
+    table: "INSERT INTO {} ({}) VALUES ({})".format(table, ", ".join(cols), ", ".join("?" * len(cols)))
+    for table, cols in COLUMNS.items()
+}
+
+
+# 各汇总维度在 orders o LEFT JOIN products p 上的取键表达式，重建时用
+SALES_KEYS = {"seller": "p.seller_id", "category": "p.category", "day": "substr(o.created_at, 1, 10)"}
+
+SALES_UPSERT_SQL = {
+    d: f"INSERT INTO sales_by_{d} (key, orders, quantity, amount) VALUES (?, ?, ?, ?) "
+    "ON CONFLICT(key) DO UPDATE SET orders = orders + excluded.orders, "
+    "quantity = quantity + excluded.quantity, amount = amount + excluded.amount"
+    for d in SALES_DIMENSIONS
+}
+
+# list_* 分页：LIMIT -1 表示不限条数
+PAGE_SQL = "SELECT * FROM {} ORDER BY id LIMIT ? OFFSET ?"
+
+
+def _page(offset: int, limit: Optional[int]) -> tuple:
+    return (-1 if limit is None else limit, offset)
+
+
+def _connect(path: str) -> sqlite3.Connection:
+    # isolation_level=None：单条语句自动提交，需要成组提交时显式 BEGIN
+    # check_same_thread=False：连接在线程间共享，由 SqliteDataStore._lock 串行化
+    conn = sqlite3.connect(path, isolation_level=None, check_same_thread=False)
+    conn.row_factory = sqlite3.Row
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("PRAGMA synchronous=NORMAL")
+    conn.executescript(SCHEMA)
+    return conn
+
+
+class SqliteDataStore:
+    """
+    SQLite 存储，对外方法与 storage.DataStore 一致，服务层无需修改
+    """
+
+    def __init__(self, path: str = "data.db"):
+        self.path = path
+        self.conn = _connect(path)
+        self._lock = threading.RLock()  # 共享连接上的语句和事务逐个执行
+        self._tx_depth = 0
+        self._tx_products = set()  # 事务内同步过搜索索引的商品 id，回滚时只重新同步这些
+        self.product_version = 0  # 商品集合每次变化加一，查询缓存据此失效
+        self._ensure_admin_user()
+        self._rebuild_search_index()
+        # 汇总表是后加的：老库里已有订单但汇总为空时补算一次
+        if self._one("SELECT 1 FROM sales_by_day LIMIT 1") is None and self._one(
+            "SELECT 1 FROM orders WHERE status IN (?, ?) LIMIT 1", SALES_STATUSES
+        ):
+            self.rebuild_sales()
+
+    # ------------ 基础读写 ------------
+
+    def _insert(self, table: str, record: dict) -> int:
+        # id 为 None 时由 SQLite 分配（INTEGER PRIMARY KEY）
+        values = [record[c] for c in COLUMNS[table]]
+        return self._execute(INSERT_SQL[table], values).lastrowid
+
+    def _execute(self, sql: str, params=()) -> sqlite3.Cursor:
+        with self._lock:
+            return self.conn.execute(sql, params)
+
+    def _one(self, sql: str, params=()) -> Optional[dict]:
+        with self._lock:
+            row = self.conn.execute(sql, params).fetchone()
+        return dict(row) if row else None
+
+    def _all(self, sql: str, params=()) -> List[dict]:
+        with self._lock:
+            return [dict(r) for r in self.conn.execute(sql, params)]
+
+    @contextmanager
+    def transaction(self):
+        """与 DataStore.transaction 语义一致：退出时一次提交，异常时回滚"""
+        with self._lock:
+            if self._tx_depth:
+                self._tx_depth += 1
+                try:
+                    yield self
+                finally:
+                    self._tx_depth -= 1
+                return
+            self.conn.execute("BEGIN IMMEDIATE")
+            self._tx_depth = 1
+            self._tx_products = set()
+            try:
+                yield self
+            except BaseException:
+                self._tx_depth = 0
+                self.conn.execute("ROLLBACK")
+                # 事务内已同步到内存索引的商品按回滚后的行重新同步，事务内新增的已不存在、从索引移除
+                touched, self._tx_products = self._tx_products, set()
+                for pid in touched:
+                    self._sync_product(pid)
+                raise
+            self._tx_depth = 0
+            self._tx_products = set()
+            self.conn.execute("COMMIT")
+
+    def _rebuild_search_index(self):
+        self.search_index = ProductSearchIndex()
+        self.product_version += 1
+        with self.search_index.bulk_load():
+            for row in self.conn.execute(
+                "SELECT id, title, price, category, condition, status FROM products WHERE status = ?",
+                (ProductStatus.ON_SALE.value,),
+            ):
+                self.search_index.upsert(dict(row))
+
+    def _sync_product(self, pid: int):
+        with self._lock:
+            self.product_version += 1
+            if self._tx_depth:
+                self._tx_products.add(pid)
+            row = self._one("SELECT id, title, price, category, condition, status FROM products WHERE id = ?", (pid,))
+            if row:
+                self.search_index.upsert(row)
+            else:
+                self.search_index.discard(pid)
+
+    def checkpoint(self):
+        """把 WAL 合并回主库文件"""
+        self._execute("PRAGMA wal_checkpoint(TRUNCATE)")
+
+    def flush(self):
+        """与 DataStore.flush 对应；SQLite 每次提交即已落盘，无需额外操作"""
+
+    def close(self):
+        self.conn.close()
+
+    # ------------ 用户 ------------
+
+    def _ensure_admin_user(self):
+        # 默认 admin 账号：手机号 00000000000
+        if self._one("SELECT id FROM users WHERE role = ? LIMIT 1", (UserRole.ADMIN.value,)):
+            return
+        self.add_user("管理员", "00000000000", UserRole.ADMIN)
+
+    def add_user(self, username: str, phone: str, role: UserRole) -> User:
+        user = User(id=None, username=username, phone=phone, role=role, status=UserStatus.NORMAL)
+        user.id = self._insert("users", user.to_dict())
+        return user
+
+    def find_user_by_phone(self, phone: str) -> Optional[User]:
+        u = self._one("SELECT * FROM users WHERE phone = ? ORDER BY id LIMIT 1", (phone,))
+        return User.from_dict(u) if u else None
+
+    def find_user_by_id(self, uid: int) -> Optional[User]:
+        u = self._one("SELECT * FROM users WHERE id = ?", (uid,))
+        return User.from_dict(u) if u else None
+
+    def update_user_status(self, user_id: int, status: UserStatus):
+        self._execute("UPDATE users SET status = ? WHERE id = ?", (status.value, user_id))
+
+    def list_users(self, offset: int = 0, limit: Optional[int] = None) -> List[User]:
+        return [User.from_dict(u) for u in self._all(PAGE_SQL.format("users"), _page(offset, limit))]
+
+    # ------------ 商品 ------------
+
+    def add_product(
+        self,
+        seller_id: int,
+        title: str,
+        image_count: int,
+        category: str,
+        condition: str,
+        price: float,
+        stock: int,
+        description: str,
+        contact: str,
+    ) -> Product:
+        product = Product(
+            id=None,
+            seller_id=seller_id,
+            title=title,
+            image_count=image_count,
+            category=category,
+            condition=ConditionLevel(condition),
+            price=price,
+            stock=stock,
+            description=description,
+            contact=contact,
+            status=ProductStatus.ON_SALE,
+        )
+        with self._lock:
+            product.id = self._insert("products", product.to_dict())
+            self.search_index.upsert(product.to_dict())
+            self.product_version += 1
+            if self._tx_depth:
+                self._tx_products.add(product.id)
+        return product
+
+    def list_products(self, offset: int = 0, limit: Optional[int] = None) -> List[Product]:
+        return [Product.from_dict(p) for p in self._all(PAGE_SQL.format("products"), _page(offset, limit))]
+
+    def products_by_seller(self, seller_id: int) -> List[Product]:
+        rows = self._all("SELECT * FROM products WHERE seller_id = ? ORDER BY id", (seller_id,))
+        return [Product.from_dict(p) for p in rows]
+
+    def products_by_status_category(self, status: ProductStatus, category: Optional[str] = None) -> List[Product]:
+        """category 为 None 时返回该状态下所有分类的商品"""
+        if category is None:
+            rows = self._all("SELECT * FROM products WHERE status = ? ORDER BY id", (status.value,))
+        else:
+            rows = self._all(
+                "SELECT * FROM products WHERE status = ? AND category = ? ORDER BY id",
+                (status.value, category),
+            )
+        return [Product.from_dict(p) for p in rows]
+
+    def update_product_status(self, pid: int, status: ProductStatus):
+        self._execute("UPDATE products SET status = ? WHERE id = ?", (status.value, pid))
+        self._sync_product(pid)
+
+    def update_product_stock(self, pid: int, stock: int):
+        with self._lock:
+            self.conn.execute("UPDATE products SET stock = ? WHERE id = ?", (stock, pid))
+            self.product_version += 1
+
+    def find_product_by_id(self, pid: int) -> Optional[Product]:
+        p = self._one("SELECT * FROM products WHERE id = ?", (pid,))
+        return Product.from_dict(p) if p else None
+
+    # ------------ 订单 ------------
+
+    def add_order(
+        self,
+        buyer_id: int,
+        product_id: int,
+        quantity: int,
+        amount: float,
+        status: OrderStatus = OrderStatus.PAID,
+    ) -> Order:
+        order = Order(
+            id=None,
+            buyer_id=buyer_id,
+            product_id=product_id,
+            quantity=quantity,
+            amount=amount,
+            status=status,
+            created_at=datetime.now().isoformat(timespec="seconds"),
+        )
+        with self.transaction():
+            order.id = self._insert("orders", order.to_dict())
+            self._add_sale(order.to_dict(), 1)
+        return order
+
+    def list_orders(self, offset: int = 0, limit: Optional[int] = None) -> List[Order]:
+        return [Order.from_dict(o) for o in self._all(PAGE_SQL.format("orders"), _page(offset, limit))]
+
+    def orders_by_buyer(self, buyer_id: int) -> List[Order]:
+        rows = self._all("SELECT * FROM orders WHERE buyer_id = ? ORDER BY id", (buyer_id,))
+        return [Order.from_dict(o) for o in rows]
+
+    def orders_by_product(self, product_id: int) -> List[Order]:
+        rows = self._all("SELECT * FROM orders WHERE product_id = ? ORDER BY id", (product_id,))
+        return [Order.from_dict(o) for o in rows]
+
+    def orders_by_status(self, status: OrderStatus) -> List[Order]:
+        rows = self._all("SELECT * FROM orders WHERE status = ? ORDER BY id", (status.value,))
+        return [Order.from_dict(o) for o in rows]
+
+    def update_order_status(self, oid: int, status: OrderStatus):
+        with self.transaction():
+            old = self._one("SELECT * FROM orders WHERE id = ?", (oid,))
+            if old is None:
+                return
+            self.conn.execute("UPDATE orders SET status = ? WHERE id = ?", (status.value, oid))
+            self._add_sale(old, -1)
+            self._add_sale(dict(old, status=status.value), 1)
+
+    def _add_sale(self, order: dict, sign: int):
+        """与 DataStore._add_sale 相同：订单计入 / 移出汇总表，需在事务内调用"""
+        if order["status"] not in SALES_STATUSES:
+            return
+        keys = {"day": order["created_at"][:10]}
+        product = self._one("SELECT seller_id, category FROM products WHERE id = ?", (order["product_id"],))
+        if product is not None:
+            keys["seller"] = product["seller_id"]
+            keys["category"] = product["category"]
+        for dimension, key in keys.items():
+            self.conn.execute(
+                SALES_UPSERT_SQL[dimension],
+                (key, sign, sign * order["quantity"], sign * order["amount"]),
+            )
+            self.conn.execute(f"DELETE FROM sales_by_{dimension} WHERE key = ? AND orders = 0", (key,))
+
+    def sales_summary(self, dimension: str) -> dict:
+        if dimension not in SALES_DIMENSIONS:
+            raise KeyError(dimension)
+        rows = self._all(f"SELECT key, orders, quantity, amount FROM sales_by_{dimension}")
+        return {
+            r["key"]: {"orders": r["orders"], "quantity": r["quantity"], "amount": round(r["amount"], 2)}
+            for r in rows
+        }
+
+    def rebuild_sales(self):
+        """清空汇总表，按订单表重新 GROUP BY 统计"""
+        with self.transaction():
+            for dimension, key in SALES_KEYS.items():
+                self.conn.execute(f"DELETE FROM sales_by_{dimension}")
+                self.conn.execute(
+                    f"INSERT INTO sales_by_{dimension} (key, orders, quantity, amount) "
+                    f"SELECT {key}, COUNT(*), SUM(o.quantity), SUM(o.amount) "
+                    "FROM orders o LEFT JOIN products p ON p.id = o.product_id "
+                    f"WHERE o.status IN (?, ?) AND {key} IS NOT NULL GROUP BY {key}",
+                    SALES_STATUSES,
+                )
+
+    def find_order_by_id(self, oid: int) -> Optional[Order]:
+        o = self._one("SELECT * FROM orders WHERE id = ?", (oid,))
+        return Order.from_dict(o) if o else None
+
+    # ------------ 投诉 ------------
+
+    def add_complaint(
+        self,
+        complainant_id: int,
+        product_id: Optional[int],
+        order_id: Optional[int],
+        type_value: str,
+        evidence_count: int,
+        reason: str,
+    ) -> Complaint:
+        complaint = Complaint(
+            id=None,
+            complainant_id=complainant_id,
+            product_id=product_id,
+            order_id=order_id,
+            type=ComplaintType(type_value),
+            status=ComplaintStatus.PENDING,
+            evidence_count=evidence_count,
+            reason=reason,
+            submitted_at=datetime.now().isoformat(timespec="seconds"),
+            result="",
+        )
+        complaint.id = self._insert("complaints", complaint.to_dict())
+        return complaint
+
+    def list_complaints(self, offset: int = 0, limit: Optional[int] = None) -> List[Complaint]:
+        return [Complaint.from_dict(c) for c in self._all(PAGE_SQL.format("complaints"), _page(offset, limit))]
+
+    def complaints_by_status(self, status: ComplaintStatus) -> List[Complaint]:
+        rows = self._all("SELECT * FROM complaints WHERE status = ? ORDER BY id", (status.value,))
+        return [Complaint.from_dict(c) for c in rows]
+
+    def find_complaint_by_id(self, cid: int) -> Optional[Complaint]:
+        c = self._one("SELECT * FROM complaints WHERE id = ?", (cid,))
+        return Complaint.from_dict(c) if c else None
+
+    def update_complaint_status(self, cid: int, status: ComplaintStatus, result: str):
+        self._execute(
+            "UPDATE complaints SET status = ?, result = ? WHERE id = ?",
+            (status.value, result, cid),
+        )
+
+
+# ------------ 从 data.json 迁移 ------------
+
+def migrate_json(json_path: str, db_path: str) -> dict:
+    """把 data.json 中的全部记录原样（保留 id）导入 SQLite，返回各表导入条数"""
+    with open(json_path, "r", encoding="utf-8") as f:
+        data = json.load(f)
+    models = {"users": User, "products": Product, "orders": Order, "complaints": Complaint}
+    # 直接用裸连接导入，避免 SqliteDataStore 先插入一个默认管理员占用 id
+    conn = _connect(db_path)
+    counts = {}
+    conn.execute("BEGIN")
+    try:
+        for table, cols in COLUMNS.items():
+            rows = []
+            for d in data.get(table, []):
+                # 经过 from_dict/to_dict 一遍，补齐老数据的缺省字段
+                record = models[table].from_dict(d).to_dict()
+                rows.append([record[c] for c in cols])
+            conn.executemany(INSERT_SQL[table].replace("INSERT", "INSERT OR REPLACE", 1), rows)
+            counts[table] = len(rows)
+        conn.execute("COMMIT")
+    except Exception:
+        conn.execute("ROLLBACK")
+        raise
+    finally:
+        conn.close()
+    return counts
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="把 data.json 一次性导入 SQLite")
+    parser.add_argument("json_path", nargs="?", default="data.json")
+    parser.add_argument("db_path", nargs="?", default="data.db")
+    parser.add_argument("--rebuild-sales", metavar="DB_PATH", help="不做迁移，只按订单表重建该库的销售汇总表")
+    args = parser.parse_args()
+    if args.rebuild_sales:
+        store = SqliteDataStore(path=args.rebuild_sales)
+        store.rebuild_sales()
+        print(f"sales_by_day: {len(store.sales_summary('day'))} 天")
+        store.close()
+    else:
+        for table, n in migrate_json(args.json_path, args.db_path).items():
+            print(f"{table}: {n}")
@@ -1,7 +1,12 @@
 # storage.py
+import atexit
 import json
 import os
-from typing import List, Optional
+import threading
+import time
+import traceback
+from contextlib import contextmanager, nullcontext
+from typing import Callable, List, Optional
 from datetime import datetime
 
 from models import (
@@ -12,17 +17,118 @@ from models import (
     UserRole,
     UserStatus,
     ProductStatus,
+    OrderStatus,
     ComplaintStatus,
 )
+from search_index import ProductSearchIndex
+from snapshot import SnapshotReader, decode_section, encode_section, pack_snapshot, write_snapshot_bytes
+
+COLLECTIONS = ("users", "products", "orders", "complaints")
+MODELS = {"users": User, "products": Product, "orders": Order, "complaints": Complaint}
+
+# 二级索引：索引名 -> (集合, 取索引键的函数)
+SECONDARY_INDEXES = {
+    "orders_by_buyer": ("orders", lambda r: r["buyer_id"]),
+    "orders_by_product": ("orders", lambda r: r["product_id"]),
+    "orders_by_status": ("orders", lambda r: r["status"]),
+    "products_by_seller": ("products", lambda r: r["seller_id"]),
+    "products_by_status": ("products", lambda r: r.get("status", ProductStatus.ON_SALE.value)),
+    "products_by_status_category": (
+        "products",
+        lambda r: (r.get("status", ProductStatus.ON_SALE.value), r.get("category", "未分类")),
+    ),
+    "complaints_by_status": ("complaints", lambda r: r["status"]),
+}
+
+# 计入销售汇总的订单状态（待支付、已取消不算）
+SALES_STATUSES = (OrderStatus.PAID.value, OrderStatus.COMPLETED.value)
+# 销售汇总的维度：卖家 id、商品分类、下单日期（YYYY-MM-DD）
+SALES_DIMENSIONS = ("seller", "category", "day")
+
+# 拆分文件模式下各自成文件的部分
+SPLIT_COLLECTIONS = COLLECTIONS + ("_id_counters",)
+
+# 持久化级别：sync 每次修改立即落盘；group 攒批，每 flush_interval_ms 或 flush_batch 条落一次；
+# deferred 停止修改 idle_flush_ms 后（或 flush()/close()/进程退出时）才落盘
+DURABILITY_MODES = ("sync", "group", "deferred")
 
 
 class DataStore:
     """
     简单文件存储，使用一个 data.json 保存所有数据
+
+    journal=True 时启用日志模式：每次修改只向 <path>.log 追加一条小记录，
+    data.json 退化为定期检查点（每 checkpoint_interval 条日志写一次），
+    启动时 _load() 先读检查点再重放日志尾部。
+
+    多线程：所有修改和整个事务都在 self._lock 内进行；读取不加锁，
+    需要"读后改"的场景（如校验库存后扣减）在 transaction() 内读取和修改。
+
+    split_files=True 时改为每个集合一个文件（data.users.json、data.products.json……
+    外加 data.counters.json），每个集合有脏标记，落盘只重写改动过的集合；
+    首次打开时若只有老的 data.json，会自动拆分并把原文件改名为 data.json.bak。
+
+    snapshot=True 时全量数据改存二进制快照 data.snap（见 snapshot.py），代替 data.json：
+    打开时只读段目录和计数器，每个集合在第一次被访问时才解码并建索引；
+    落盘只重新编码改动过的集合，其余段原样复制。
+    首次打开时若只有 data.json，同样自动转换并改名为 data.json.bak。
+
+    durability 不是 "sync" 时，修改立即在内存可见，落盘交给后台线程合并执行；
+    需要确保已写入磁盘时调用 flush()，退出前调用 close()。
     """
 
-    def __init__(self, path: str = "data.json"):
+    def __init__(
+        self,
+        path: str = "data.json",
+        journal: bool = False,
+        checkpoint_interval: int = 1000,
+        durability: str = "sync",
+        flush_interval_ms: int = 50,
+        flush_batch: int = 100,
+        idle_flush_ms: int = 1000,
+        split_files: bool = False,
+        snapshot: bool = False,
+    ):
+        if durability not in DURABILITY_MODES:
+            raise ValueError("不支持的持久化级别")
+        if split_files and snapshot:
+            raise ValueError("拆分文件与二进制快照不能同时启用")
         self.path = path
+        self.log_path = path + ".log"
+        self.journal = journal
+        self.checkpoint_interval = checkpoint_interval
+        self.durability = durability
+        self.split_files = split_files
+        self.snapshot = snapshot
+        self.snapshot_path = os.path.splitext(path)[0] + ".snap"
+        self._dirty = set()  # 自上次落盘以来改动过的集合（含 "_id_counters"），拆分文件和快照模式用
+        self._snapshot_reader = None  # 快照模式下尚未解码的集合从这里读取
+        self._unloaded = set()  # 快照模式下还没解码的集合
+        self._snapshot_payloads = {}  # 快照模式下与文件一致的段：集合 -> 编码好的字节
+        self.flush_interval = flush_interval_ms / 1000
+        self.flush_batch = flush_batch
+        self.idle_flush = idle_flush_ms / 1000
+        self._log_count = 0
+        self._lock = threading.RLock()  # 写锁：修改、事务、对象缓存填充
+        self._io_lock = threading.Lock()  # 写文件的先后顺序；只在持有 self._lock 时获取
+        self._flush_cond = threading.Condition(self._lock)  # 唤醒后台落盘线程
+        self._pending = []  # 已提交、尚未落盘的修改记录
+        self._pending_since = None  # 第一条未落盘记录的时间
+        self._last_write = 0.0
+        self._flusher = None
+        self._closed = False
+        self._tx_depth = 0
+        self._tx_entries = []  # 事务内暂存的修改记录
+        self._tx_undo = []  # 事务回滚用的撤销记录
+        self._by_id = {c: {} for c in COLLECTIONS}  # collection -> {id: record}
+        self._user_by_phone = {}  # phone -> user record
+        self._secondary = {name: {} for name in SECONDARY_INDEXES}  # 索引名 -> {键: {id: record}}
+        self._sales = {d: {} for d in SALES_DIMENSIONS}  # 维度 -> {键: [订单数, 件数, 金额]}
+        self._objects = {c: {} for c in COLLECTIONS}  # 已转换的模型对象：collection -> {id: obj}
+        self._fragments = {c: {} for c in COLLECTIONS}  # 记录的 JSON 文本：collection -> {id: str}
+        self._list_cache = {}  # collection -> list_* 的结果
+        self._search_index = ProductSearchIndex()  # 在售商品标题倒排索引，经 search_index 访问
+        self.product_version = 0  # 商品集合每次变化加一，查询缓存据此失效
         self.data = {
             "users": [],
             "products": [],
@@ -37,33 +143,557 @@ class DataStore:
         }
         self._load()
         self._ensure_admin_user()
+        if durability != "sync":
+            self._flusher = threading.Thread(target=self._flush_loop, name="datastore-flusher", daemon=True)
+            self._flusher.start()
+            atexit.register(self.close)
 
     # ------------ 基础读写 ------------
 
     def _load(self):
-        if os.path.exists(self.path):
+        migrate = False
+        # 迁移完成的标志是 data.json 已改名为 .bak：迁移中途崩溃时拆分文件可能只写了一部分，
+        # data.json 还在就以它为准重新迁移
+        if self.split_files and os.path.exists(self._split_path("_id_counters")) and not os.path.exists(self.path):
+            for c in SPLIT_COLLECTIONS:
+                if os.path.exists(self._split_path(c)):
+                    with open(self._split_path(c), "r", encoding="utf-8") as f:
+                        self.data[c] = json.load(f)
+        elif self.snapshot and os.path.exists(self.snapshot_path):
+            # 快照损坏时直接抛出，不能当作空库继续运行而在下次落盘时覆盖掉
+            self._open_snapshot()
+        elif os.path.exists(self.path):
             try:
                 with open(self.path, "r", encoding="utf-8") as f:
                     self.data = json.load(f)
+                # 拆分文件或快照模式第一次打开老的单文件：读完后整体转换写出
+                migrate = self.split_files or self.snapshot
             # FLAW_A4: bare except hides all errors (CWE-391)
             except:
                 pass
+        self._rebuild_indexes()
+        if os.path.exists(self.log_path):
+            self._replay_log()
+            if not self.journal:
+                # 非日志模式下遗留的日志：合并进 data.json 后清掉
+                self.checkpoint()
+        if migrate:
+            self._dirty.update(SPLIT_COLLECTIONS)
+            self.checkpoint()
+            os.replace(self.path, self.path + ".bak")
 
-    def _save(self):
+    def _open_snapshot(self):
+        # 只解码计数器；各集合留到 _ensure_loaded() 第一次用到时再解码
+        reader = self._snapshot_reader = SnapshotReader(self.snapshot_path)
+        for c in SPLIT_COLLECTIONS:
+            if c in reader:
+                self._unloaded.add(c)
+        if "_id_counters" in reader:
+            self._load_section("_id_counters")
+
+    def _ensure_loaded(self, collection: str):
+        if collection in self._unloaded:
+            self._load_section(collection)
+
+    def _load_section(self, collection: str):
+        with self._lock:
+            if collection not in self._unloaded:
+                return
+            if collection == "orders":
+                # 销售汇总要按订单的商品取卖家和分类
+                self._ensure_loaded("products")
+            payload = self._snapshot_payloads.get(collection)
+            if payload is None:
+                payload = self._snapshot_payloads[collection] = self._snapshot_reader.payload(collection)
+            self.data[collection] = decode_section(payload)
+            if collection in COLLECTIONS:
+                self._index_collection(collection)
+            # 建完索引再标记，不加锁的读取不会看到建到一半的索引
+            self._unloaded.discard(collection)
+
+    def _split_path(self, collection: str) -> str:
+        base, ext = os.path.splitext(self.path)
+        name = "counters" if collection == "_id_counters" else collection
+        return f"{base}.{name}{ext or '.json'}"
+
+    # 落盘分两步：_prepare_save() 在锁内取出要写的内容——每条记录的 JSON 文本缓存在 _fragments 里，
+    # 记录被修改时随 _invalidate 丢弃，只需重新编码改动过的记录；取出的是不可变的字符串（快照模式下是
+    # 编码好的字节）。返回的函数拼接并写文件，不需要锁：后台落盘线程在锁外执行它，读取不必等整文件重写。
+    # 写文件的先后由 self._io_lock 保证，它总是在持有 self._lock 时获取。输出为每行一条记录的合法 JSON。
+
+    def _collection_parts(self, collection: str):
+        if collection not in self._fragments:
+            return json.dumps(self.data[collection], ensure_ascii=False)
+        cache = self._fragments[collection]
+        parts = []
+        for record in self.data[collection]:
+            fragment = cache.get(record["id"])
+            if fragment is None:
+                fragment = cache[record["id"]] = json.dumps(record, ensure_ascii=False)
+            parts.append(fragment)
+        return parts
+
+    @staticmethod
+    def _join_parts(parts) -> str:
+        if isinstance(parts, str):
+            return parts
+        return "[\n" + ",\n".join(parts) + "\n]" if parts else "[]"
+
+    @classmethod
+    def _join_document(cls, parts: dict) -> str:
+        return "{\n" + ",\n".join(
+            f"{json.dumps(c)}: {cls._join_parts(p)}" for c, p in parts.items()
+        ) + "\n}\n"
+
+    def _prepare_save(self) -> Callable[[], None]:
+        # 调用方已持有 self._lock
+        if self.split_files:
+            # 只重写有脏标记的集合
+            parts = {c: self._collection_parts(c) for c in self._dirty}
+            self._dirty.clear()
+            return lambda: self._write_split(parts)
+        if self.snapshot:
+            payloads = self._snapshot_sections()
+            return lambda: write_snapshot_bytes(self.snapshot_path, pack_snapshot(payloads))
+        parts = {c: self._collection_parts(c) for c in self.data}
+        return lambda: self._write_document(parts)
+
+    def _snapshot_sections(self) -> dict:
+        # 调用方已持有 self._lock；只有改动过的集合重新编码，其余沿用上次的字节
+        for c in self._dirty - self._unloaded:
+            self._snapshot_payloads.pop(c, None)
+        self._dirty.clear()
+        payloads = {}
+        for c in SPLIT_COLLECTIONS:
+            payload = self._snapshot_payloads.get(c)
+            if payload is None:
+                if c in self._unloaded:
+                    payload = self._snapshot_reader.payload(c)
+                else:
+                    payload = encode_section(self.data[c])
+                self._snapshot_payloads[c] = payload
+            payloads[c] = payload
+        if self._snapshot_reader is not None:
+            # 未解码的段都已复制出来；被映射的文件在部分平台上不能被替换，先关掉
+            self._snapshot_reader.close()
+            self._snapshot_reader = None
+        return payloads
+
+    def _write_split(self, parts: dict):
+        # 每个文件先写临时文件再替换
+        for c in sorted(parts):
+            path = self._split_path(c)
+            with open(path + ".tmp", "w", encoding="utf-8") as f:
+                f.write(self._join_parts(parts[c]))
+            os.replace(path + ".tmp", path)
+
+    def _write_document(self, parts: dict):
         # FLAW_A3: file descriptor leak - intentionally not closing file (CWE-772)
         f = open(self.path, "w", encoding="utf-8")
-        json.dump(self.data, f, ensure_ascii=False, indent=2)
+        f.write(self._join_document(parts))
         # intentionally missing: f.close()
 
+    def _save(self):
+        write = self._prepare_save()
+        with self._io_lock:
+            write()
+
     def _next_id(self, collection: str) -> int:
-        current = self.data["_id_counters"].get(collection, 1)
-        self.data["_id_counters"][collection] = current + 1
-        return current
+        with self._lock:
+            self._dirty.add("_id_counters")
+            current = self.data["_id_counters"].get(collection, 1)
+            self.data["_id_counters"][collection] = current + 1
+            return current
+
+    # ------------ 索引 ------------
+
+    def _rebuild_indexes(self):
+        self._by_id = {c: {} for c in COLLECTIONS}
+        self._user_by_phone = {}
+        self._secondary = {name: {} for name in SECONDARY_INDEXES}
+        self._sales = {d: {} for d in SALES_DIMENSIONS}
+        self._objects = {c: {} for c in COLLECTIONS}
+        self._fragments = {c: {} for c in COLLECTIONS}
+        self._list_cache = {}
+        self._search_index = ProductSearchIndex()
+        self.product_version = 0
+        for c in COLLECTIONS:
+            if c not in self._unloaded:
+                self._index_collection(c)
+
+    def _index_collection(self, collection: str):
+        with self._search_index.bulk_load() if collection == "products" else nullcontext():
+            for r in self.data[collection]:
+                self._index_record(collection, r)
+
+    @property
+    def search_index(self) -> ProductSearchIndex:
+        self._ensure_loaded("products")
+        return self._search_index
+
+    def _index_record(self, collection: str, record: dict):
+        self._list_cache.pop(collection, None)
+        if collection == "products":
+            self.product_version += 1
+        self._by_id[collection][record["id"]] = record
+        if collection == "users":
+            # 与原来的线性查找一致：同号多条时以第一条为准
+            self._user_by_phone.setdefault(record["phone"], record)
+        self._index_secondary(collection, record)
+
+    def _unindex_record(self, collection: str, record: dict):
+        self._invalidate(collection, record)
+        self._by_id[collection].pop(record["id"], None)
+        if collection == "users" and self._user_by_phone.get(record["phone"]) is record:
+            del self._user_by_phone[record["phone"]]
+        self._unindex_secondary(collection, record)
+        if collection == "products":
+            self._search_index.discard(record["id"])
+
+    def _index_secondary(self, collection: str, record: dict):
+        for name, (c, key_of) in SECONDARY_INDEXES.items():
+            if c == collection:
+                self._secondary[name].setdefault(key_of(record), {})[record["id"]] = record
+        if collection == "products":
+            # upsert 自己比较标题/状态，只改库存时不会重新切词
+            self._search_index.upsert(record)
+        elif collection == "orders":
+            self._add_sale(record, 1)
+
+    def _unindex_secondary(self, collection: str, record: dict):
+        for name, (c, key_of) in SECONDARY_INDEXES.items():
+            if c == collection:
+                bucket = self._secondary[name].get(key_of(record))
+                if bucket is not None:
+                    bucket.pop(record["id"], None)
+        if collection == "orders":
+            self._add_sale(record, -1)
+
+    def _add_sale(self, order: dict, sign: int):
+        """把一笔订单计入（sign=1）或移出（sign=-1）销售汇总，O(1)"""
+        if order["status"] not in SALES_STATUSES:
+            return
+        keys = {"day": order["created_at"][:10]}
+        product = self._record("products", order["product_id"])
+        if product is not None:
+            keys["seller"] = product["seller_id"]
+            keys["category"] = product.get("category", "未分类")
+        for dimension, key in keys.items():
+            table = self._sales[dimension]
+            row = table.get(key)
+            if row is None:
+                row = table[key] = [0, 0, 0.0]
+            row[0] += sign
+            row[1] += sign * order["quantity"]
+            row[2] += sign * order["amount"]
+            if row[0] == 0:
+                del table[key]
+
+    def _modify(self, collection: str, record: dict, fields: dict):
+        self._invalidate(collection, record)
+        self._unindex_secondary(collection, record)
+        record.update(fields)
+        self._index_secondary(collection, record)
+
+    def _lookup(self, index: str, key) -> list:
+        collection = SECONDARY_INDEXES[index][0]
+        self._ensure_loaded(collection)
+        with self._lock:
+            bucket = self._secondary[index].get(key, {})
+            # 状态类索引的记录会在桶之间移动，按 id 排序保持与全表扫描一致的顺序
+            return [self._hydrate(collection, bucket[rid]) for rid in sorted(bucket)]
+
+    # ------------ 对象缓存 ------------
+    # 同一条记录只 from_dict 一次，修改时丢弃缓存；返回的对象是共享的，调用方不要修改，
+    # list_* 每次返回列表的副本，调用方排序或增删不影响缓存
+
+    def _hydrate(self, collection: str, record: dict):
+        obj = self._objects[collection].get(record["id"])
+        if obj is None:
+            # 加锁填充，避免与并发修改交错时把旧对象放回缓存
+            with self._lock:
+                obj = MODELS[collection].from_dict(record)
+                self._objects[collection][record["id"]] = obj
+        return obj
+
+    def _invalidate(self, collection: str, record: dict):
+        self._objects[collection].pop(record["id"], None)
+        self._fragments[collection].pop(record["id"], None)
+        self._list_cache.pop(collection, None)
+        if collection == "products":
+            self.product_version += 1
+
+    def _list(self, collection: str, offset: int = 0, limit: Optional[int] = None) -> list:
+        self._ensure_loaded(collection)
+        cached = self._list_cache.get(collection)
+        if cached is None:
+            with self._lock:
+                cached = [self._hydrate(collection, r) for r in self.data[collection]]
+                self._list_cache[collection] = cached
+        if offset or limit is not None:
+            return cached[offset:None if limit is None else offset + limit]
+        return list(cached)
+
+    def _record(self, collection: str, rid: int) -> Optional[dict]:
+        self._ensure_loaded(collection)
+        return self._by_id[collection].get(rid)
+
+    def _find(self, collection: str, rid: int):
+        record = self._record(collection, rid)
+        return self._hydrate(collection, record) if record is not None else None
+
+    # ------------ 修改入口 / 日志 ------------
+
+    def _insert(self, collection: str, record: dict):
+        with self._lock:
+            self._ensure_loaded(collection)
+            self._dirty.add(collection)
+            self.data[collection].append(record)
+            self._index_record(collection, record)
+            if self._tx_depth:
+                self._tx_undo.append(("insert", collection, record, None))
+            self._commit({"op": "insert", "c": collection, "r": record})
+
+    def _update(self, collection: str, rid: int, **fields) -> Optional[dict]:
+        with self._lock:
+            record = self._record(collection, rid)
+            if record is None:
+                return None
+            self._dirty.add(collection)
+            if self._tx_depth:
+                old = {k: record[k] for k in fields if k in record}
+                self._tx_undo.append(("update", collection, record, old))
+            self._modify(collection, record, fields)
+            self._commit({"op": "update", "c": collection, "id": rid, "f": fields})
+            return record
+
+    def _commit(self, entry: dict):
+        if self._tx_depth:
+            self._tx_entries.append(entry)
+            return
+        self._write_entries([entry])
+
+    def _write_entries(self, entries: List[dict]):
+        # 调用方已持有 self._lock
+        if self.durability == "sync":
+            self._persist(entries)
+            return
+        self._pending.extend(entries)
+        self._last_write = time.monotonic()
+        if self._pending_since is None:
+            self._pending_since = self._last_write
+        self._flush_cond.notify()
+
+    def _persist(self, entries: List[dict]):
+        # 调用方已持有 self._lock
+        if not self.journal:
+            self._save()
+            return
+        write = self._prepare_persist(entries)
+        with self._io_lock:
+            write()
+
+    def _prepare_persist(self, entries: List[dict]) -> Callable[[], None]:
+        # 调用方已持有 self._lock；与 _prepare_save 一样，返回的函数在锁外也能执行
+        if not self.journal:
+            return self._prepare_save()
+        self._log_count += len(entries)
+        if self._log_count >= self.checkpoint_interval:
+            # 检查点已包含这批修改，不必再追加
+            return self._prepare_checkpoint()
+        text = "".join(json.dumps(e, ensure_ascii=False) + "\n" for e in entries)
+
+        def append():
+            with open(self.log_path, "a", encoding="utf-8") as f:
+                f.write(text)
+
+        return append
+
+    # ------------ 后台落盘 ------------
+
+    def _flush_loop(self):
+        with self._flush_cond:
+            while not self._closed:
+                if not self._pending:
+                    self._flush_cond.wait()
+                    continue
+                now = time.monotonic()
+                if self.durability == "group":
+                    if len(self._pending) >= self.flush_batch:
+                        due = now
+                    else:
+                        due = self._pending_since + self.flush_interval
+                else:
+                    due = self._last_write + self.idle_flush
+                if now < due:
+                    self._flush_cond.wait(due - now)
+                    continue
+                try:
+                    self._flush_pending()
+                except Exception:
+                    # 写盘失败（如磁盘满）不丢数据，稍后重试
+                    traceback.print_exc()
+                    self._flush_cond.wait(max(self.flush_interval, 0.1))
+
+    def _flush_pending(self):
+        # 调用方已持有 self._lock：只在锁内取出要写的内容，拼接和写盘时暂时放开锁
+        entries = self._pending
+        self._pending = []
+        self._pending_since = None
+        write = self._prepare_persist(entries)
+        try:
+            # 先占住写盘顺序再放锁：之后取出的内容一定排在这次之后写
+            self._io_lock.acquire()
+            self._lock.release()
+            try:
+                write()
+            finally:
+                self._io_lock.release()
+                self._lock.acquire()
+        except Exception:
+            # 写盘失败（如磁盘满）不丢数据：放回队首稍后重试，拆分文件模式全部重新标脏
+            self._pending[:0] = entries
+            if self._pending_since is None:
+                self._pending_since = time.monotonic()
+            self._dirty.update(SPLIT_COLLECTIONS)
+            raise
+
+    def flush(self):
+        """把尚未落盘的修改立即写入磁盘（sync 模式下无事可做）"""
+        with self._lock:
+            if self._pending:
+                self._flush_pending()
+
+    def close(self):
+        """停止后台落盘线程并写入剩余修改；可重复调用"""
+        with self._flush_cond:
+            self._closed = True
+            self._flush_cond.notify()
+        if self._flusher is not None:
+            self._flusher.join()
+            self._flusher = None
+        self.flush()
+
+    @contextmanager
+    def transaction(self):
+        """
+        with store.transaction(): 内的所有修改在退出时一次性落盘；
+        抛出异常则在内存中回滚，不写文件。嵌套使用时并入最外层事务。
+        事务期间持有写锁，其他线程的修改要等它结束。
+        """
+        with self._lock:
+            if self._tx_depth:
+                self._tx_depth += 1
+                try:
+                    yield self
+                finally:
+                    self._tx_depth -= 1
+                return
+            counters = dict(self.data["_id_counters"])
+            self._tx_depth = 1
+            self._tx_entries = []
+            self._tx_undo = []
+            try:
+                yield self
+            except BaseException:
+                self._tx_depth = 0
+                self._rollback(counters)
+                raise
+            self._tx_depth = 0
+            entries, self._tx_entries, self._tx_undo = self._tx_entries, [], []
+            if entries:
+                self._write_entries(entries)
+
+    def _rollback(self, counters: dict):
+        for op, collection, record, old in reversed(self._tx_undo):
+            if op == "insert":
+                self._unindex_record(collection, record)
+                records = self.data[collection]
+                # 倒序撤销，事务内插入的记录总在列表末尾
+                if records and records[-1] is record:
+                    records.pop()
+                else:
+                    records.remove(record)
+            else:
+                self._modify(collection, record, old)
+        self.data["_id_counters"] = counters
+        self._tx_entries = []
+        self._tx_undo = []
+
+    def _apply(self, entry: dict):
+        collection = entry["c"]
+        self._dirty.update((collection, "_id_counters"))
+        if entry["op"] == "insert":
+            record = entry["r"]
+            existing = self._record(collection, record["id"])
+            if existing is not None:
+                # 检查点替换了 data.json 但没来得及删日志时，日志里的插入已在文件中，只当作覆盖
+                self._modify(collection, existing, record)
+            else:
+                self.data[collection].append(record)
+                self._index_record(collection, record)
+            counters = self.data["_id_counters"]
+            counters[collection] = max(counters.get(collection, 1), record["id"] + 1)
+        elif entry["op"] == "update":
+            record = self._record(collection, entry["id"])
+            if record is not None:
+                self._modify(collection, record, entry["f"])
+
+    def _replay_log(self):
+        complete = 0  # 最后一条完整记录的结束位置
+        with open(self.log_path, "rb") as f:
+            for line in f:
+                try:
+                    # 没有换行符的最后一行是追加到一半的记录
+                    entry = json.loads(line) if line.endswith(b"\n") else None
+                except ValueError:
+                    entry = None
+                if entry is None:
+                    # 进程在追加中途退出留下的半行，之后不会再有完整记录
+                    break
+                self._apply(entry)
+                self._log_count += 1
+                complete += len(line)
+        if self.journal and complete < os.path.getsize(self.log_path):
+            # 截掉半行，否则之后的记录会接在它后面，下次启动时连同半行一起被丢弃
+            with open(self.log_path, "r+b") as f:
+                f.truncate(complete)
+
+    def checkpoint(self):
+        """把内存数据写入 data.json（拆分文件模式下写入改动过的集合文件，快照模式下写入 data.snap）并清空日志"""
+        with self._lock:
+            write = self._prepare_checkpoint()
+            with self._io_lock:
+                write()
+
+    def _prepare_checkpoint(self) -> Callable[[], None]:
+        # 调用方已持有 self._lock；检查点包含全部内存数据，还没落盘的日志记录不必再写
+        self._pending = []
+        self._pending_since = None
+        self._log_count = 0
+        if self.split_files or self.snapshot:
+            save = self._prepare_save()
+        else:
+            parts = {c: self._collection_parts(c) for c in self.data}
+
+            def save():
+                tmp_path = self.path + ".tmp"
+                with open(tmp_path, "w", encoding="utf-8") as f:
+                    f.write(self._join_document(parts))
+                os.replace(tmp_path, self.path)
+
+        def write():
+            save()
+            if os.path.exists(self.log_path):
+                os.remove(self.log_path)
+
+        return write
 
     # ------------ 用户 ------------
 
     def _ensure_admin_user(self):
         # 默认 admin 账号：手机号 00000000000
+        self._ensure_loaded("users")
         for u in self.data["users"]:
             if u["role"] == UserRole.ADMIN.value:
                 return
@@ -74,8 +704,7 @@ class DataStore:
             role=UserRole.ADMIN,
             status=UserStatus.NORMAL,
         )
-        self.data["users"].append(admin.to_dict())
-        self._save()
+        self._insert("users", admin.to_dict())
 
     def add_user(self, username: str, phone: str, role: UserRole) -> User:
         user = User(
@@ -85,31 +714,22 @@ class DataStore:
             role=role,
             status=UserStatus.NORMAL,
         )
-        self.data["users"].append(user.to_dict())
-        self._save()
+        self._insert("users", user.to_dict())
         return user
 
     def find_user_by_phone(self, phone: str) -> Optional[User]:
-        for u in self.data["users"]:
-            if u["phone"] == phone:
-                return User.from_dict(u)
-        return None
+        self._ensure_loaded("users")
+        u = self._user_by_phone.get(phone)
+        return self._hydrate("users", u) if u else None
 
     def find_user_by_id(self, uid: int) -> Optional[User]:
-        for u in self.data["users"]:
-            if u["id"] == uid:
-                return User.from_dict(u)
-        return None
+        return self._find("users", uid)
 
     def update_user_status(self, user_id: int, status: UserStatus):
-        for u in self.data["users"]:
-            if u["id"] == user_id:
-                u["status"] = status.value
-                break
-        self._save()
+        self._update("users", user_id, status=status.value)
 
-    def list_users(self) -> List[User]:
-        return [User.from_dict(u) for u in self.data["users"]]
+    def list_users(self, offset: int = 0, limit: Optional[int] = None) -> List[User]:
+        return self._list("users", offset, limit)
 
     # ------------ 商品 ------------
 
@@ -140,25 +760,29 @@ class DataStore:
             contact=contact,
             status=ProductStatus.ON_SALE,
         )
-        self.data["products"].append(product.to_dict())
-        self._save()
+        self._insert("products", product.to_dict())
         return product
 
-    def list_products(self) -> List[Product]:
-        return [Product.from_dict(p) for p in self.data["products"]]
+    def list_products(self, offset: int = 0, limit: Optional[int] = None) -> List[Product]:
+        return self._list("products", offset, limit)
+
+    def products_by_seller(self, seller_id: int) -> List[Product]:
+        return self._lookup("products_by_seller", seller_id)
+
+    def products_by_status_category(self, status: ProductStatus, category: Optional[str] = None) -> List[Product]:
+        """category 为 None 时返回该状态下所有分类的商品"""
+        if category is None:
+            return self._lookup("products_by_status", status.value)
+        return self._lookup("products_by_status_category", (status.value, category))
 
     def update_product_status(self, pid: int, status: ProductStatus):
-        for p in self.data["products"]:
-            if p["id"] == pid:
-                p["status"] = status.value
-                break
-        self._save()
+        self._update("products", pid, status=status.value)
+
+    def update_product_stock(self, pid: int, stock: int):
+        self._update("products", pid, stock=stock)
 
     def find_product_by_id(self, pid: int) -> Optional[Product]:
-        for p in self.data["products"]:
-            if p["id"] == pid:
-                return Product.from_dict(p)
-        return None
+        return self._find("products", pid)
 
     # ------------ 订单 ------------
 
@@ -168,6 +792,7 @@ class DataStore:
         product_id: int,
         quantity: int,
         amount: float,
+        status: OrderStatus = OrderStatus.PAID,
     ) -> Order:
         order = Order(
             id=self._next_id("orders"),
@@ -175,21 +800,45 @@ class DataStore:
             product_id=product_id,
             quantity=quantity,
             amount=amount,
-            status=OrderStatus.PAID,
+            status=status,
             created_at=datetime.now().isoformat(timespec="seconds"),
         )
-        self.data["orders"].append(order.to_dict())
-        self._save()
+        self._insert("orders", order.to_dict())
         return order
 
-    def list_orders(self) -> List[Order]:
-        return [Order.from_dict(o) for o in self.data["orders"]]
+    def list_orders(self, offset: int = 0, limit: Optional[int] = None) -> List[Order]:
+        return self._list("orders", offset, limit)
+
+    def orders_by_buyer(self, buyer_id: int) -> List[Order]:
+        return self._lookup("orders_by_buyer", buyer_id)
+
+    def orders_by_product(self, product_id: int) -> List[Order]:
+        return self._lookup("orders_by_product", product_id)
+
+    def orders_by_status(self, status: OrderStatus) -> List[Order]:
+        return self._lookup("orders_by_status", status.value)
+
+    def update_order_status(self, oid: int, status: OrderStatus):
+        self._update("orders", oid, status=status.value)
 
     def find_order_by_id(self, oid: int) -> Optional[Order]:
-        for o in self.data["orders"]:
-            if o["id"] == oid:
-                return Order.from_dict(o)
-        return None
+        return self._find("orders", oid)
+
+    def sales_summary(self, dimension: str) -> dict:
+        """维度（seller / category / day）下每个键的 {"orders", "quantity", "amount"}"""
+        self._ensure_loaded("orders")
+        return {
+            key: {"orders": n, "quantity": q, "amount": round(a, 2)}
+            for key, (n, q, a) in self._sales[dimension].items()
+        }
+
+    def rebuild_sales(self):
+        """丢弃销售汇总，按全部订单重新统计"""
+        self._ensure_loaded("orders")
+        with self._lock:
+            self._sales = {d: {} for d in SALES_DIMENSIONS}
+            for order in self.data["orders"]:
+                self._add_sale(order, 1)
 
     # ------------ 投诉 ------------
 
@@ -216,18 +865,18 @@ class DataStore:
             submitted_at=datetime.now().isoformat(timespec="seconds"),
             result="",
         )
-        self.data["complaints"].append(complaint.to_dict())
-        self._save()
+        self._insert("complaints", complaint.to_dict())
         return complaint
 
-    def list_complaints(self) -> List[Complaint]:
-        return [Complaint.from_dict(c) for c in self.data["complaints"]]
+    def list_complaints(self, offset: int = 0, limit: Optional[int] = None) -> List[Complaint]:
+        return self._list("complaints", offset, limit)
+
+    def complaints_by_status(self, status: ComplaintStatus) -> List[Complaint]:
+        return self._lookup("complaints_by_status", status.value)
+
+    def find_complaint_by_id(self, cid: int) -> Optional[Complaint]:
+        return self._find("complaints", cid)
 
     def update_complaint_status(self, cid: int, status: ComplaintStatus, result: str):
-        for c in self.data["complaints"]:
-            if c["id"] == cid:
-                c["status"] = status.value
-                c["result"] = result
-                break
-        self._save()
+        self._update("complaints", cid, status=status.value, result=result)
 
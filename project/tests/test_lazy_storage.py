@@ -0,0 +1,156 @@
+import json
+import pytest
+
+from lazy_storage import LazyDataStore
+from storage import DataStore
+from models import ComplaintStatus, OrderStatus, ProductStatus, UserRole
+
+
+@pytest.fixture
+def db_path(tmp_path):
+    """先用 DataStore 写好一个有数据的 data.json"""
+    path = str(tmp_path / "data.json")
+    store = DataStore(path=path)
+    seller = store.add_user("卖家", "13500002001", UserRole.SELLER)
+    buyer = store.add_user("买家", "13500002002", UserRole.BUYER)
+    for i in range(20):
+        store.add_product(seller.id, f"二手相机{i}", 1, "数码", "全新", 100.0 + i, 5, "描述描述描述描述描述", "C")
+    store.add_order(buyer.id, 1, 1, 100.0)
+    return path
+
+
+def test_reads_without_materializing(db_path):
+    """测试：按 id、手机号查找和分页只解码需要的记录，对象缓存不超过 cache_size"""
+    store = LazyDataStore(path=db_path, cache_size=5)
+    assert store.find_user_by_phone("13500002001").username == "卖家"
+    assert store.find_product_by_id(7).title == "二手相机6"
+    assert store.find_product_by_id(999) is None
+    assert [p.id for p in store.list_products(offset=10, limit=3)] == [11, 12, 13]
+    assert len(store._cache) <= 5
+    assert store._overlay["products"] == {}
+
+
+def test_reads_pretty_printed_json(tmp_path):
+    """测试：老的缩进格式 data.json 也能建立偏移索引"""
+    path = str(tmp_path / "data.json")
+    data = {
+        "users": [{"id": 1, "username": "管理员", "phone": "00000000000", "role": "ADMIN", "status": "NORMAL"}],
+        "products": [],
+        "orders": [],
+        "complaints": [],
+        "_id_counters": {"users": 2, "products": 1, "orders": 1, "complaints": 1},
+    }
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(data, f, ensure_ascii=False, indent=2)
+
+    store = LazyDataStore(path=path)
+    assert store.find_user_by_phone("00000000000").id == 1
+    assert len(store.list_users()) == 1  # 已有管理员，不会再插入
+    assert store.add_user("新用户", "13500002003", UserRole.BUYER).id == 2
+
+
+
+@pytest.mark.parametrize("layout", ["two_per_line", "single_line"])
+def test_reads_non_line_per_record_json(tmp_path, layout):
+    """测试：一行多条记录、整个文件写在一行的 data.json 交给通用解析，不漏记录"""
+    path = str(tmp_path / "data.json")
+    users = [
+        {"id": 1, "username": "管理员", "phone": "00000000000", "role": "ADMIN", "status": "NORMAL"},
+        {"id": 2, "username": "买家", "phone": "13500002004", "role": "BUYER", "status": "NORMAL"},
+        {"id": 3, "username": "卖家", "phone": "13500002005", "role": "SELLER", "status": "NORMAL"},
+    ]
+    counters = {"users": 4, "products": 1, "orders": 1, "complaints": 1}
+    if layout == "single_line":
+        data = {"users": users, "products": [], "orders": [], "complaints": [], "_id_counters": counters}
+        text = json.dumps(data, ensure_ascii=False) + "\n"
+    else:
+        rows = [json.dumps(u, ensure_ascii=False) for u in users]
+        text = (
+            '{\n"users": [\n' + rows[0] + ", " + rows[1] + ",\n" + rows[2] + "\n],\n"
+            '"products": [],\n"orders": [],\n"complaints": [],\n'
+            '"_id_counters": ' + json.dumps(counters) + "\n}\n"
+        )
+    with open(path, "w", encoding="utf-8") as f:
+        f.write(text)
+
+    store = LazyDataStore(path=path)
+    assert [u.id for u in store.list_users()] == [1, 2, 3]
+    assert store.find_user_by_phone("13500002004").id == 2
+    assert store.find_user_by_id(3).username == "卖家"
+
+def test_writes_survive_reopen_and_checkpoint(db_path):
+    """测试：修改先进日志，重开和检查点之后 LazyDataStore 与 DataStore 读到的一致"""
+    store = LazyDataStore(path=db_path)
+    store.update_product_stock(3, 0)
+    user = store.add_user("新买家", "13500002004", UserRole.BUYER)
+
+    reopened = LazyDataStore(path=db_path)
+    assert reopened.find_product_by_id(3).stock == 0
+    assert reopened.find_user_by_phone("13500002004").id == user.id
+
+    reopened.checkpoint()
+    assert reopened.find_product_by_id(3).stock == 0
+    assert reopened.find_product_by_id(4).stock == 5
+    plain = DataStore(path=db_path, journal=True)
+    assert plain.find_product_by_id(3).stock == 0
+    assert plain.find_user_by_phone("13500002004").id == user.id
+    assert len(plain.list_products()) == 20
+
+
+def test_search_and_sales_built_on_demand(db_path):
+    """测试：搜索索引和销售汇总第一次用到时才建立，之后随修改同步"""
+    store = LazyDataStore(path=db_path)
+    assert store._search_index is None and store._sales is None
+    assert len(store.search_index.match("相机")) == 20
+    assert store.sales_summary("seller")[2]["orders"] == 1
+
+    store.update_product_status(5, ProductStatus.OFF_SHELF)
+    store.add_order(3, 2, 1, 101.0)
+    assert 5 not in store.search_index.match("相机")
+    assert store.sales_summary("seller")[2]["orders"] == 2
+    assert [o.id for o in store.orders_by_status(OrderStatus.PAID)] == [1, 2]
+
+
+def test_transaction_rollback(db_path):
+    """测试：事务回滚撤销覆盖层里的新增和修改"""
+    store = LazyDataStore(path=db_path)
+    index = store.search_index
+    with pytest.raises(RuntimeError):
+        with store.transaction():
+            store.update_product_stock(2, 1)
+            store.update_product_status(2, ProductStatus.OFF_SHELF)
+            store.add_user("回滚用户", "13500002005", UserRole.BUYER)
+            raise RuntimeError("中途失败")
+
+    assert store.find_product_by_id(2).stock == 5
+    assert 2 in index.match("相机")
+    assert store.find_user_by_phone("13500002005") is None
+    assert store._overlay["products"] == {} and store._overlay["users"] == {}
+    assert store.add_user("新用户", "13500002006", UserRole.BUYER).id == 4
+
+
+def test_startup_statuses_without_scanning(db_path, monkeypatch):
+    """测试：待支付订单、待处理/处理中投诉从打开时记下的 id 查，不逐条扫描集合"""
+    plain = DataStore(path=db_path)
+    plain.add_order(3, 2, 1, 101.0, status=OrderStatus.CREATED)
+    plain.add_complaint(3, 1, None, "商品违规", 1, "描述不符")
+    plain.add_complaint(3, 2, None, "商品违规", 1, "描述不符")
+    plain.update_complaint_status(2, ComplaintStatus.IN_PROGRESS, "")
+
+    store = LazyDataStore(path=db_path)
+    real_iter = store._iter_records
+    monkeypatch.setattr(store, "_iter_records", lambda c, start=0: iter(()) if c in ("orders", "complaints") else real_iter(c, start))
+    assert [o.id for o in store.orders_by_status(OrderStatus.CREATED)] == [2]
+    assert [c.id for c in store.complaints_by_status(ComplaintStatus.PENDING)] == [1]
+
+    store.update_complaint_status(2, ComplaintStatus.PENDING, "")
+    store.update_order_status(2, OrderStatus.CANCELLED)
+    store.add_order(3, 3, 1, 102.0, status=OrderStatus.CREATED)
+    assert [o.id for o in store.orders_by_status(OrderStatus.CREATED)] == [3]
+    assert [c.id for c in store.complaints_by_status(ComplaintStatus.PENDING)] == [1, 2]
+    assert store.complaints_by_status(ComplaintStatus.IN_PROGRESS) == []
+
+    store.checkpoint()
+    reopened = LazyDataStore(path=db_path)
+    assert [o.id for o in reopened.orders_by_status(OrderStatus.CREATED)] == [3]
+    assert [c.id for c in reopened.complaints_by_status(ComplaintStatus.PENDING)] == [1, 2]
@@ -0,0 +1,39 @@
+import pytest
+
+from models import (
+    User,
+    Product,
+    Order,
+    Complaint,
+    UserRole,
+    UserStatus,
+    ConditionLevel,
+    ProductStatus,
+    OrderStatus,
+    ComplaintType,
+    ComplaintStatus,
+)
+
+
+def test_models_round_trip():
+    """测试：to_dict / from_dict 往返一致"""
+    records = [
+        User(1, "用户", "13800000000", UserRole.SELLER, UserStatus.BANNED),
+        Product(2, 1, "商品", 3, "数码", ConditionLevel.NINE_FIVE, 99.5, 4, "描述", "vx", ProductStatus.OFF_SHELF),
+        Order(3, 1, 2, 2, 199.0, OrderStatus.PAID, "2024-01-01T00:00:00"),
+        Complaint(4, 1, 2, None, ComplaintType.ORDER_DISPUTE, ComplaintStatus.PENDING, 1, "原因", "2024-01-01T00:00:00"),
+    ]
+    for r in records:
+        d = r.to_dict()
+        assert type(r).from_dict(d) == r
+        assert not hasattr(r, "__dict__")  # slots
+
+
+def test_from_dict_defaults_and_invalid_enum():
+    """测试：老数据缺省字段补齐；非法枚举值仍然抛 ValueError"""
+    p = Product.from_dict({"id": 1, "seller_id": 1, "title": "t", "price": "10", "stock": "2"})
+    assert p.category == "未分类" and p.condition == ConditionLevel.NEW
+    assert p.price == 10.0 and p.stock == 2 and p.status == ProductStatus.ON_SALE
+
+    with pytest.raises(ValueError):
+        User.from_dict({"id": 1, "username": "u", "phone": "1", "role": "NOBODY"})
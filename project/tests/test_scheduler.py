@@ -0,0 +1,35 @@
+import threading
+
+from scheduler import ExpiryScheduler
+
+
+def test_run_pending_in_deadline_order():
+    """测试：只执行已到期的回调，按到期时间先后，取消和重新调度生效"""
+    now = [0.0]
+    sched = ExpiryScheduler(clock=lambda: now[0])
+    fired = []
+    sched.schedule("a", 10, lambda: fired.append("a"))
+    sched.schedule("b", 5, lambda: fired.append("b"))
+    sched.schedule("c", 1, lambda: fired.append("c"))
+    sched.schedule("b", 20, lambda: fired.append("b2"))  # 重新调度覆盖旧的
+    assert sched.cancel("c")
+    assert not sched.cancel("c")
+
+    assert sched.run_pending(now=9) == 0
+    assert sched.run_pending(now=15) == 1
+    assert fired == ["a"]
+    now[0] = 30
+    assert sched.run_pending() == 1
+    assert fired == ["a", "b2"] and len(sched) == 0
+
+
+def test_background_thread_fires():
+    """测试：后台线程在到期后自动执行回调"""
+    sched = ExpiryScheduler()
+    done = threading.Event()
+    sched.start()
+    try:
+        sched.schedule(1, 0.01, done.set)
+        assert done.wait(2)
+    finally:
+        sched.stop()
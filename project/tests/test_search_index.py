@@ -0,0 +1,84 @@
+import random
+
+from search_index import ProductSearchIndex, substring_distance
+
+
+def _record(pid, title, status="在售", price=1.0):
+    return {"id": pid, "title": title, "price": price, "status": status}
+
+
+def test_match_same_as_substring_scan():
+    """测试：倒排索引结果与 kw in title.lower() 逐条扫描一致"""
+    rng = random.Random(7)
+    alphabet = "手机苹果华为小米耳机 iPhoneProMax1234"
+    titles = {pid: "".join(rng.choice(alphabet) for _ in range(rng.randint(1, 12))) for pid in range(1, 300)}
+    index = ProductSearchIndex()
+    for pid, title in titles.items():
+        index.upsert(_record(pid, title))
+
+    queries = ["手机", "机", "iphone", "PHON", "pro max", "小米耳", "12", "x", "华为手机壳"]
+    queries += ["".join(rng.choice(alphabet) for _ in range(rng.randint(1, 3))) for _ in range(50)]
+    for q in queries:
+        kw = q.lower()
+        expected = sorted(pid for pid, t in titles.items() if kw in t.lower())
+        assert index.match(q) == expected, q
+
+
+def test_upsert_follows_status_and_title():
+    """测试：下架后移出索引，重新上架后恢复"""
+    index = ProductSearchIndex()
+    index.upsert(_record(1, "二手相机"))
+    assert index.match("相机") == [1]
+
+    index.upsert(_record(1, "二手相机", status="下架"))
+    assert index.match("相机") == []
+    assert len(index) == 0
+
+    index.upsert(_record(1, "全新镜头"))
+    assert index.match("相机") == []
+    assert index.match("镜头") == [1]
+
+
+def test_suggest_prefix():
+    """测试：前缀联想去重、按字典序、随上下架增量更新"""
+    index = ProductSearchIndex()
+    for pid, title in enumerate(["iPhone 15", "iphone 15", "iPad Air", "华为手机", "华为平板", "iPhone 14"], 1):
+        index.upsert(_record(pid, title))
+
+    assert index.suggest("IP") == ["iPad Air", "iPhone 14", "iPhone 15"]
+    assert index.suggest("华为", limit=1) == ["华为平板"]
+    assert index.suggest("") == []
+
+    index.upsert(_record(3, "iPad Air", status="下架"))
+    assert index.suggest("ipa") == []
+    index.upsert(_record(7, "iPad mini"))
+    assert index.suggest("ipa") == ["iPad mini"]
+
+
+def test_fuzzy_match_same_as_brute_force():
+    """测试：q-gram 过滤不漏结果，与逐条算编辑距离一致，并按距离排序"""
+    rng = random.Random(11)
+    alphabet = "华为小米手机平板耳机abcde"
+    titles = {pid: "".join(rng.choice(alphabet) for _ in range(rng.randint(2, 10))) for pid in range(1, 400)}
+    index = ProductSearchIndex()
+    for pid, title in titles.items():
+        index.upsert(_record(pid, title))
+
+    for _ in range(40):
+        q = "".join(rng.choice(alphabet) for _ in range(rng.randint(3, 7)))
+        for k in (1, 2):
+            expected = sorted(
+                (d, pid) for pid, t in titles.items() if (d := substring_distance(q, t, k)) is not None
+            )
+            assert index.fuzzy_match(q, k) == [(pid, d) for d, pid in expected], (q, k)
+
+
+def test_fuzzy_match_typo():
+    """测试：一个错字也能搜到，精确命中排在前面"""
+    index = ProductSearchIndex()
+    index.upsert(_record(1, "华为手机 Mate60"))
+    index.upsert(_record(2, "华为手饥"))
+    index.upsert(_record(3, "小米平板"))
+    assert index.match("华为手饥") == [2]
+    assert index.fuzzy_match("华为手饥", 1) == [(2, 0), (1, 1)]
+    assert index.fuzzy_match("iphnoe", 2) == []
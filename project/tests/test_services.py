@@ -352,4 +352,408 @@ def test_complaint_service(store):
         all_complaints = cs.list_all()
         assert len(all_complaints) >= 1
     except Exception as e:
-        print(f"Complaint test skipped: {e}")
\ No newline at end of file
+        print(f"Complaint test skipped: {e}")
+
+def test_search_price_range_and_sort(store):
+    """测试：自定义价格区间 + 按价格排序 + limit"""
+    auth = AuthService(store)
+    seller = auth.register("价格卖家", "13988880001", "卖家")
+    ps = ProductService(store)
+    for title, price in [("甲", 300.0), ("乙", 800.0), ("丙", 50.0), ("丁", 1500.0), ("戊", 800.0)]:
+        ps.publish_product(seller, title, "数码", "全新", price, 1, "描述必须超过十个字描述必须超过十个字", "C")
+
+    res = ps.search(min_price=100, max_price=800, sort="price_asc")
+    assert [p.title for p in res] == ["甲", "乙", "戊"]
+
+    res = ps.search(sort="price_desc", limit=2)
+    assert [p.title for p in res] == ["丁", "戊"]  # 降序时同价的新商品在前
+
+    # 档位与自定义区间叠加："500-1000元" 的下界是开区间
+    res = ps.search(price_filter="500-1000元", min_price=500, max_price=900)
+    assert [p.title for p in res] == ["乙", "戊"]
+
+    # 下架后不再出现在价格索引里
+    ps.off_shelf(res[0].id)
+    assert [p.title for p in ps.search(min_price=800, max_price=800)] == ["戊"]
+
+    with pytest.raises(ValueError, match="不支持的排序方式"):
+        ps.search(sort="hot")
+
+
+def test_facets_counts(store):
+    """测试：分类/成色/价格档位计数，与关键词结果集一致"""
+    auth = AuthService(store)
+    seller = auth.register("分面卖家", "13988880002", "卖家")
+    ps = ProductService(store)
+    desc = "描述必须超过十个字描述必须超过十个字"
+    ps.publish_product(seller, "苹果手机", "数码", "全新", 3000.0, 1, desc, "C")
+    ps.publish_product(seller, "华为手机", "数码", "95新", 800.0, 1, desc, "C")
+    ps.publish_product(seller, "手机壳", "其他", "9成新", 20.0, 1, desc, "C")
+    lipstick = ps.publish_product(seller, "口红", "美妆", "全新", 200.0, 1, desc, "C")
+
+    f = ps.facets()
+    assert f["category"] == {"数码": 2, "其他": 1, "美妆": 1}
+    assert f["condition"] == {"全新": 2, "95新": 1, "9成新": 1}
+    assert f["price"] == {"0-500元": 2, "500-1000元": 1, "1000元以上": 1}
+
+    f = ps.facets("手机")
+    assert f["category"] == {"数码": 2, "其他": 1}
+    assert f["price"] == {"0-500元": 1, "500-1000元": 1, "1000元以上": 1}
+
+    # 每个分面值的数量与实际筛选结果一致
+    for name, n in ps.facets()["price"].items():
+        assert len(ps.search(price_filter=name)) == n
+
+    ps.off_shelf(lipstick.id)
+    assert "美妆" not in ps.facets()["category"]
+
+
+def test_search_cache_invalidated_by_version(store):
+    """测试：重复查询命中缓存，商品变化后自动失效"""
+    auth = AuthService(store)
+    seller = auth.register("缓存卖家", "13988880003", "卖家")
+    ps = ProductService(store, cache_size=2)
+    desc = "描述必须超过十个字描述必须超过十个字"
+    p = ps.publish_product(seller, "缓存相机", "数码", "全新", 300.0, 2, desc, "C")
+
+    assert len(ps.search("相机")) == 1
+    assert len(ps.search("相机")) == 1
+    assert ps.cache_stats() == {"hits": 1, "misses": 1, "size": 1}
+
+    ps.publish_product(seller, "缓存相机二代", "数码", "全新", 400.0, 1, desc, "C")
+    assert len(ps.search("相机")) == 2
+    assert ps.cache_hits == 1 and ps.cache_misses == 2
+
+    store.update_product_stock(p.id, 1)
+    ps.search("相机")
+    assert ps.cache_misses == 3
+
+    # 超出容量时淘汰最久未用的查询
+    ps.search("二代")
+    ps.search("缓存")
+    assert ps.cache_stats()["size"] == 2
+
+
+def test_search_fuzzy(store):
+    """测试：容错搜索可选开启，按相似度排序"""
+    auth = AuthService(store)
+    seller = auth.register("容错卖家", "13988880004", "卖家")
+    ps = ProductService(store)
+    desc = "描述必须超过十个字描述必须超过十个字"
+    ps.publish_product(seller, "iPhone 15 Pro", "数码", "全新", 6000.0, 1, desc, "C")
+    ps.publish_product(seller, "iphnoe 壳", "其他", "全新", 20.0, 1, desc, "C")
+
+    assert [p.title for p in ps.search("iphnoe")] == ["iphnoe 壳"]
+    assert [p.title for p in ps.search("iphone", fuzzy=True)] == ["iPhone 15 Pro", "iphnoe 壳"]
+    assert [p.title for p in ps.search("iphone", fuzzy=True, max_price=100)] == ["iphnoe 壳"]
+
+
+def test_search_ranking_and_pagination(store):
+    """测试：相关度 / 最新 / 价格排序，分页结果与完整结果一致"""
+    auth = AuthService(store)
+    seller = auth.register("分页卖家", "13988880005", "卖家")
+    ps = ProductService(store)
+    desc = "描述必须超过十个字描述必须超过十个字"
+    ps.publish_product(seller, "二手相机包", "数码", "全新", 50.0, 1, desc, "C")
+    ps.publish_product(seller, "相机", "数码", "全新", 900.0, 1, desc, "C")
+    ps.publish_product(seller, "相机三脚架", "数码", "95新", 120.0, 1, desc, "C")
+    ps.publish_product(seller, "口红", "美妆", "全新", 80.0, 1, desc, "C")
+
+    assert [p.title for p in ps.search("相机", sort="relevance")] == ["相机", "相机三脚架", "二手相机包"]
+    assert [p.title for p in ps.search(sort="recency", limit=2)] == ["口红", "相机三脚架"]
+    assert [p.title for p in ps.search(category="数码", sort="recency", offset=1)] == ["相机", "二手相机包"]
+
+    full = [p.id for p in ps.search(sort="price_desc")]
+    pages = [p.id for off in range(0, 4, 3) for p in ps.search(sort="price_desc", offset=off, limit=3)]
+    assert pages == full
+    assert [p.title for p in ps.search("相机", condition_filter="全新", sort="price_asc", offset=1)] == ["相机"]
+    assert ps.search("相机", offset=5, limit=2) == []
+
+
+def test_concurrent_orders_never_oversell(store):
+    """测试：多线程抢购同一商品，成功订单数恰好等于库存"""
+    import threading
+
+    auth = AuthService(store)
+    seller = auth.register("抢购卖家", "13988880006", "卖家")
+    buyer = auth.register("抢购买家", "13988880007", "买家")
+    product = ProductService(store).publish_product(
+        seller, "限量球鞋", "服饰", "全新", 999.0, 20, "描述必须超过十个字描述必须超过十个字", "C"
+    )
+    os_srv = OrderService(store)
+    sold, rejected = [], []
+
+    def buy():
+        for _ in range(5):
+            try:
+                sold.append(os_srv.create_order(buyer, product, 1))
+            except ValueError:
+                rejected.append(1)
+
+    threads = [threading.Thread(target=buy) for _ in range(8)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+
+    assert len(sold) == 20 and len(rejected) == 20
+    assert store.find_product_by_id(product.id).stock == 0
+    assert len(store.orders_by_product(product.id)) == 20
+
+
+def test_create_orders_checkout(store, monkeypatch):
+    """测试：购物车结算整体成功只落盘一次，任一商品库存不足则全部不生效"""
+    auth = AuthService(store)
+    seller = auth.register("结算卖家", "13988880008", "卖家")
+    buyer = auth.register("结算买家", "13988880009", "买家")
+    ps = ProductService(store)
+    desc = "描述必须超过十个字描述必须超过十个字"
+    a = ps.publish_product(seller, "键盘", "数码", "全新", 200.0, 5, desc, "C")
+    b = ps.publish_product(seller, "鼠标", "数码", "全新", 50.0, 2, desc, "C")
+    os_srv = OrderService(store)
+
+    saves = []
+    monkeypatch.setattr(store, "_save", lambda: saves.append(1))
+    orders = os_srv.create_orders(buyer, [(a.id, 2), (b.id, 1), (a.id, 1)])
+    assert [o.amount for o in orders] == [400.0, 50.0, 200.0]
+    assert saves == [1]
+    assert store.find_product_by_id(a.id).stock == 2
+    assert store.find_product_by_id(b.id).stock == 1
+
+    with pytest.raises(ValueError, match="鼠标 库存不足"):
+        os_srv.create_orders(buyer, [(a.id, 1), (b.id, 2)])
+    assert store.find_product_by_id(a.id).stock == 2
+    assert len(store.orders_by_buyer(buyer.id)) == 3
+    with pytest.raises(ValueError, match="购物车为空"):
+        os_srv.create_orders(buyer, [])
+
+
+def test_reserve_confirm_cancel_and_expire(store):
+    """测试：预留扣库存，确认转已支付，取消或超时退回库存"""
+    from scheduler import ExpiryScheduler
+
+    auth = AuthService(store)
+    seller = auth.register("预留卖家", "13988880010", "卖家")
+    buyer = auth.register("预留买家", "13988880011", "买家")
+    product = ProductService(store).publish_product(
+        seller, "秒杀耳机", "数码", "全新", 99.0, 3, "描述必须超过十个字描述必须超过十个字", "C"
+    )
+    now = [0.0]
+    os_srv = OrderService(store, scheduler=ExpiryScheduler(clock=lambda: now[0]), hold_ttl=60)
+
+    paid = os_srv.reserve(buyer, product)
+    cancelled = os_srv.reserve(buyer, product)
+    expired = os_srv.reserve(buyer, product, ttl=10)
+    assert paid.status == OrderStatus.CREATED
+    assert store.find_product_by_id(product.id).stock == 0
+    with pytest.raises(ValueError, match="库存不足"):
+        os_srv.reserve(buyer, product)
+
+    assert os_srv.confirm(paid.id).status == OrderStatus.PAID
+    assert os_srv.cancel(cancelled.id).status == OrderStatus.CANCELLED
+    assert store.find_product_by_id(product.id).stock == 1
+    with pytest.raises(ValueError, match="不是待支付"):
+        os_srv.cancel(paid.id)
+
+    now[0] = 11
+    assert os_srv.scheduler.run_pending() == 1
+    assert store.find_order_by_id(expired.id).status == OrderStatus.CANCELLED
+    assert store.find_product_by_id(product.id).stock == 2
+    assert store.orders_by_status(OrderStatus.CREATED) == []
+
+    # 重启后仍待支付的订单重新安排到期
+    pending = os_srv.reserve(buyer, product)
+    restarted = OrderService(store, scheduler=ExpiryScheduler(clock=lambda: now[0]), hold_ttl=0)
+    assert restarted.recover_holds() == 1
+    restarted.scheduler.run_pending()
+    assert store.find_order_by_id(pending.id).status == OrderStatus.CANCELLED
+
+
+def test_report_service_sales_aggregates(store):
+    """测试：销售汇总随下单、取消实时更新，重建结果一致"""
+    from services import ReportService
+    from scheduler import ExpiryScheduler
+
+    auth = AuthService(store)
+    seller = auth.register("报表卖家", "13988880012", "卖家")
+    buyer = auth.register("报表买家", "13988880013", "买家")
+    ps = ProductService(store)
+    desc = "描述必须超过十个字描述必须超过十个字"
+    cam = ps.publish_product(seller, "相机", "数码", "全新", 100.0, 10, desc, "C")
+    lip = ps.publish_product(seller, "口红", "美妆", "全新", 20.0, 10, desc, "C")
+    os_srv = OrderService(store, scheduler=ExpiryScheduler())
+    report = ReportService(store)
+
+    os_srv.create_order(buyer, cam, 2)
+    os_srv.create_orders(buyer, [(lip.id, 1), (cam.id, 1)])
+    held = os_srv.reserve(buyer, lip, 3)
+    assert report.sales_by_category() == {
+        "数码": {"orders": 2, "quantity": 3, "amount": 300.0},
+        "美妆": {"orders": 1, "quantity": 1, "amount": 20.0},
+    }
+    os_srv.confirm(held.id)
+    assert report.sales_by_seller()[seller.id] == {"orders": 4, "quantity": 7, "amount": 380.0}
+    assert report.totals() == {"orders": 4, "quantity": 7, "amount": 380.0}
+
+    store.update_order_status(held.id, OrderStatus.CANCELLED)
+    before = (report.sales_by_seller(), report.sales_by_category(), report.sales_by_day())
+    report.rebuild()
+    assert (report.sales_by_seller(), report.sales_by_category(), report.sales_by_day()) == before
+    assert report.totals()["amount"] == 320.0
+
+
+def test_complaint_queue_claim_and_lease(store):
+    """测试：订单纠纷优先领取，租约到期退回队列，只有领取人能处理"""
+    import threading
+    from scheduler import ExpiryScheduler
+    from services import ComplaintService, ComplaintQueue
+    from models import ComplaintStatus
+
+    auth = AuthService(store)
+    user = auth.register("投诉人", "13988880014", "买家")
+    now = [0.0]
+    queue = ComplaintQueue(store, scheduler=ExpiryScheduler(clock=lambda: now[0]), lease_ttl=60)
+    cs = ComplaintService(store, queue=queue)
+    v1 = cs.submit_complaint(user, "商品违规", "假货", product_id=1)
+    d1 = cs.submit_complaint(user, "订单纠纷", "未发货", order_id=1)
+    v2 = cs.submit_complaint(user, "商品违规", "图文不符", product_id=2)
+    assert len(queue) == 3
+
+    first = queue.claim(admin_id=1)
+    assert first.id == d1.id and first.status == ComplaintStatus.IN_PROGRESS
+    with pytest.raises(ValueError, match="不在你的处理中"):
+        queue.complete(d1.id, 2, "已解决", "越权")
+    assert queue.complete(d1.id, 1, "已解决", "已退款").status == ComplaintStatus.RESOLVED
+
+    assert queue.claim(admin_id=2).id == v1.id
+    now[0] = 61
+    queue.scheduler.run_pending()
+    assert store.find_complaint_by_id(v1.id).status == ComplaintStatus.PENDING
+
+    # 多个管理员同时领取，不会领到同一条
+    claimed = []
+    threads = [threading.Thread(target=lambda i=i: claimed.append(queue.claim(i))) for i in range(4)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    ids = sorted(c.id for c in claimed if c is not None)
+    assert ids == [v1.id, v2.id]
+
+
+
+def test_complaint_queue_reverts_stale_claims_in_one_commit(store, monkeypatch):
+    """测试：启动时遗留的处理中投诉一次落盘全部退回待处理"""
+    from services import ComplaintService, ComplaintQueue
+    from models import ComplaintStatus
+
+    user = AuthService(store).register("投诉人", "13988880020", "买家")
+    cs = ComplaintService(store)
+    stale = [cs.submit_complaint(user, "商品违规", f"假货{i}", product_id=i) for i in range(3)]
+    for c in stale:
+        store.update_complaint_status(c.id, ComplaintStatus.IN_PROGRESS, "")
+
+    saves = []
+    monkeypatch.setattr(store, "_save", lambda: saves.append(1))
+    queue = ComplaintQueue(store)
+    assert saves == [1]
+    assert len(queue) == 3
+    assert all(store.find_complaint_by_id(c.id).status == ComplaintStatus.PENDING for c in stale)
+
+def test_shared_scheduler_keeps_orders_and_leases_apart(store):
+    """测试：订单与投诉共用调度器时，同号的投诉租约不会覆盖订单的到期"""
+    from scheduler import ExpiryScheduler
+    from services import ComplaintService, ComplaintQueue
+    from models import ComplaintStatus
+
+    auth = AuthService(store)
+    seller = auth.register("卖家", "13988880018", "卖家")
+    buyer = auth.register("买家", "13988880019", "买家")
+    product = ProductService(store).publish_product(
+        seller, "共享调度", "数码", "全新", 9.0, 1, "描述必须超过十个字描述必须超过十个字", "C"
+    )
+    now = [0.0]
+    scheduler = ExpiryScheduler(clock=lambda: now[0])
+    os_srv = OrderService(store, scheduler=scheduler, hold_ttl=10)
+    queue = ComplaintQueue(store, scheduler=scheduler, lease_ttl=60)
+    order = os_srv.reserve(buyer, product)
+    complaint = ComplaintService(store, queue=queue).submit_complaint(buyer, "订单纠纷", "未发货", order_id=order.id)
+    assert order.id == complaint.id
+    queue.claim(admin_id=1)
+
+    now[0] = 11
+    assert scheduler.run_pending() == 1
+    assert store.find_order_by_id(order.id).status == OrderStatus.CANCELLED
+    assert store.find_complaint_by_id(complaint.id).status == ComplaintStatus.IN_PROGRESS
+
+
+def test_complaint_lease_expiry_keeps_handled_status(store):
+    """测试：已领取的投诉被直接处理后，租约到期不会退回待处理"""
+    from scheduler import ExpiryScheduler
+    from services import ComplaintService, ComplaintQueue
+    from models import ComplaintStatus
+
+    user = AuthService(store).register("投诉人", "13988880017", "买家")
+    now = [0.0]
+    scheduler = ExpiryScheduler(clock=lambda: now[0])
+    queue = ComplaintQueue(store, scheduler=scheduler, lease_ttl=60)
+    c1 = ComplaintService(store, queue=queue).submit_complaint(user, "商品违规", "假货", product_id=1)
+    c2 = ComplaintService(store).submit_complaint(user, "商品违规", "图文不符", product_id=2)
+    queue.push(c2)
+
+    # 经 AdminService 处理：租约随之释放
+    queue.claim(admin_id=1)
+    AdminService(store, queue=queue).handle_complaint(c1.id, "已解决", "已下架")
+    assert queue.holder(c1.id) is None
+    # 不经队列直接改状态：租约到期时发现已处理，不再退回
+    queue.claim(admin_id=1)
+    store.update_complaint_status(c2.id, ComplaintStatus.REJECTED, "证据不足")
+    now[0] = 61
+    scheduler.run_pending()
+    assert store.find_complaint_by_id(c1.id).status == ComplaintStatus.RESOLVED
+    assert store.find_complaint_by_id(c2.id).status == ComplaintStatus.REJECTED
+    assert len(queue) == 0
+
+
+def test_bulk_moderation_single_commit(store, monkeypatch):
+    """测试：封禁卖家连带下架其商品、批量封禁/下架都只落盘一次"""
+    auth = AuthService(store)
+    spam = auth.register("刷单卖家", "13988880015", "卖家")
+    other = auth.register("正常卖家", "13988880016", "卖家")
+    ps = ProductService(store)
+    desc = "描述必须超过十个字描述必须超过十个字"
+    spam_items = [ps.publish_product(spam, f"引流{i}", "其他", "全新", 1.0, 1, desc, "C") for i in range(5)]
+    ps.off_shelf(spam_items[0].id)
+    keep = ps.publish_product(other, "正常商品", "其他", "全新", 1.0, 1, desc, "C")
+    admin = AdminService(store)
+
+    saves = []
+    monkeypatch.setattr(store, "_save", lambda: saves.append(1))
+    assert admin.ban_user(spam.id, "刷单", cascade=True) == 5
+    assert saves == [1]
+    assert store.find_user_by_id(spam.id).status == UserStatus.BANNED
+    assert len(store.products_by_status_category(ProductStatus.TAKEDOWN)) == 5
+    assert store.find_product_by_id(keep.id).status == ProductStatus.ON_SALE
+
+    buyers = [auth.register(f"买家{i}", f"1398888010{i}", "买家") for i in range(3)]
+    saves.clear()
+    admin.ban_users([b.id for b in buyers], "恶意投诉")
+    admin.takedown_products([keep.id], "违规")
+    assert saves == [1, 1]
+    assert all(store.find_user_by_id(b.id).status == UserStatus.BANNED for b in buyers)
+    assert ps.search() == []
+
+
+def test_takedown_counts_only_changed(store):
+    """测试：不存在、已下架或重复的商品 id 不计入下架数量"""
+    auth = AuthService(store)
+    seller = auth.register("卖家", "13988880017", "卖家")
+    ps = ProductService(store)
+    desc = "描述必须超过十个字描述必须超过十个字"
+    items = [ps.publish_product(seller, f"商品{i}", "其他", "全新", 1.0, 1, desc, "C") for i in range(3)]
+    admin = AdminService(store)
+
+    assert admin.takedown_products([items[0].id], "违规") == 1
+    assert admin.takedown_products([items[0].id, items[1].id, items[1].id, 99999], "违规") == 1
+    assert admin.ban_user(seller.id, "违规", cascade=True) == 1
+    assert admin.ban_user(seller.id, "违规", cascade=True) == 0
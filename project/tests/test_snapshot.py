@@ -0,0 +1,96 @@
+import os
+import pytest
+
+from snapshot import SnapshotReader, read_snapshot, write_snapshot
+from storage import DataStore
+from models import UserRole
+
+
+@pytest.fixture
+def snap_path(tmp_path):
+    return str(tmp_path / "data.snap")
+
+
+def test_roundtrip_mixed_records(snap_path):
+    """测试：字段一致与不一致的记录、计数器字典都能原样还原"""
+    data = {
+        "users": [{"id": 1, "name": "甲", "score": 1.5}, {"id": 2, "name": "乙", "score": None}],
+        "products": [{"id": 1, "title": "旧"}, {"id": 2, "title": "新", "status": "在售"}],
+        "orders": [],
+        "_id_counters": {"users": 3, "products": 3, "orders": 1},
+    }
+    write_snapshot(snap_path, data)
+    assert read_snapshot(snap_path) == data
+
+
+def test_lazy_load_decodes_only_requested(snap_path):
+    """测试：只解码被请求的集合，其他段损坏不影响"""
+    write_snapshot(snap_path, {"users": [{"id": 1}], "orders": [{"id": i} for i in range(100)]})
+    with SnapshotReader(snap_path) as reader:
+        offset, size, _ = reader._sections["orders"]
+    with open(snap_path, "r+b") as f:
+        f.seek(offset + size // 2)
+        f.write(b"\xff")
+
+    with SnapshotReader(snap_path) as reader:
+        assert reader.names() == ["users", "orders"]
+        assert reader.load("users") == [{"id": 1}]
+        with pytest.raises(ValueError):
+            reader.load("orders")
+
+
+def test_rejects_bad_header(snap_path):
+    """测试：非快照文件与更高版本的快照都拒绝打开"""
+    with open(snap_path, "wb") as f:
+        f.write(b"not a snapshot")
+    with pytest.raises(ValueError):
+        SnapshotReader(snap_path)
+
+    write_snapshot(snap_path, {"users": []})
+    with open(snap_path, "r+b") as f:
+        f.seek(4)
+        f.write(b"\x63\x00")
+    with pytest.raises(ValueError):
+        SnapshotReader(snap_path)
+
+
+def test_datastore_snapshot_mode_migrates_json(tmp_path):
+    """测试：快照模式下老 data.json 自动转换，之后的修改写入快照"""
+    path = str(tmp_path / "data.json")
+    old = DataStore(path=path)
+    seller = old.add_user("老用户", "13500001001", UserRole.SELLER)
+
+    store = DataStore(path=path, snapshot=True)
+    assert os.path.exists(path + ".bak") and not os.path.exists(path)
+    store.add_product(seller.id, "快照商品", 1, "数码", "全新", 10.0, 3, "描述描述描述描述描述", "C")
+
+    reopened = DataStore(path=path, snapshot=True)
+    assert reopened.find_user_by_phone("13500001001").id == seller.id
+    assert [p.title for p in reopened.products_by_seller(seller.id)] == ["快照商品"]
+    assert not os.path.exists(path)
+
+
+def test_datastore_snapshot_decodes_and_encodes_only_touched(tmp_path, monkeypatch):
+    """测试：快照模式打开时不解码集合，落盘只重新编码改动过的集合"""
+    import storage
+    from models import OrderStatus, UserStatus
+
+    path = str(tmp_path / "data.json")
+    store = DataStore(path=path, snapshot=True)
+    seller = store.add_user("卖家", "13500001002", UserRole.SELLER)
+    product = store.add_product(seller.id, "快照相机", 1, "数码", "全新", 10.0, 3, "描述描述描述描述描述", "C")
+    store.add_order(seller.id, product.id, 1, 10.0, OrderStatus.PAID)
+
+    reopened = DataStore(path=path, snapshot=True)
+    assert reopened._unloaded == {"products", "orders", "complaints"}
+    encoded = []
+    real_encode = storage.encode_section
+    monkeypatch.setattr(storage, "encode_section", lambda value: (encoded.append(value), real_encode(value))[1])
+    reopened.update_user_status(seller.id, UserStatus.BANNED)
+    assert encoded == [reopened.data["users"]]
+    assert reopened._unloaded == {"products", "orders", "complaints"}
+
+    again = DataStore(path=path, snapshot=True)
+    assert again.find_user_by_id(seller.id).status == UserStatus.BANNED
+    assert again.search_index.query("相机") == [product.id]
+    assert again.sales_summary("seller") == {seller.id: {"orders": 1, "quantity": 1, "amount": 10.0}}
@@ -0,0 +1,103 @@
+import pytest
+
+from services import AuthService, ProductService, OrderService, AdminService
+from sqlite_storage import SqliteDataStore, migrate_json
+from storage import DataStore
+from models import UserRole, UserStatus, ProductStatus, ComplaintStatus
+
+
+@pytest.fixture
+def store(tmp_path):
+    ds = SqliteDataStore(path=str(tmp_path / "data.db"))
+    yield ds
+    ds.close()
+
+
+def test_sqlite_services_flow(store):
+    """测试：服务层在 SQLite 后端上无需修改即可使用"""
+    auth = AuthService(store)
+    seller = auth.register("卖家", "13400000001", "卖家")
+    buyer = auth.register("买家", "13400000002", "买家")
+    with pytest.raises(ValueError, match="该手机号已注册"):
+        auth.register("重复", "13400000002", "买家")
+
+    ps = ProductService(store)
+    product = ps.publish_product(seller, "SQLite 相机", "数码", "全新", 1200.0, 5, "描述描述描述描述描述描述", "C")
+    assert [p.title for p in ps.search(keyword="sqlite", category="数码", price_filter="1000元以上")] == ["SQLite 相机"]
+
+    order = OrderService(store).create_order(buyer, product, 2)
+    assert store.find_product_by_id(product.id).stock == 3
+    assert [o.id for o in store.orders_by_buyer(buyer.id)] == [order.id]
+
+    AdminService(store).ban_user(buyer.id, "刷单")
+    assert store.find_user_by_id(buyer.id).status == UserStatus.BANNED
+    ps.off_shelf(product.id)
+    assert ps.search() == []
+    assert len(store.products_by_status_category(ProductStatus.OFF_SHELF)) == 1
+
+
+def test_migrate_from_json(tmp_path):
+    """测试：data.json 一次性导入 SQLite，保留 id"""
+    json_path = str(tmp_path / "data.json")
+    ds = DataStore(path=json_path)
+    seller = ds.add_user("卖家", "13400000003", UserRole.SELLER)
+    p = ds.add_product(seller.id, "老商品", 1, "数码", "95新", 99.0, 1, "描述描述描述描述描述", "C")
+    ds.add_complaint(seller.id, p.id, None, "商品违规", 1, "原因")
+
+    db_path = str(tmp_path / "data.db")
+    counts = migrate_json(json_path, db_path)
+    assert counts == {"users": 2, "products": 1, "orders": 0, "complaints": 1}
+
+    store = SqliteDataStore(path=db_path)
+    assert len(store.list_users()) == 2  # 不会再多插一个管理员
+    assert store.find_user_by_phone("13400000003").id == seller.id
+    assert store.find_product_by_id(p.id).title == "老商品"
+    assert len(store.complaints_by_status(ComplaintStatus.PENDING)) == 1
+    store.close()
+
+
+def test_sqlite_transaction_rollback(store):
+    """测试：SQLite 事务异常时整体回滚"""
+    with pytest.raises(RuntimeError):
+        with store.transaction():
+            store.add_user("回滚", "13400000010", UserRole.BUYER)
+            raise RuntimeError("boom")
+    assert store.find_user_by_phone("13400000010") is None
+
+    with store.transaction():
+        store.add_user("提交", "13400000011", UserRole.BUYER)
+    assert store.find_user_by_phone("13400000011") is not None
+
+
+
+def test_sqlite_rollback_resyncs_only_touched_products(store, monkeypatch):
+    """测试：回滚只撤销事务内改过的搜索索引条目，不重建整个索引"""
+    seller = store.add_user("卖家", "13400000012", UserRole.SELLER)
+    keep = store.add_product(seller.id, "相机", 1, "数码", "全新", 10.0, 3, "描述描述描述描述描述", "C")
+    monkeypatch.setattr(store, "_rebuild_search_index", lambda: pytest.fail("回滚不应重建索引"))
+    with pytest.raises(RuntimeError):
+        with store.transaction():
+            store.update_product_status(keep.id, ProductStatus.OFF_SHELF)
+            added = store.add_product(seller.id, "镜头", 1, "数码", "全新", 20.0, 1, "描述描述描述描述描述", "C")
+            raise RuntimeError("boom")
+    ps = ProductService(store)
+    assert [p.id for p in ps.search()] == [keep.id]
+    assert ps.search(keyword="镜头") == []
+    assert store.find_product_by_id(added.id) is None
+
+
+def test_sqlite_sales_tables(store):
+    """测试：汇总表随订单增量更新，重建后结果一致"""
+    from models import OrderStatus
+
+    seller = store.add_user("卖家", "13400000030", UserRole.SELLER)
+    p = store.add_product(seller.id, "商品", 1, "数码", "全新", 10.0, 9, "描述描述描述描述描述", "C")
+    store.add_order(7, p.id, 2, 20.0)
+    o = store.add_order(7, p.id, 1, 10.0)
+    store.add_order(7, p.id, 1, 10.0, status=OrderStatus.CREATED)
+    store.update_order_status(o.id, OrderStatus.CANCELLED)
+
+    assert store.sales_summary("seller") == {seller.id: {"orders": 1, "quantity": 2, "amount": 20.0}}
+    before = {d: store.sales_summary(d) for d in ("seller", "category", "day")}
+    store.rebuild_sales()
+    assert {d: store.sales_summary(d) for d in ("seller", "category", "day")} == before
@@ -0,0 +1,408 @@
+import os
+import json
+import time
+import threading
+import pytest
+
+from storage import DataStore
+from models import UserRole, ProductStatus, ComplaintStatus
+
+
+@pytest.fixture
+def db_path(tmp_path):
+    return str(tmp_path / "data.json")
+
+
+# ==================== 日志模式 ====================
+
+def test_journal_appends_instead_of_rewriting(db_path):
+    """测试：日志模式下修改只追加日志，不重写 data.json"""
+    store = DataStore(path=db_path, journal=True)
+    store.checkpoint()
+    size_before = os.path.getsize(db_path)
+
+    store.add_user("日志用户", "13500000001", UserRole.SELLER)
+    store.add_user("日志用户2", "13500000002", UserRole.BUYER)
+
+    assert os.path.getsize(db_path) == size_before
+    with open(store.log_path, encoding="utf-8") as f:
+        lines = f.readlines()
+    assert len(lines) == 2
+    assert json.loads(lines[0])["op"] == "insert"
+
+
+def test_journal_replay_on_restart(db_path):
+    """测试：重启后 _load() 重放日志尾部"""
+    store = DataStore(path=db_path, journal=True)
+    seller = store.add_user("卖家", "13500000003", UserRole.SELLER)
+    p = store.add_product(seller.id, "日志商品", 1, "数码", "全新", 10.0, 3, "描述描述描述描述描述", "C")
+    store.update_product_status(p.id, ProductStatus.OFF_SHELF)
+
+    reopened = DataStore(path=db_path, journal=True)
+    assert reopened.find_user_by_phone("13500000003") is not None
+    assert reopened.find_product_by_id(p.id).status == ProductStatus.OFF_SHELF
+    # 计数器也要恢复，不能复用 id
+    assert reopened.add_user("新人", "13500000004", UserRole.BUYER).id == seller.id + 1
+
+
+def test_journal_checkpoint_truncates_log(db_path):
+    """测试：达到 checkpoint_interval 后写检查点并清空日志"""
+    store = DataStore(path=db_path, journal=True, checkpoint_interval=4)
+    for i in range(3):  # 加上默认管理员共 4 条
+        store.add_user(f"用户{i}", f"1350000010{i}", UserRole.BUYER)
+    assert not os.path.exists(store.log_path)
+
+    with open(db_path, encoding="utf-8") as f:
+        data = json.load(f)
+    assert len(data["users"]) == 4  # 含默认管理员
+
+
+def test_journal_ignores_torn_tail(db_path):
+    """测试：日志最后半行（写入中途崩溃）被忽略"""
+    store = DataStore(path=db_path, journal=True)
+    store.add_user("完整", "13500000201", UserRole.BUYER)
+    with open(store.log_path, "a", encoding="utf-8") as f:
+        f.write('{"op": "insert", "c": "us')
+
+    reopened = DataStore(path=db_path, journal=True)
+    assert reopened.find_user_by_phone("13500000201") is not None
+    assert len(reopened.list_users()) == 2
+
+    # 半行已被截掉，之后追加的记录再次重开时仍然完整
+    reopened.add_user("崩溃后一", "13500000202", UserRole.BUYER)
+    reopened.add_user("崩溃后二", "13500000203", UserRole.BUYER)
+    again = DataStore(path=db_path, journal=True)
+    assert again.find_user_by_phone("13500000202") is not None
+    assert again.find_user_by_phone("13500000203") is not None
+    assert len(again.list_users()) == 4
+
+
+def test_journal_replay_after_checkpoint_crash(db_path):
+    """测试：检查点写完 data.json 但没删日志就崩溃，重放不会重复插入"""
+    store = DataStore(path=db_path, journal=True)
+    store.add_user("买家", "13500000204", UserRole.BUYER)
+    with open(store.log_path, encoding="utf-8") as f:
+        log = f.read()
+    store.checkpoint()
+    with open(store.log_path, "w", encoding="utf-8") as f:
+        f.write(log)
+
+    reopened = DataStore(path=db_path, journal=True)
+    assert [u.id for u in reopened.list_users()] == [1, 2]
+    assert reopened.add_user("新用户", "13500000205", UserRole.BUYER).id == 3
+
+
+# ==================== 持久化级别 ====================
+
+def _wait_for(predicate, timeout=2.0):
+    deadline = time.monotonic() + timeout
+    while not predicate() and time.monotonic() < deadline:
+        time.sleep(0.01)
+    return predicate()
+
+
+def test_group_durability_batches_writes(db_path, monkeypatch):
+    """测试：group 模式修改立即可见，攒够 flush_batch 条由后台线程一次写盘"""
+    store = DataStore(path=db_path, durability="group", flush_interval_ms=60_000, flush_batch=3)
+    saves = []
+    real_prepare = store._prepare_save
+    monkeypatch.setattr(store, "_prepare_save", lambda: (saves.append(1), real_prepare())[1])
+
+    store.add_user("甲", "13500000701", UserRole.BUYER)
+    store.add_user("乙", "13500000702", UserRole.BUYER)
+    assert store.find_user_by_phone("13500000702") is not None
+    assert saves == []
+    store.add_user("丙", "13500000703", UserRole.BUYER)
+    assert _wait_for(lambda: saves == [1])
+
+    store.add_user("丁", "13500000704", UserRole.BUYER)
+    store.close()
+    assert saves == [1, 1]
+    assert DataStore(path=db_path).find_user_by_phone("13500000704") is not None
+
+
+def test_reads_not_blocked_while_flushing(db_path, monkeypatch):
+    """测试：后台线程写盘期间，读和新的修改不用等文件写完"""
+    store = DataStore(path=db_path, durability="group", flush_interval_ms=60_000, flush_batch=1)
+    writing, release = threading.Event(), threading.Event()
+    real_write = store._write_document
+
+    def slow_write(parts):
+        writing.set()
+        release.wait(5)
+        real_write(parts)
+
+    monkeypatch.setattr(store, "_write_document", slow_write)
+    store.add_user("甲", "13500000707", UserRole.BUYER)
+    assert writing.wait(5)
+
+    start = time.monotonic()
+    assert store.find_user_by_phone("13500000707") is not None
+    store.add_user("乙", "13500000708", UserRole.BUYER)
+    assert time.monotonic() - start < 1
+    release.set()
+    store.close()
+    assert DataStore(path=db_path).find_user_by_phone("13500000708") is not None
+
+
+def test_deferred_durability_flushes_when_idle(db_path):
+    """测试：deferred 模式停止修改一段时间后才落盘，flush() 可强制写入"""
+    store = DataStore(path=db_path, journal=True, durability="deferred", idle_flush_ms=50)
+    store.add_user("甲", "13500000705", UserRole.BUYER)
+    assert _wait_for(lambda: os.path.exists(store.log_path))
+
+    store.idle_flush = 60
+    store.add_user("乙", "13500000706", UserRole.BUYER)
+    assert DataStore(path=db_path, journal=True).find_user_by_phone("13500000706") is None
+    store.flush()
+    assert DataStore(path=db_path, journal=True).find_user_by_phone("13500000706") is not None
+    store.close()
+
+    with pytest.raises(ValueError, match="不支持的持久化级别"):
+        DataStore(path=db_path, durability="never")
+
+
+# ==================== 拆分文件 ====================
+
+def test_split_files_only_rewrite_dirty_collections(db_path):
+    """测试：拆分文件模式下单独下单不会重写用户文件"""
+    store = DataStore(path=db_path, split_files=True)
+    seller = store.add_user("卖家", "13500000801", UserRole.SELLER)
+    p = store.add_product(seller.id, "商品", 1, "数码", "全新", 10.0, 3, "描述描述描述描述描述", "C")
+    users_file = store._split_path("users")
+    before = os.stat(users_file).st_mtime_ns
+    os.utime(users_file, ns=(before - 10**9, before - 10**9))
+
+    store.add_order(seller.id, p.id, 1, 10.0)
+    assert os.stat(users_file).st_mtime_ns == before - 10**9
+    assert not os.path.exists(db_path)
+
+    reopened = DataStore(path=db_path, split_files=True)
+    assert len(reopened.orders_by_product(p.id)) == 1
+    assert reopened.add_user("新人", "13500000802", UserRole.BUYER).id == seller.id + 1
+
+
+def test_split_files_migrate_from_single_file(db_path):
+    """测试：老的 data.json 在第一次以拆分模式打开时自动迁移"""
+    old = DataStore(path=db_path)
+    seller = old.add_user("老用户", "13500000803", UserRole.SELLER)
+    old.add_product(seller.id, "老商品", 1, "数码", "全新", 10.0, 3, "描述描述描述描述描述", "C")
+
+    store = DataStore(path=db_path, split_files=True)
+    assert os.path.exists(db_path + ".bak") and not os.path.exists(db_path)
+    with open(store._split_path("products"), encoding="utf-8") as f:
+        assert json.load(f)[0]["title"] == "老商品"
+    assert DataStore(path=db_path, split_files=True).find_user_by_phone("13500000803").id == seller.id
+
+
+
+def test_split_files_migration_resumes_after_crash(db_path, monkeypatch):
+    """测试：迁移写到一半崩溃，下次打开仍以 data.json 为准重新迁移，不丢数据"""
+    old = DataStore(path=db_path)
+    seller = old.add_user("老用户", "13500000804", UserRole.SELLER)
+    old.add_complaint(seller.id, None, None, "商品违规", 1, "原因")
+
+    real_replace = os.replace
+    calls = []
+
+    def crash_on_second(src, dst):
+        calls.append(dst)
+        if len(calls) == 2:
+            raise OSError("模拟崩溃")
+        real_replace(src, dst)
+
+    monkeypatch.setattr(os, "replace", crash_on_second)
+    with pytest.raises(OSError):
+        DataStore(path=db_path, split_files=True)
+    monkeypatch.setattr(os, "replace", real_replace)
+    assert os.path.exists(db_path) and os.path.exists(old._split_path("_id_counters"))
+
+    store = DataStore(path=db_path, split_files=True)
+    assert store.find_user_by_phone("13500000804").id == seller.id
+    assert len(store.list_complaints()) == 1
+    assert os.path.exists(db_path + ".bak") and not os.path.exists(db_path)
+    assert DataStore(path=db_path, split_files=True).find_user_by_phone("13500000804").id == seller.id
+
+# ==================== 记录 JSON 片段缓存 ====================
+
+def test_save_reencodes_only_changed_records(db_path, monkeypatch):
+    """测试：落盘时只重新编码改动过的记录，文件仍是合法 JSON"""
+    import storage
+
+    store = DataStore(path=db_path)
+    seller = store.add_user("卖家", "13500000901", UserRole.SELLER)
+    with store.transaction():
+        products = [
+            store.add_product(seller.id, f"商品{i}", 1, "数码", "全新", 10.0, 3, "描述描述描述描述描述", "C")
+            for i in range(5)
+        ]
+    encoded = []
+    real_dumps = json.dumps
+    monkeypatch.setattr(storage.json, "dumps", lambda obj, **kw: (encoded.append(obj), real_dumps(obj, **kw))[1])
+
+    store.update_product_stock(products[2].id, 0)
+    records = [o for o in encoded if isinstance(o, dict) and "id" in o]
+    assert [r["id"] for r in records] == [products[2].id]
+
+    monkeypatch.undo()
+    with open(db_path, encoding="utf-8") as f:
+        data = json.load(f)
+    assert [p["stock"] for p in data["products"]] == [3, 3, 0, 3, 3]
+    assert DataStore(path=db_path).find_product_by_id(products[2].id).stock == 0
+
+
+# ==================== 主键 / 手机号索引 ====================
+
+def test_indexes_built_on_load(db_path):
+    """测试：重新加载后按 id / 手机号都能直接命中"""
+    store = DataStore(path=db_path)
+    u = store.add_user("索引用户", "13500000301", UserRole.SELLER)
+    p = store.add_product(u.id, "索引商品", 1, "数码", "全新", 10.0, 3, "描述描述描述描述描述", "C")
+
+    reopened = DataStore(path=db_path)
+    assert reopened._user_by_phone["13500000301"]["id"] == u.id
+    assert reopened.find_user_by_id(u.id).phone == "13500000301"
+    assert reopened.find_product_by_id(p.id).title == "索引商品"
+    assert reopened.find_product_by_id(999) is None
+
+
+def test_index_tracks_updates(db_path):
+    """测试：更新方法通过索引修改的是同一条记录"""
+    store = DataStore(path=db_path)
+    u = store.add_user("卖家", "13500000302", UserRole.SELLER)
+    p = store.add_product(u.id, "商品", 1, "数码", "全新", 10.0, 3, "描述描述描述描述描述", "C")
+
+    store.update_product_stock(p.id, 1)
+    store.update_product_status(p.id, ProductStatus.OFF_SHELF)
+    assert store.data["products"][0]["stock"] == 1
+    assert store.find_product_by_id(p.id).status == ProductStatus.OFF_SHELF
+
+
+# ==================== 二级索引 ====================
+
+def test_secondary_indexes_follow_status_changes(db_path):
+    """测试：状态变化后商品在状态/分类索引之间移动"""
+    store = DataStore(path=db_path)
+    seller = store.add_user("卖家", "13500000401", UserRole.SELLER)
+    other = store.add_user("卖家2", "13500000402", UserRole.SELLER)
+    p1 = store.add_product(seller.id, "相机", 1, "数码", "全新", 10.0, 3, "描述描述描述描述描述", "C")
+    p2 = store.add_product(seller.id, "口红", 1, "美妆", "全新", 10.0, 3, "描述描述描述描述描述", "C")
+    store.add_product(other.id, "耳机", 1, "数码", "全新", 10.0, 3, "描述描述描述描述描述", "C")
+
+    assert [p.id for p in store.products_by_seller(seller.id)] == [p1.id, p2.id]
+    assert len(store.products_by_status_category(ProductStatus.ON_SALE, "数码")) == 2
+
+    store.update_product_status(p1.id, ProductStatus.OFF_SHELF)
+    assert len(store.products_by_status_category(ProductStatus.ON_SALE, "数码")) == 1
+    assert [p.id for p in store.products_by_status_category(ProductStatus.OFF_SHELF)] == [p1.id]
+
+    # 重新上架后仍按 id 顺序返回
+    store.update_product_status(p1.id, ProductStatus.ON_SALE)
+    assert [p.id for p in store.products_by_status_category(ProductStatus.ON_SALE)][0] == p1.id
+
+
+def test_orders_and_complaints_indexes(db_path):
+    """测试：按买家/商品查订单，按状态查投诉"""
+    store = DataStore(path=db_path)
+    buyer = store.add_user("买家", "13500000403", UserRole.BUYER)
+    o1 = store.add_order(buyer.id, 7, 1, 10.0)
+    store.add_order(buyer.id + 100, 7, 1, 10.0)
+    c = store.add_complaint(buyer.id, 7, None, "商品违规", 0, "原因")
+
+    assert [o.id for o in store.orders_by_buyer(buyer.id)] == [o1.id]
+    assert len(store.orders_by_product(7)) == 2
+    assert [x.id for x in store.complaints_by_status(ComplaintStatus.PENDING)] == [c.id]
+
+    store.update_complaint_status(c.id, ComplaintStatus.RESOLVED, "已处理")
+    assert store.complaints_by_status(ComplaintStatus.PENDING) == []
+
+    reopened = DataStore(path=db_path)
+    assert len(reopened.complaints_by_status(ComplaintStatus.RESOLVED)) == 1
+
+
+# ==================== 事务 ====================
+
+def test_transaction_single_flush(db_path, monkeypatch):
+    """测试：事务内多次修改只落盘一次"""
+    store = DataStore(path=db_path)
+    saves = []
+    monkeypatch.setattr(store, "_save", lambda: saves.append(1))
+
+    with store.transaction():
+        u = store.add_user("事务用户", "13500000501", UserRole.SELLER)
+        p = store.add_product(u.id, "商品", 1, "数码", "全新", 10.0, 3, "描述描述描述描述描述", "C")
+        store.update_product_stock(p.id, 2)
+        assert saves == []
+    assert saves == [1]
+
+
+def test_transaction_rollback(db_path):
+    """测试：异常逃出事务时内存回滚，索引和 id 计数器一并恢复"""
+    store = DataStore(path=db_path)
+    seller = store.add_user("卖家", "13500000502", UserRole.SELLER)
+    p = store.add_product(seller.id, "商品", 1, "数码", "全新", 10.0, 3, "描述描述描述描述描述", "C")
+
+    with pytest.raises(RuntimeError):
+        with store.transaction():
+            store.add_user("回滚用户", "13500000503", UserRole.BUYER)
+            store.update_product_status(p.id, ProductStatus.OFF_SHELF)
+            store.update_product_stock(p.id, 0)
+            raise RuntimeError("boom")
+
+    assert store.find_user_by_phone("13500000503") is None
+    assert store.find_product_by_id(p.id).stock == 3
+    assert len(store.products_by_status_category(ProductStatus.ON_SALE)) == 1
+    assert store.add_user("新用户", "13500000504", UserRole.BUYER).id == seller.id + 1
+    assert DataStore(path=db_path).find_user_by_phone("13500000503") is None
+
+
+def test_transaction_journal_appends_once(db_path):
+    """测试：日志模式下事务的全部记录一次性追加"""
+    store = DataStore(path=db_path, journal=True)
+    store.checkpoint()
+    with store.transaction():
+        store.add_user("甲", "13500000505", UserRole.BUYER)
+        store.add_user("乙", "13500000506", UserRole.BUYER)
+    with open(store.log_path, encoding="utf-8") as f:
+        assert len(f.readlines()) == 2
+    assert DataStore(path=db_path, journal=True).find_user_by_phone("13500000506") is not None
+
+
+# ==================== 对象缓存 ====================
+
+def test_identity_map_reuses_objects(db_path):
+    """测试：重复读取返回同一批对象，修改后只重建被改的那条"""
+    store = DataStore(path=db_path)
+    seller = store.add_user("卖家", "13500000601", UserRole.SELLER)
+    p1 = store.add_product(seller.id, "甲", 1, "数码", "全新", 10.0, 3, "描述描述描述描述描述", "C")
+    p2 = store.add_product(seller.id, "乙", 1, "数码", "全新", 10.0, 3, "描述描述描述描述描述", "C")
+
+    first = store.list_products()
+    again = store.list_products()
+    assert again is not first and again[0] is first[0]
+    assert store.find_product_by_id(p1.id) is first[0]
+
+    # 调用方改动拿到的列表不影响缓存
+    again.reverse()
+    again.append(None)
+    assert [p.id for p in store.list_products()] == [p1.id, p2.id]
+
+    store.update_product_stock(p1.id, 1)
+    second = store.list_products()
+    assert second is not first
+    assert second[0].stock == 1 and second[0] is not first[0]
+    assert second[1] is first[1]
+    assert store.products_by_seller(seller.id)[1] is first[1]
+
+
+def test_identity_map_invalidated_on_rollback(db_path):
+    """测试：事务回滚后不会读到缓存里的脏对象"""
+    store = DataStore(path=db_path)
+    seller = store.add_user("卖家", "13500000602", UserRole.SELLER)
+    p = store.add_product(seller.id, "甲", 1, "数码", "全新", 10.0, 3, "描述描述描述描述描述", "C")
+    with pytest.raises(RuntimeError):
+        with store.transaction():
+            store.update_product_stock(p.id, 0)
+            assert store.find_product_by_id(p.id).stock == 0
+            raise RuntimeError("boom")
+    assert store.find_product_by_id(p.id).stock == 3